@@ -0,0 +1,167 @@
+# admin_notifier.py
+"""Obaveštenja administratoru: spajanje u grupe, ograničena brzina slanja i opcioni pregled."""
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from metrics import ADMIN_NOTIFICATIONS, timed
+
+logger = logging.getLogger(__name__)
+
+# Najveca duzina jedne Telegram poruke
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n— — —\n\n"
+
+
+def _chunks(batch):
+    """Spaja obaveštenja sa istim parse_mode u poruke do MAX_MESSAGE_LENGTH znakova."""
+    messages = []
+    for text, parse_mode in batch:
+        text = text[:MAX_MESSAGE_LENGTH]
+        if messages and messages[-1][1] == parse_mode \
+                and len(messages[-1][0]) + len(SEPARATOR) + len(text) <= MAX_MESSAGE_LENGTH:
+            messages[-1][0] += SEPARATOR + text
+        else:
+            messages.append([text, parse_mode])
+    return messages
+
+
+class AdminNotifier:
+    """Skuplja obaveštenja za admin chat i šalje ih u pozadini.
+
+    `notify` samo dodaje poruku u bafer i nikad ne čeka slanje. Bafer se šalje
+    kada se skupi `batch_size` poruka, kada od prve poruke prođe `window`
+    sekundi, ili odmah za hitne poruke (greške). Više obaveštenja ide u jednu
+    Telegram poruku, a između dve poruke prođe bar `min_interval` sekundi
+    (Telegram dozvoljava oko 20 poruka u minuti jednom chatu); na RetryAfter
+    se čeka koliko Telegram traži, najviše `max_attempts` pokušaja. Ako je
+    `digest_interval` veći od nule, obična obaveštenja se ne šalju
+    pojedinačno, već kao jedan pregled na svakih `digest_interval` sekundi;
+    hitne poruke se i dalje šalju odmah.
+    """
+
+    def __init__(self, chat_id, batch_size=10, window=10.0, min_interval=3.0, digest_interval=0, max_buffer=500,
+                 max_attempts=3):
+        self.chat_id = chat_id
+        self.batch_size = batch_size
+        self.window = window
+        self.min_interval = min_interval
+        self.digest_interval = digest_interval
+        self.max_buffer = max_buffer
+        self.max_attempts = max_attempts
+        self._buffer = []
+        self._digest = []
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._last_sent = 0.0
+        self._bot = None
+        self._tasks = []
+
+    def notify(self, text, parse_mode=None, summary=None, urgent=False):
+        """Dodaje obaveštenje u bafer; `summary` je jedna linija za pregled."""
+        if not self.chat_id:
+            return
+        if self.digest_interval and not urgent:
+            self._digest.append(summary or text.splitlines()[0])
+            ADMIN_NOTIFICATIONS.inc("digested")
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.pop(0)
+            ADMIN_NOTIFICATIONS.inc("dropped")
+            logger.warning("Admin notification buffer is full, dropping the oldest notification.")
+        self._buffer.append((text, parse_mode))
+        ADMIN_NOTIFICATIONS.inc("queued")
+        self._pending.set()
+        if urgent or len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def start(self, bot):
+        self._bot = bot
+        if not self.chat_id:
+            return
+        self._tasks.append(asyncio.create_task(self._flush_loop(), name="admin-notifier"))
+        if self.digest_interval:
+            self._tasks.append(asyncio.create_task(self._digest_loop(), name="admin-digest"))
+
+    async def stop(self, timeout=10):
+        """Zaustavlja slanje u pozadini i šalje ono što je ostalo u baferu."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue_digest()
+        if self._buffer:
+            try:
+                await asyncio.wait_for(self._flush(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Admin notifications were not sent before shutdown.")
+
+    async def _flush_loop(self):
+        while True:
+            await self._pending.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    async def _flush(self):
+        self._pending.clear()
+        self._full.clear()
+        batch, self._buffer = self._buffer, []
+        messages = _chunks(batch)
+        for index, (text, parse_mode) in enumerate(messages):
+            try:
+                await self._send(text, parse_mode)
+            except asyncio.CancelledError:
+                # stop() prekida slanje; neposlat ostatak se vraca na pocetak bafera, pa ga stop() salje
+                self._buffer[:0] = [tuple(message) for message in messages[index:]]
+                raise
+
+    async def _send(self, text, parse_mode):
+        attempts = 0
+        while attempts < self.max_attempts:
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_sent = time.monotonic()
+            try:
+                with timed("admin_notify"):
+                    await self._bot.send_message(chat_id=self.chat_id, text=text, parse_mode=parse_mode)
+                ADMIN_NOTIFICATIONS.inc("sent")
+                return
+            except RetryAfter as e:
+                # I RetryAfter se broji, da ponovljeni 429 ne blokira sva kasnija obavestenja
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    logger.warning("Admin chat is rate limited (%ss), dropping the notification.", e.retry_after)
+                    break
+                logger.warning("Admin chat is rate limited, retrying in %ss.", e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                attempts += 1
+                if parse_mode is None:
+                    logger.warning("Admin notification rejected: %s", e)
+                    break
+                # Korisnicki unos moze da pokvari Markdown; ista poruka se salje kao obican tekst
+                logger.warning("Admin notification rejected (%s), resending as plain text.", e)
+                parse_mode = None
+            except TelegramError as e:
+                attempts += 1
+                logger.warning("Admin notification failed (attempt %s): %s", attempts, e)
+        ADMIN_NOTIFICATIONS.inc("dropped")
+
+    def _queue_digest(self):
+        if not self._digest:
+            return
+        lines, self._digest = self._digest, []
+        header = f"Pregled: {len(lines)} novih upita u poslednjih {round(self.digest_interval / 60)} min"
+        for start in range(0, len(lines), 50):
+            self.notify("\n".join([header] + [f"• {line}" for line in lines[start:start + 50]]), urgent=True)
+
+    async def _digest_loop(self):
+        while True:
+            await asyncio.sleep(self.digest_interval)
+            self._queue_digest()
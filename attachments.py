@@ -0,0 +1,139 @@
+# attachments.py
+"""Preuzimanje skica sa Telegrama direktno u memoriju za email prilog."""
+import asyncio
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+class SketchAttachment:
+    """Prilog spreman za email: bafer u memoriji ili, za velike fajlove, privremeni fajl.
+
+    Koristi se kao context manager; na izlasku se bafer zatvara, a privremeni
+    fajl briše i kada slanje baci izuzetak.
+    """
+
+    def __init__(self, fileobj, spill_path=None):
+        self.fileobj = fileobj
+        self.spill_path = spill_path
+
+    @property
+    def in_memory(self):
+        return self.spill_path is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        self.fileobj.close()
+        if self.spill_path:
+            _remove_spill(self.spill_path)
+            logger.info("Temporary sketch file deleted: %s", self.spill_path)
+
+
+def _remove_spill(path):
+    if os.path.exists(path):
+        os.remove(path)
+    try:
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+async def download_sketch(bot, file_id, file_name, memory_limit):
+    """Preuzima skicu; fajlovi do `memory_limit` bajtova ostaju u memoriji.
+
+    Ako Telegram ne prijavi veličinu fajla ili je ona veća od limita, fajl se
+    preuzima na disk i prilaže iz privremenog fajla.
+    """
+    telegram_file = await bot.get_file(file_id)
+    file_name = os.path.basename(file_name or telegram_file.file_path or file_id)
+
+    if telegram_file.file_size is not None and telegram_file.file_size <= memory_limit:
+        buffer = io.BytesIO()
+        await telegram_file.download_to_memory(out=buffer)
+        buffer.seek(0)
+        buffer.name = file_name
+        logger.info("Sketch %s downloaded to memory (%s bytes).", file_name, telegram_file.file_size)
+        return SketchAttachment(buffer)
+
+    # Fajl se cuva pod originalnim imenom jer se ime priloga uzima iz putanje
+    spill_path = os.path.join(tempfile.mkdtemp(prefix="sketch_"), file_name)
+    try:
+        await telegram_file.download_to_drive(custom_path=spill_path)
+        attachment = SketchAttachment(open(spill_path, "rb"), spill_path=spill_path)
+    except BaseException:
+        _remove_spill(spill_path)
+        raise
+    logger.info("Sketch %s is larger than %s bytes, spilled to %s.", file_name, memory_limit, spill_path)
+    return attachment
+
+
+class SketchPrefetcher:
+    """Počinje preuzimanje skice čim je korisnik pošalje, dok još unosi kontakt.
+
+    Za svakog korisnika čuva najviše jedno preuzimanje (novija skica menja
+    stariju). Skica se u memoriji drži samo do `per_user_budget` bajtova, a
+    veće idu na disk. Email worker preuzima gotov (ili još aktivan) rezultat
+    preko `take`.
+    """
+
+    def __init__(self, memory_limit, per_user_budget):
+        self.memory_limit = min(memory_limit, per_user_budget)
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def start(self, bot, user_id, file_id, file_name):
+        """Pokreće preuzimanje u pozadini."""
+        self.cancel(user_id)
+        task = asyncio.create_task(
+            download_sketch(bot, file_id, file_name, self.memory_limit), name=f"sketch-prefetch-{user_id}"
+        )
+        self._pending[user_id] = (file_id, task)
+        logger.info("Started sketch prefetch for user %s (File ID: %s).", user_id, file_id)
+
+    async def take(self, user_id, file_id):
+        """Vraća unapred preuzetu skicu ili None ako je nema ili preuzimanje nije uspelo."""
+        pending = self._pending.get(user_id)
+        if pending is None or pending[0] != file_id:
+            return None
+        del self._pending[user_id]
+        try:
+            return await pending[1]
+        except Exception as e:
+            logger.warning("Sketch prefetch for user %s failed: %s", user_id, e)
+            return None
+
+    def cancel(self, user_id):
+        """Prekida preuzimanje i oslobađa skicu korisnika (npr. na /cancel)."""
+        pending = self._pending.pop(user_id, None)
+        if pending is None:
+            return
+        task = pending[1]
+        if task.done():
+            if not task.cancelled() and task.exception() is None:
+                task.result().close()
+        else:
+            task.cancel()
+            task.add_done_callback(_close_cancelled_download)
+        logger.info("Cancelled sketch prefetch for user %s.", user_id)
+
+    def close(self):
+        """Prekida sva preuzimanja pri gašenju bota."""
+        for user_id in list(self._pending):
+            self.cancel(user_id)
+
+
+def _close_cancelled_download(task):
+    # Preuzimanje je moglo da se zavrsi pre nego sto je otkazivanje stiglo do taska
+    if not task.cancelled() and task.exception() is None:
+        task.result().close()
@@ -0,0 +1,88 @@
+# benchmarks/bench_attachments.py
+"""Poredi prilaganje skice preko privremenog fajla i direktno iz memorije.
+
+Svaki režim se pokreće u zasebnom procesu da bi vršni RSS bio uporediv:
+
+    python benchmarks/bench_attachments.py --size 2000000 --iterations 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Bot  # noqa: E402
+
+from attachments import download_sketch  # noqa: E402
+from email_queue import compose_email  # noqa: E402
+from benchmarks.fakes import FakeRequest  # noqa: E402
+
+
+async def tempfile_path(bot, file_id):
+    """Stari put: NamedTemporaryFile + download_to_drive + prilog po putanji."""
+    telegram_file = await bot.get_file(file_id)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        temp_file_path = temp_file.name
+    try:
+        await telegram_file.download_to_drive(custom_path=temp_file_path)
+        with open(temp_file_path, "rb") as attachment:
+            compose_email("bot@example.com", ["partner@example.com"], "s", "b", attachments=[attachment])
+    finally:
+        os.remove(temp_file_path)
+
+
+async def memory_path(bot, file_id):
+    with await download_sketch(bot, file_id, "skica.pdf", memory_limit=64 * 1024 * 1024) as sketch:
+        compose_email("bot@example.com", ["partner@example.com"], "s", "b", attachments=[sketch.fileobj])
+
+
+async def run_mode(mode, size, iterations):
+    bot = Bot("123:benchmark", request=FakeRequest(file_size=size))
+    step = tempfile_path if mode == "tempfile" else memory_path
+    async with bot:
+        await step(bot, "warmup")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        latencies = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            await step(bot, f"file{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "size": size,
+        "iterations": iterations,
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "max_ms": round(latencies[-1], 3),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_rss_growth_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2 * 1024 * 1024, help="veličina skice u bajtovima")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--mode", choices=["tempfile", "memory"], help="interno: jedan režim u ovom procesu")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_mode(args.mode, args.size, args.iterations))))
+        return
+
+    for mode in ("tempfile", "memory"):
+        result = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--size", str(args.size), "--iterations", str(args.iterations)],
+            check=True, capture_output=True, text=True,
+        )
+        print(result.stdout.strip())
+
+
+if __name__ == "__main__":
+    main()
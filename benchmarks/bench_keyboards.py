@@ -0,0 +1,77 @@
+# benchmarks/bench_keyboards.py
+"""Broj alokacija i vreme po handleru: pravljenje tastature u svakom pozivu
+(staro ponašanje) naspram gotove instance iz `KeyboardRegistry`.
+
+    python benchmarks/bench_keyboards.py --iterations 10000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+from keyboards import COUNTRY_LAYOUTS, LAYOUTS  # noqa: E402
+from i18n import t  # noqa: E402
+from main import KEYBOARDS  # noqa: E402
+
+CASES = [(step, None) for step in LAYOUTS] + [
+    (step, country) for step, per_country in COUNTRY_LAYOUTS.items() for country in per_country
+]
+
+
+def layout_for(step, country):
+    return LAYOUTS[step] if country is None else COUNTRY_LAYOUTS[step][country]
+
+
+def build_inline(step, lang, country):
+    """Ono što su handleri ranije radili pri svakom pozivu."""
+    keyboard = [
+        [InlineKeyboardButton(t(lang, key), callback_data=data)] for key, data in layout_for(step, country)
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+
+def from_registry(step, lang, country):
+    return KEYBOARDS.get(step, lang, country)
+
+
+def measure(build, step, lang, country, iterations, samples=100):
+    """Vraća (prosečan broj alociranih blokova po pozivu, mikrosekunde po pozivu)."""
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(samples):
+        # Rezultati se cuvaju da ih GC ne bi oslobodio pre drugog snimka
+        results.append(build(step, lang, country))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename")) / samples
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build(step, lang, country)
+    per_call_us = (time.perf_counter() - start) / iterations * 1e6
+    return blocks, per_call_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--lang", default="sr")
+    args = parser.parse_args()
+
+    print(f"{'step':<22}{'inline allocs':>14}{'registry allocs':>16}{'inline us':>11}{'registry us':>13}")
+    for step, country in CASES:
+        inline_blocks, inline_us = measure(build_inline, step, args.lang, country, args.iterations)
+        registry_blocks, registry_us = measure(from_registry, step, args.lang, country, args.iterations)
+        name = step if country is None else f"{step}/{country}"
+        print(f"{name:<22}{inline_blocks:>14.1f}{registry_blocks:>16.1f}{inline_us:>11.2f}{registry_us:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
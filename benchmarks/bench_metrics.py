@@ -0,0 +1,79 @@
+# benchmarks/bench_metrics.py
+"""Trošak instrumentacije po update-u u odnosu na budžet iz `metrics.py`.
+
+Jedan update prolazi kroz `track_step` i tipično tri poziva Bot API-ja
+(answerCallbackQuery, editMessageText, sendMessage), svaki meren sa `timed`.
+
+    python benchmarks/bench_metrics.py --iterations 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import REGISTRY, timed, track_step  # noqa: E402
+
+BUDGET_US = 20.0
+CALLS_PER_UPDATE = ("answerCallbackQuery", "editMessageText", "sendMessage")
+
+
+class _Context:
+    user_data = {}
+
+
+async def noop_step(update, context):
+    return 1
+
+
+async def raw_update(update, context):
+    await noop_step(update, context)
+    for _ in CALLS_PER_UPDATE:
+        pass
+
+
+instrumented_step = track_step(noop_step)
+
+
+async def instrumented_update(update, context):
+    await instrumented_step(update, context)
+    for call in CALLS_PER_UPDATE:
+        with timed(call):
+            pass
+
+
+async def measure(handler, iterations):
+    context = _Context()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await handler(None, context)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def run(iterations):
+    raw_us = await measure(raw_update, iterations)
+    instrumented_us = await measure(instrumented_update, iterations)
+    overhead = instrumented_us - raw_us
+    print(f"bez metrika:   {raw_us:8.2f} us/update")
+    print(f"sa metrikama:  {instrumented_us:8.2f} us/update")
+    print(f"trošak:        {overhead:8.2f} us/update (budžet {BUDGET_US:.0f} us)")
+
+    start = time.perf_counter()
+    size = len(REGISTRY.render())
+    print(f"/metrics:      {(time.perf_counter() - start) * 1e3:8.2f} ms za {size} bajtova")
+    return overhead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    overhead = asyncio.run(run(args.iterations))
+    if overhead > BUDGET_US:
+        sys.exit(f"Instrumentacija je preko budžeta: {overhead:.2f} us > {BUDGET_US:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_persistence.py
+"""Koliko upisa u SQLite izazove jedan korak razgovora.
+
+Poredi upis posle svakog update-a (interval ~0) sa grupnim upisom kakav PTB
+radi na svakih `update_interval` sekundi (ovde simulirano na svakih
+`--batch` update-ova), i meri vreme učitavanja stanja pri pokretanju:
+
+    python benchmarks/bench_persistence.py --users 50 --batch 1 10 100
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+# Simulirani korisnici klikcu brze od per-chat limita, pa bi rate limiter merio sam sebe
+os.environ.setdefault("RATE_LIMIT_GLOBAL", "0")
+# Upit se salje odmah, bez cekanja na eventualnu dopunu istog korisnika
+os.environ.setdefault("INQUIRY_MERGE_DELAY", "0")
+
+from telegram import Update  # noqa: E402
+
+import config  # noqa: E402
+import main  # noqa: E402
+from benchmarks.fakes import SCENARIOS, FakeRequest, FakeSMTPPool, UpdateFactory, scenario_updates  # noqa: E402
+from persistence import SQLitePersistence  # noqa: E402
+
+
+def _db_bytes(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+async def run(users, batch, path):
+    # Periodicni upis PTB-a se iskljucuje velikim intervalom; upis se poziva rucno
+    config.PERSISTENCE_PATH = path
+    config.OUTBOX_PATH = os.path.join(os.path.dirname(path), "outbox.sqlite3")
+    config.LEADS_PATH = os.path.join(os.path.dirname(path), "leads.sqlite3")
+    config.PERSISTENCE_FLUSH_INTERVAL = 3600
+    application = main.build_application(token="123456:benchmark", request=FakeRequest(),
+                                         concurrent_updates=1, persistence_backend="sqlite")
+    persistence = application.persistence
+    application.bot_data['smtp_pool'] = application.bot_data['email_queue'].smtp_pool = FakeSMTPPool()
+
+    factory = UpdateFactory()
+    scenarios = list(SCENARIOS)
+    updates = list(itertools.chain.from_iterable(
+        itertools.zip_longest(*[
+            [data for _, data in scenario_updates(factory, scenarios[n % len(scenarios)], 20_000 + n)]
+            for n in range(users)
+        ])
+    ))
+    updates = [data for data in updates if data is not None]
+
+    async with application:
+        await application.post_init(application)
+        start = time.perf_counter()
+        for n, data in enumerate(updates, 1):
+            await application.process_update(Update.de_json(data, application.bot))
+            if n % batch == 0:
+                await application.update_persistence()
+                await asyncio.sleep(0)
+        await application.update_persistence()
+        elapsed = time.perf_counter() - start
+        await application.post_shutdown(application)
+
+    restored = SQLitePersistence(path)
+    start = time.perf_counter()
+    await restored.get_user_data()
+    await restored.get_conversations("inquiry")
+    restore_ms = (time.perf_counter() - start) * 1000
+    await restored.flush()
+
+    return {
+        "batch": batch,
+        "updates": len(updates),
+        "transactions": persistence.transactions,
+        "rows_written": persistence.rows_written,
+        "transactions_per_step": round(persistence.transactions / len(updates), 3),
+        "rows_per_step": round(persistence.rows_written / len(updates), 3),
+        "db_bytes": _db_bytes(path),
+        "seconds": round(elapsed, 3),
+        "restore_ms": round(restore_ms, 2),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    for batch in args.batch:
+        with tempfile.TemporaryDirectory() as directory:
+            print(json.dumps(asyncio.run(run(args.users, batch, os.path.join(directory, "state.sqlite3")))))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,89 @@
+# benchmarks/bench_startup.py
+"""Hladan start: koliko traje pokretanje interpretera i import bota, po paketima.
+
+Pokreće `python -X importtime -c "import main"` u novom procesu više puta i
+prikazuje medijane: ukupno vreme procesa, vreme samog interpretera, import
+`main` modula i sopstveno vreme importa grupisano po paketima. Na kraju
+proverava da se moduli koji se učitavaju tek po potrebi ne učitavaju pri startu:
+
+    python benchmarks/bench_startup.py --runs 10 --top 15
+"""
+import argparse
+import collections
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduli koji se ucitavaju tek pri prvom slanju emaila ili samo sa --workers > 1
+DEFERRED = ("smtplib", "cluster")
+
+# Moduli iz ovog repozitorijuma (ostalo je standardna biblioteka ili zavisnosti)
+LOCAL = {os.path.splitext(name)[0] for name in os.listdir(ROOT) if name.endswith(".py")}
+
+
+def run(code, importtime=False):
+    """Vraća (trajanje procesa u sekundama, stderr)."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, result.stderr
+
+
+def parse(stderr):
+    """Redovi `import time: self | cumulative | ime` -> [(ime, self us, cumulative us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def package(name):
+    top = name.split(".", 1)[0]
+    return "(bot)" if top in LOCAL else top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=12, help="koliko paketa prikazati")
+    args = parser.parse_args()
+
+    bare, process, imported = [], [], []
+    by_package = collections.defaultdict(list)
+    for _ in range(args.runs):
+        bare.append(run("pass")[0])
+        elapsed, stderr = run(f"import {args.module}", importtime=True)
+        process.append(elapsed)
+        rows = parse(stderr)
+        imported.append(next(cumulative for name, _, cumulative in reversed(rows) if name == args.module))
+        totals = collections.Counter()
+        for name, self_us, _ in rows:
+            totals[package(name)] += self_us
+        for name, self_us in totals.items():
+            by_package[name].append(self_us)
+
+    print(f"proces ukupno:        {statistics.median(process) * 1000:8.1f} ms")
+    print(f"interpreter (pass):   {statistics.median(bare) * 1000:8.1f} ms")
+    print(f"import {args.module}:{' ' * max(14 - len(args.module), 1)}{statistics.median(imported) / 1000:8.1f} ms")
+    print()
+    ranked = sorted(by_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in ranked[:args.top]:
+        print(f"  {name:<28} {statistics.median(values) / 1000:8.1f} ms")
+
+    check = f"import sys, {args.module}; print(*[m for m in {DEFERRED!r} if m in sys.modules], file=sys.stderr)"
+    _, stderr = run(check)
+    loaded = stderr.split()
+    print()
+    print(f"odlozeni moduli ucitani pri startu: {', '.join(loaded) if loaded else 'nijedan'}")
+
+
+if __name__ == "__main__":
+    main()
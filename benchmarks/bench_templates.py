@@ -0,0 +1,71 @@
+# benchmarks/bench_templates.py
+"""Vreme renderovanja jednog upita: email (tekst i HTML) i admin poruka u MarkdownV2.
+
+Poredi renderovanje iz kompajliranih šablona sa kompajliranjem šablona za
+svaki upit (koliko bi koštalo bez keša po (usluga, zemlja, jezik)):
+
+    python benchmarks/bench_templates.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from i18n import t  # noqa: E402
+from inquiry import (  # noqa: E402
+    Country, HeatingType, HpType, Inquiry, Language, ObjectType, Service
+)
+from templates import InquiryTemplates  # noqa: E402
+
+USER = SimpleNamespace(id=123456789, username="korisnik_sa_donjom_crtom")
+RECIPIENTS = ["partner@example.com", "drugi.partner@example.com"]
+
+# Isti upiti kao scenariji u benchmarks/fakes.py
+INQUIRIES = [
+    Inquiry(Language.SR, Country.SRBIJA, Service.HEATING, heating_type=HeatingType.RADIATORS, surface=120, floors=2,
+            object_type=ObjectType.HOUSE, sketch_declined=True, contact_info="+381 60 1234567, korisnik@example.com",
+            contact_phones=("+381601234567",), contact_emails=("korisnik@example.com",)),
+    Inquiry(Language.EN, Country.SRBIJA, Service.HEATING, heating_type=HeatingType.COMPLETE_HP, surface=180,
+            floors=2, object_type=ObjectType.COMMERCIAL, sketch_file_id="doc_101", sketch_file_name="skica.pdf",
+            contact_info="+381 63 7654321", contact_phones=("+381637654321",)),
+    Inquiry(Language.RU, Country.SRBIJA, Service.HP, hp_type=HpType.AIR_WATER, surface=95, floors=1,
+            object_type=ObjectType.APARTMENT, sketch_file_id="photo_102", sketch_file_name="photo_102.jpg",
+            sketch_photo=True, contact_info="korisnik@example.com", contact_emails=("korisnik@example.com",)),
+    Inquiry(Language.EN, Country.CRNA_GORA, Service.HP, hp_type=HpType.AIR_WATER, contact_info="+382 67 123456",
+            contact_phones=("+38267123456",)),
+]
+
+
+def measure(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for inquiry in INQUIRIES:
+            function(inquiry)
+    return (time.perf_counter() - start) / (iterations * len(INQUIRIES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    templates = InquiryTemplates(t)
+    for inquiry in INQUIRIES:
+        templates.render(inquiry, USER, RECIPIENTS)
+
+    def uncached(inquiry):
+        return InquiryTemplates(t).render(inquiry, USER, RECIPIENTS)
+
+    rendered_us = measure(lambda inquiry: templates.render(inquiry, USER, RECIPIENTS), args.iterations)
+    uncached_us = measure(uncached, max(args.iterations // 10, 1))
+    sizes = [sum(map(len, templates.render(inquiry, USER, RECIPIENTS)[1:])) for inquiry in INQUIRIES]
+    print(f"šabloni: {len(templates)} kompajlirana, prosečno {sum(sizes) / len(sizes):.0f} znakova po upitu")
+    print(f"render (kompajlirano):      {rendered_us:7.2f} us/upit")
+    print(f"kompajliranje + render:     {uncached_us:7.2f} us/upit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_validation.py
+"""Brzina parsiranja korpusa stvarnih unosa za `validation.py`.
+
+Korpus sa očekivanim rezultatima je u tests/test_validation.py (proverava ga
+pytest); ovde se meri prosečno vreme parsiranja. Poredi se i sa ranijim
+`int(text)`, koji bi odbio sve unose označene sa "*" (svaki takav unos je
+jedan krug više do korisnika i nazad):
+
+    python benchmarks/bench_validation.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.test_validation import CONTACT_CORPUS, FLOORS_CORPUS, SURFACE_CORPUS  # noqa: E402
+from validation import extract_contact, parse_floors, parse_surface  # noqa: E402
+
+def _int_accepts(text):
+    try:
+        int(text)
+        return True
+    except ValueError:
+        return False
+
+
+def measure(function, inputs, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for args in inputs:
+            function(*args)
+    return (time.perf_counter() - start) / (iterations * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    numeric = [(text, expected) for text, expected in SURFACE_CORPUS + FLOORS_CORPUS if expected is not None]
+    saved = [text for text, _ in numeric if not _int_accepts(text)]
+    print(f"korpus: {len(SURFACE_CORPUS) + len(FLOORS_CORPUS) + len(CONTACT_CORPUS)} unosa, "
+          f"{len(saved)} od {len(numeric)} ispravnih brojeva int() bi odbio:")
+    for text in saved:
+        print(f"  * {text!r}")
+
+    surface_us = measure(parse_surface, [(text,) for text, _ in SURFACE_CORPUS], args.iterations)
+    floors_us = measure(parse_floors, [(text,) for text, _ in FLOORS_CORPUS], args.iterations)
+    contact_us = measure(extract_contact, [(text, country) for text, country, _, _ in CONTACT_CORPUS],
+                         args.iterations // 4 or 1)
+    print(f"parse_surface:   {surface_us:6.2f} us/unos")
+    print(f"parse_floors:    {floors_us:6.2f} us/unos")
+    print(f"extract_contact: {contact_us:6.2f} us/unos")
+
+
+if __name__ == "__main__":
+    main()
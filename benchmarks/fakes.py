@@ -0,0 +1,197 @@
+# benchmarks/fakes.py
+"""Lažni Telegram Bot API za benchmarke: pravi `Bot`, ali bez mreže."""
+import asyncio
+import itertools
+import json
+import time
+
+from telegram.request import BaseRequest
+
+BOT_USER = {
+    "id": 1,
+    "is_bot": True,
+    "first_name": "Benchmark",
+    "username": "benchmark_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+
+class FakeRequest(BaseRequest):
+    """Odgovara na Bot API pozive iz memorije, uz opciono veštačko kašnjenje.
+
+    Preuzimanje fajla vraća `file_size` bajtova; svi pozivi se broje u `calls`.
+    """
+
+    def __init__(self, latency=0.0, file_size=200 * 1024):
+        self.latency = latency
+        self.file_size = file_size
+        self.calls = {}
+        self._message_ids = itertools.count(1000)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if "/file/bot" in url:
+            self.calls["download"] = self.calls.get("download", 0) + 1
+            return 200, b"\0" * self.file_size
+
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        params = request_data.parameters if request_data else {}
+
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 1)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        elif endpoint == "getFile":
+            result = {
+                "file_id": params["file_id"],
+                "file_unique_id": params["file_id"],
+                "file_size": self.file_size,
+                "file_path": f"documents/{params['file_id']}.pdf",
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class FakeSMTPPool:
+    """Zamena za `SMTPPool` koja samo broji poruke i opciono simulira kašnjenje SMTP-a."""
+
+    def __init__(self, latency=0.0):
+        self.user = "bot@example.com"
+        self.latency = latency
+        self.sent = 0
+
+    def send(self, recipients, message):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent += 1
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class UpdateFactory:
+    """Pravi sirove Telegram update-ove (dict) za simulirane korisnike."""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user_{user_id}"}
+
+    def _message(self, user_id, **fields):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+        }
+        message.update(fields)
+        return {"update_id": next(self._update_ids), "message": message}
+
+    def text(self, user_id, text):
+        if text.startswith("/"):
+            command = text.split()[0]
+            return self._message(
+                user_id, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(command)}]
+            )
+        return self._message(user_id, text=text)
+
+    def callback(self, user_id, data):
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "...",
+                },
+            },
+        }
+
+    def document(self, user_id, file_name="skica.pdf", file_size=200 * 1024):
+        return self._message(user_id, document={
+            "file_id": f"doc_{user_id}",
+            "file_unique_id": f"doc_{user_id}",
+            "file_name": file_name,
+            "file_size": file_size,
+        })
+
+    def photo(self, user_id, file_size=200 * 1024):
+        return self._message(user_id, photo=[{
+            "file_id": f"photo_{user_id}",
+            "file_unique_id": f"photo_{user_id}",
+            "width": 1280,
+            "height": 960,
+            "file_size": file_size,
+        }])
+
+
+# Scenariji: lista koraka (vrsta, podatak) od /start do slanja upita
+SCENARIOS = {
+    "heating_srbija": [
+        ("text", "/start"), ("callback", "l:sr"), ("callback", "c:rs"),
+        ("callback", "s:h"), ("callback", "h:rad"), ("text", "120"),
+        ("text", "2"), ("callback", "o:h"), ("callback", "k:n"),
+        ("text", "+381 60 1234567, korisnik@example.com"),
+    ],
+    "heating_srbija_sketch": [
+        ("text", "/start"), ("callback", "l:en"), ("callback", "c:rs"),
+        ("callback", "s:h"), ("callback", "h:hp"), ("text", "180"),
+        ("text", "2"), ("callback", "o:c"), ("callback", "k:y"),
+        ("document", "skica.pdf"), ("text", "+381 63 7654321"),
+    ],
+    "hp_srbija_photo": [
+        ("text", "/start"), ("callback", "l:ru"), ("callback", "c:rs"),
+        ("callback", "s:p"), ("callback", "p:aw"), ("text", "95"), ("text", "1"),
+        ("callback", "o:a"), ("callback", "k:y"), ("photo", None),
+        ("text", "korisnik@example.com"),
+    ],
+    "hp_crnagora": [
+        ("text", "/start"), ("callback", "l:en"), ("callback", "c:me"),
+        ("callback", "s:p"), ("callback", "p:aw"), ("text", "+382 67 123456"),
+    ],
+}
+
+
+def scenario_updates(factory, scenario, user_id):
+    """Vraća listu (korak, update dict) za jednog korisnika kroz dati scenario."""
+    updates = []
+    for kind, value in SCENARIOS[scenario]:
+        if kind == "text":
+            update = factory.text(user_id, value)
+        elif kind == "callback":
+            update = factory.callback(user_id, value)
+        elif kind == "document":
+            update = factory.document(user_id, value)
+        else:
+            update = factory.photo(user_id)
+        updates.append((f"{kind}:{value}" if kind != "photo" else "photo", update))
+    return updates
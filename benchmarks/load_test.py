@@ -0,0 +1,124 @@
+# benchmarks/load_test.py
+"""Load test: N simuliranih korisnika istovremeno prolazi kroz ceo tok upita.
+
+Update-ovi svih korisnika se izmešaju i ubace u `update_queue` aplikacije
+napravljene sa `build_application`; Bot API i SMTP su lažni, sa zadatim
+kašnjenjem. Meri se protok za svaku vrednost `concurrent_updates`:
+
+    python benchmarks/load_test.py --users 200 --latency 0.05 --concurrency 1 4 16 64
+
+Sa `--flood N` jedan chat pre svih ostalih pošalje N poruka; `others_seconds`
+je vreme dok se ne obradi poslednji update ostalih korisnika, koje ne treba da raste sa N:
+
+    python benchmarks/load_test.py --users 50 --concurrency 4 --flood 200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+# Simulirani korisnici klikcu brze od per-chat limita, pa bi rate limiter merio sam sebe
+os.environ.setdefault("RATE_LIMIT_GLOBAL", "0")
+# Upit se salje odmah, bez cekanja na eventualnu dopunu istog korisnika
+os.environ.setdefault("INQUIRY_MERGE_DELAY", "0")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import TypeHandler  # noqa: E402
+
+import config  # noqa: E402
+import main  # noqa: E402
+from benchmarks.fakes import SCENARIOS, FakeRequest, FakeSMTPPool, UpdateFactory, scenario_updates  # noqa: E402
+
+
+def interleave(per_user):
+    """Redom uzima po jedan update od svakog korisnika, kao kad pišu istovremeno."""
+    for batch in itertools.zip_longest(*per_user):
+        for item in batch:
+            if item is not None:
+                yield item
+
+
+# Chat koji zasipa bota porukama (van opsega simuliranih korisnika)
+FLOOD_CHAT = 9_999_999
+
+
+async def run(users, concurrency, latency, smtp_latency, directory, flood=0):
+    config.OUTBOX_PATH = os.path.join(directory, f"outbox-{concurrency}.sqlite3")
+    config.LEADS_PATH = os.path.join(directory, f"leads-{concurrency}.sqlite3")
+    request = FakeRequest(latency=latency)
+    application = main.build_application(token="123456:benchmark", request=request, concurrent_updates=concurrency,
+                                         persistence_backend="none")
+    application.bot_data['smtp_pool'] = application.bot_data['email_queue'].smtp_pool = FakeSMTPPool(smtp_latency)
+
+    # Kada je obradjen poslednji update ostalih korisnika (grupa posle razgovora)
+    finished = {"others": None}
+
+    async def record(update, context):
+        if update.effective_chat and update.effective_chat.id != FLOOD_CHAT:
+            finished["others"] = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, record), group=1)
+
+    factory = UpdateFactory()
+    scenarios = list(SCENARIOS)
+    per_user = [
+        [update for _, update in scenario_updates(factory, scenarios[n % len(scenarios)], 10_000 + n)]
+        for n in range(users)
+    ]
+
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        # /start i /cancel naizmenicno: svaka poruka zahteva odgovor Bot API-ja
+        flooding = [factory.text(FLOOD_CHAT, ("/start", "/cancel")[n % 2]) for n in range(flood)]
+        updates = [Update.de_json(data, application.bot) for data in flooding + list(interleave(per_user))]
+        start = time.perf_counter()
+        for update in updates:
+            application.update_queue.put_nowait(update)
+        await application.update_queue.join()
+        # Upiti se salju u pozadini; ceka se i da svi prodju kroz outbox
+        while application.bot_data['smtp_pool'].sent < users:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        others = finished["others"] - start
+        await application.stop()
+        await application.post_shutdown(application)
+
+    return {
+        "concurrency": concurrency,
+        "users": users,
+        "updates": len(updates),
+        "flood": flood,
+        "seconds": round(elapsed, 3),
+        "others_seconds": round(others, 3),
+        "updates_per_sec": round(len(updates) / elapsed, 1),
+        "emails": application.bot_data['smtp_pool'].sent,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.02, help="kašnjenje lažnog Bot API-ja u sekundama")
+    parser.add_argument("--smtp-latency", type=float, default=0.5, help="kašnjenje lažnog SMTP-a u sekundama")
+    parser.add_argument("--flood", type=int, default=0, help="broj poruka jednog chata pre svih ostalih")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in args.concurrency:
+            print(json.dumps(asyncio.run(run(
+                args.users, concurrency, args.latency, args.smtp_latency, directory, args.flood
+            ))))
+
+
+if __name__ == "__main__":
+    main_cli()
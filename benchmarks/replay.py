@@ -0,0 +1,195 @@
+# benchmarks/replay.py
+"""Offline replay: sintetički update-ovi kroz isti ConversationHandler kao u `main()`.
+
+Aplikacija se pravi sa `build_application`, Bot API je `FakeRequest`, a SMTP
+`FakeSMTPPool`. Svaki update se obrađuje sa `Application.process_update`;
+update-ovi jednog korisnika idu redom, a do `--concurrency` korisnika
+istovremeno. Za svaki scenario meri se p50/p99 latencija po stanju (ime
+handlera koji je obradio update) i ukupan protok. Rezultat se čuva kao JSON,
+a `--compare` ga poredi sa ranijim rezultatom:
+
+    python benchmarks/replay.py --users 200 --output before.json
+    python benchmarks/replay.py --users 200 --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+# Simulirani korisnici klikcu brze od per-chat limita, pa bi rate limiter merio sam sebe
+os.environ.setdefault("RATE_LIMIT_GLOBAL", "0")
+# Upit se salje odmah, bez cekanja na eventualnu dopunu istog korisnika
+os.environ.setdefault("INQUIRY_MERGE_DELAY", "0")
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ConversationHandler  # noqa: E402
+
+import config  # noqa: E402
+import main  # noqa: E402
+from benchmarks.fakes import FakeRequest, FakeSMTPPool, UpdateFactory, scenario_updates  # noqa: E402
+
+# Scenario iz izveštaja -> scenariji iz fakes.SCENARIOS koji se smenjuju po korisniku
+MIXES = {
+    "heating_srbija": ["heating_srbija"],
+    "hp_crnagora": ["hp_crnagora"],
+    "sketch_upload": ["heating_srbija_sketch", "hp_srbija_photo"],
+    "mixed": ["heating_srbija", "heating_srbija_sketch", "hp_srbija_photo", "hp_crnagora"],
+}
+
+
+def percentile(sorted_values, p):
+    """Percentil po metodi najbližeg ranga."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def record_handlers(application, handled):
+    """Omotava callback svakog handlera razgovora da zapamti koji je obradio update."""
+    conversation = next(
+        handler for group in application.handlers.values() for handler in group
+        if isinstance(handler, ConversationHandler)
+    )
+    handlers = list(conversation.entry_points) + list(conversation.fallbacks)
+    for state_handlers in conversation.states.values():
+        handlers.extend(state_handlers)
+    for handler in handlers:
+        callback = handler.callback
+
+        @functools.wraps(callback)
+        async def recorder(update, context, _callback=callback):
+            handled[update.update_id] = _callback.__name__
+            return await _callback(update, context)
+
+        handler.callback = recorder
+
+
+async def run_mix(name, users, concurrency, latency, directory):
+    config.OUTBOX_PATH = os.path.join(directory, f"outbox-{name}.sqlite3")
+    config.LEADS_PATH = os.path.join(directory, f"leads-{name}.sqlite3")
+    application = main.build_application(token="123456:benchmark", request=FakeRequest(latency=latency),
+                                         concurrent_updates=1, persistence_backend="none")
+    smtp = application.bot_data['smtp_pool'] = application.bot_data['email_queue'].smtp_pool = FakeSMTPPool()
+    handled = {}
+    record_handlers(application, handled)
+
+    factory = UpdateFactory()
+    scenarios = MIXES[name]
+    per_user = [
+        [update for _, update in scenario_updates(factory, scenarios[n % len(scenarios)], 20_000 + n)]
+        for n in range(users)
+    ]
+    latencies = {}
+    slots = asyncio.Semaphore(concurrency)
+
+    async def replay_user(updates):
+        async with slots:
+            for update in updates:
+                started = time.perf_counter()
+                await application.process_update(update)
+                elapsed = time.perf_counter() - started
+                latencies.setdefault(handled.get(update.update_id, "unhandled"), []).append(elapsed * 1000)
+
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        parsed = [[Update.de_json(data, application.bot) for data in updates] for updates in per_user]
+        start = time.perf_counter()
+        await asyncio.gather(*(replay_user(updates) for updates in parsed))
+        elapsed = time.perf_counter() - start
+        # Upiti se salju u pozadini; ceka se da prodju kroz outbox, ali ne ulazi u protok
+        deadline = time.monotonic() + 30
+        while smtp.sent < users and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await application.stop()
+        await application.post_shutdown(application)
+
+    total = sum(len(values) for values in latencies.values())
+    states = {}
+    for state, values in sorted(latencies.items()):
+        values.sort()
+        states[state] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+        }
+    return {
+        "users": users,
+        "updates": total,
+        "seconds": round(elapsed, 3),
+        "updates_per_sec": round(total / elapsed, 1),
+        "emails": smtp.sent,
+        "states": states,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results, baseline=None):
+    for name, result in results["scenarios"].items():
+        old = (baseline or {}).get("scenarios", {}).get(name)
+        line = f"\n{name}: {result['updates_per_sec']} updates/s, {result['updates']} update-ova, {result['emails']} emailova"
+        if old:
+            line += f" (ranije {old['updates_per_sec']} updates/s)"
+        print(line)
+        print(f"  {'stanje':<22}{'broj':>7}{'p50 ms':>10}{'p99 ms':>10}")
+        for state, stats in result["states"].items():
+            row = f"  {state:<22}{stats['count']:>7}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+            old_stats = old["states"].get(state) if old else None
+            if old_stats:
+                row += f"   (ranije {old_stats['p50_ms']:.3f} / {old_stats['p99_ms']:.3f})"
+            print(row)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100, help="broj korisnika po scenariju")
+    parser.add_argument("--concurrency", type=int, default=16, help="koliko korisnika se obrađuje istovremeno")
+    parser.add_argument("--latency", type=float, default=0.0, help="kašnjenje lažnog Bot API-ja u sekundama")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(MIXES), default=list(MIXES))
+    parser.add_argument("--output", help="putanja za JSON rezultat")
+    parser.add_argument("--compare", help="raniji JSON rezultat za poređenje")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.scenarios:
+            results["scenarios"][name] = asyncio.run(run_mix(name, args.users, args.concurrency, args.latency, directory))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRezultat je sačuvan u {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,210 @@
+# cluster.py
+"""Webhook sa više procesa: prijemni proces deli update-ove workerima po chat_id-u.
+
+Prijemni proces samo prima HTTP zahteve i prosleđuje update (rečnik iz JSON-a)
+workeru `chat_id % N`, pa svi update-ovi jednog korisnika stižu u isti proces
+i redosled unutar chata ostaje očuvan. Svaki worker ima svoj `Application`;
+stanje razgovora (SQLite persistence) i outbox dele preko istih SQLite
+fajlova, a outbox zakupom obezbeđuje da isti upit ne šalju dva workera.
+Na SIGTERM prijemni proces prestaje da prima zahteve, a workeri obrade sve
+primljene update-ove i ugase se kao i jedan proces.
+
+Limiti koji važe za ceo bot se dele na workere: svaki dobija
+`RATE_LIMIT_GLOBAL / N` poruka u sekundi i šalje admin obaveštenja najviše
+jednom u `ADMIN_MIN_INTERVAL * N` sekundi, pa ni zajedno ne prelaze limite
+Bot API-ja i admin chata.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import tornado.web
+from telegram import Bot, Update
+from tornado.httpserver import HTTPServer
+
+import config
+from ingress import WebhookGuard
+from logging_setup import setup_logging
+from metrics import REGISTRY, WORKER_RESTARTS
+from webserver import make_app, stop_signal
+
+logger = logging.getLogger(__name__)
+
+# Koliko cesto worker salje svoje metrike prijemnom procesu i koliko cesto
+# prijemni proces proverava da li su workeri zivi (sekunde)
+METRICS_PUSH_INTERVAL = 5
+WORKER_CHECK_INTERVAL = 1
+
+
+def shard_for(update, workers):
+    """Indeks workera za update; update-ovi bez chata idu po korisniku."""
+    if update.effective_chat:
+        key = update.effective_chat.id
+    elif update.effective_user:
+        key = update.effective_user.id
+    else:
+        key = 0
+    return key % workers
+
+
+def _worker_main(index, workers, factory, updates, metrics):
+    # Gasenje koordinise prijemni proces (None u redu), pa worker ignorise signale
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    setup_logging(config.LOG_LEVEL, config.LOG_FORMAT)
+    asyncio.run(_run_worker(index, factory(worker=index, workers=workers), updates, metrics))
+
+
+def _take(updates, timeout):
+    """Čeka prvi update, pa uzima i sve ostale koji su već u redu."""
+    try:
+        batch = [updates.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    while batch[-1] is not None:
+        try:
+            batch.append(updates.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+async def _run_worker(index, application, updates, metrics):
+    parent = os.getppid()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    logger.info("Worker %s started (pid %s).", index, os.getpid())
+    pushed_at = time.monotonic()
+    try:
+        running = True
+        while running:
+            for data in await asyncio.to_thread(_take, updates, 1.0):
+                if data is None:
+                    running = False
+                    break
+                update = Update.de_json(data, application.bot)
+                if update:
+                    await application.update_queue.put(update)
+            if os.getppid() != parent:
+                logger.warning("Receiver process is gone, worker %s is stopping.", index)
+                running = False
+            if time.monotonic() - pushed_at >= METRICS_PUSH_INTERVAL:
+                metrics.put((index, REGISTRY.snapshot()))
+                pushed_at = time.monotonic()
+    finally:
+        # stop() obradi sve update-ove koji su vec u update_queue
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        metrics.put((index, REGISTRY.snapshot()))
+        logger.info("Worker %s stopped.", index)
+
+
+def _join(processes, timeout):
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            logger.warning("Worker %s did not stop in %ss, terminating.", process.name, timeout)
+            process.terminate()
+            process.join()
+
+
+async def serve_cluster(factory, token, workers, listen, port, url_path, webhook_url, allowed_updates=None,
+                        drain_timeout=30, guard=None, xheaders=False):
+    """Pokreće `workers` procesa sa `factory()` aplikacijom i prijemni server ispred njih.
+
+    Zahteve proverava `guard` u prijemnom procesu, pa se ponovljeni update-ovi
+    prepoznaju i kada bi išli različitim workerima.
+    """
+    stop = stop_signal()
+    guard = guard or WebhookGuard()
+    context = multiprocessing.get_context("spawn")
+    metrics = context.Queue()
+    queues = [context.Queue() for _ in range(workers)]
+
+    def spawn(index):
+        process = context.Process(
+            target=_worker_main, args=(index, workers, factory, queues[index], metrics), name=f"bot-worker-{index}"
+        )
+        process.start()
+        return process
+
+    processes = [spawn(index) for index in range(workers)]
+
+    async def monitor_loop():
+        # Worker koji je pao se pokrece ponovo; update-ovi iz njegovog reda cekaju novi proces
+        while True:
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+            for index, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.error("Worker %s exited with code %s, restarting.", index, process.exitcode)
+                    WORKER_RESTARTS.inc()
+                    processes[index] = spawn(index)
+
+    def healthy():
+        return all(process.is_alive() for process in processes)
+
+    snapshots = {}
+
+    def collect():
+        while True:
+            try:
+                index, snapshot = metrics.get_nowait()
+            except queue.Empty:
+                return
+            snapshots[index] = snapshot
+
+    def render_metrics():
+        collect()
+        return REGISTRY.render(snapshots.values())
+
+    async def collect_loop():
+        # Prazni red i kad niko ne cita /metrics, da ne raste
+        while True:
+            await asyncio.sleep(METRICS_PUSH_INTERVAL)
+            collect()
+
+    bot = Bot(token)
+
+    async def dispatch(data):
+        update = Update.de_json(data, bot)
+        if update:
+            index = shard_for(update, workers)
+            if not processes[index].is_alive():
+                # Telegram ponavlja update dok worker ne bude ponovo pokrenut
+                raise tornado.web.HTTPError(503, reason="Worker unavailable")
+            queues[index].put(data)
+
+    # Port se otvara odmah; update-ovi cekaju u redovima dok se workeri ne pokrenu
+    webhook_set = asyncio.Event()
+    server = HTTPServer(
+        make_app(dispatch, url_path, render_metrics, ready=webhook_set.is_set, guard=guard, healthy=healthy),
+        xheaders=xheaders,
+    )
+    server.listen(port, listen)
+    logger.info("Webhook receiver listening on %s:%s with %s workers.", listen, port, workers)
+    collector = asyncio.create_task(collect_loop())
+    monitor = asyncio.create_task(monitor_loop())
+    try:
+        async with bot:
+            await bot.set_webhook(webhook_url, allowed_updates=allowed_updates, secret_token=guard.secret)
+            webhook_set.set()
+            await stop.wait()
+    finally:
+        server.stop()
+        await server.close_all_connections()
+        monitor.cancel()
+        logger.info("Draining %s workers.", workers)
+        for updates in queues:
+            updates.put(None)
+        await asyncio.to_thread(_join, processes, drain_timeout)
+        collector.cancel()
+        logger.info("All workers stopped.")
@@ -1,5 +1,8 @@
 # config.py
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 # Telegram Bot Token - Učitava se iz environment varijabli na Renderu
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -15,46 +18,99 @@ SMTP_EMAIL_PASSWORD = os.getenv("SMTP_EMAIL_PASSWORD")
 WEBHOOK_URL = os.getenv("RENDER_EXTERNAL_HOSTNAME")
 # WEBHOOK_SECRET - Preporučeno za sigurnost
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+# Prijem webhooka: najveca velicina tela zahteva (bajtovi), koliko poslednjih update_id-jeva se pamti
+# radi odbacivanja ponovljenih, zahteva u sekundi po IP adresi (0 = bez ogranicenja) i koliko zaredom,
+# i da li se IP adresa cita iz X-Forwarded-For (samo iza proxy-ja; na Renderu postaviti na true)
+WEBHOOK_MAX_BODY_SIZE = int(os.getenv("WEBHOOK_MAX_BODY_SIZE", str(128 * 1024)))
+WEBHOOK_RECENT_UPDATES = int(os.getenv("WEBHOOK_RECENT_UPDATES", "1000"))
+WEBHOOK_IP_RATE = float(os.getenv("WEBHOOK_IP_RATE", "20"))
+WEBHOOK_IP_BURST = int(os.getenv("WEBHOOK_IP_BURST", "100"))
+WEBHOOK_BEHIND_PROXY = os.getenv("WEBHOOK_BEHIND_PROXY", "false").lower() == "true"
 
+# Obavestenja administratoru: koliko poruka se spaja u jednu, koliko sekundi se ceka na
+# jos poruka, minimalan razmak izmedju dve poruke i interval pregleda (0 = bez pregleda)
+ADMIN_BATCH_SIZE = int(os.getenv("ADMIN_BATCH_SIZE", "10"))
+ADMIN_BATCH_WINDOW = float(os.getenv("ADMIN_BATCH_WINDOW", "10"))
+ADMIN_MIN_INTERVAL = float(os.getenv("ADMIN_MIN_INTERVAL", "3"))
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "0"))
 
-# Podaci o izvođačima i firmama
-CONTACTS = {
-    "Srbija": {
-        "grejanje": {
-            "ime": "Igor Bošković",
-            "email": "boskovicigor83@gmail.com",
-            "telefon": "+381 60 3932566",
-            "telegram": "@IgorNS1983"
-        },
-        "toplotna_pumpa": {
-            "firma": "Microma",
-            "kontakt_osoba": "Borislav Dakić",
-            "email": "office@microma.rs",
-            "telefon": "+381 63 582068",
-            "web": "https://microma.rs"
-        }
-    },
-    "Crna Gora": {
-        "general": { # Instal M je generalni partner za sve u CG
-            "firma": "Instal M",
-            "kontakt_osoba": "Ivan Mujović",
-            "email": "office@instalm.me",
-            "telefon": "+382 67 423 237",
-            "telegram": "@ivanmujovic"
-        }
-    }
-}
+# Ogranicenje poziva Bot API-ja: poruka u sekundi ukupno (0 = bez ogranicenja), po chatu,
+# koliko poruka jedan chat moze da posalje zaredom i broj ponavljanja posle RetryAfter
+RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL", "30"))
+RATE_LIMIT_PER_CHAT = float(os.getenv("RATE_LIMIT_PER_CHAT", "1"))
+RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", "3"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+
+# Broj worker procesa u webhook rezimu (1 = sve u jednom procesu) i koliko sekundi
+# workeri imaju da obrade primljene update-ove pri gasenju
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "30"))
 
-# Jezici (ovo ćemo kasnije proširiti sa celim prevodima)
-LANGUAGES = {
-    "sr": "Srpski",
-    "en": "English",
-    "ru": "Русский"
+# Koliko update-ova se obradjuje paralelno (1 = jedan po jedan); redosled unutar chata je uvek ocuvan
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "8"))
+
+# Cuvanje stanja razgovora: "sqlite", "file" (pickle) ili "none"; izmene se upisuju na svakih N sekundi
+PERSISTENCE_BACKEND = os.getenv("PERSISTENCE_BACKEND", "sqlite")
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "bot_state.sqlite3")
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "5"))
+
+# Napusteni razgovori: koliko sekundi razgovor sme da miruje (podrazumevano i po koraku iz flow.py,
+# npr. "receive_sketch=3600,contact_info=3600"), posle koliko sekundi se brise user_data zavrsenog
+# razgovora, koliko sekundi pre brisanja se korisnik podseca (0 = bez podsetnika) i koliko cesto se proverava
+SESSION_TIMEOUT = float(os.getenv("SESSION_TIMEOUT", "1800"))
+SESSION_STATE_TIMEOUTS = {
+    name.strip(): float(seconds)
+    for name, seconds in (
+        item.split("=", 1) for item in os.getenv("SESSION_STATE_TIMEOUTS", "receive_sketch=3600").split(",")
+        if item.strip()
+    )
 }
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "600"))
+SESSION_REMINDER_BEFORE = float(os.getenv("SESSION_REMINDER_BEFORE", "600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+
+# Pozadinsko slanje emailova - broj workera i maksimalan broj upita u redu
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", "100"))
+# Skice do ove velicine (u bajtovima) se prilazu iz memorije, vece idu preko diska
+ATTACHMENT_MEMORY_LIMIT = int(os.getenv("ATTACHMENT_MEMORY_LIMIT", str(10 * 1024 * 1024)))
+# Koliko bajtova unapred preuzete skice jedan korisnik moze da drzi u memoriji
+SKETCH_PREFETCH_BUDGET = int(os.getenv("SKETCH_PREFETCH_BUDGET", str(5 * 1024 * 1024)))
+
+# Zastita od duplikata: koliko sekundi se pamti poslat upit i koliko upita se pamti najvise,
+# koliko upita jedan korisnik sme da posalje u zadatom broju sekundi (0 = bez ogranicenja) i
+# koliko sekundi nov upit ceka pre slanja (izmena u DEDUP_WINDOW se ionako salje kao dopuna)
+DEDUP_WINDOW = float(os.getenv("DEDUP_WINDOW", "3600"))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+USER_INQUIRY_LIMIT = int(os.getenv("USER_INQUIRY_LIMIT", "3"))
+USER_INQUIRY_WINDOW = float(os.getenv("USER_INQUIRY_WINDOW", "3600"))
+INQUIRY_MERGE_DELAY = float(os.getenv("INQUIRY_MERGE_DELAY", "0"))
+
+# Trajni outbox za upite: putanja baze, broj pokusaja i kasnjenje izmedju pokusaja (sekunde, udvostrucava se)
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", "30"))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv("OUTBOX_MAX_RETRY_DELAY", "3600"))
+
+# Lokalna baza upita za izvestaje (/stats): putanja, koliko upita se upisuje odjednom i
+# koliko sekundi najvise upit ceka u memoriji
+LEADS_PATH = os.getenv("LEADS_PATH", "leads.sqlite3")
+LEADS_BATCH_SIZE = int(os.getenv("LEADS_BATCH_SIZE", "50"))
+LEADS_FLUSH_INTERVAL = float(os.getenv("LEADS_FLUSH_INTERVAL", "2"))
+
+# SMTP server i pool trajnih konekcija (vreme u sekundama)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "300"))
+SMTP_KEEPALIVE_INTERVAL = float(os.getenv("SMTP_KEEPALIVE_INTERVAL", "60"))
+
+# Partneri i pravila za primaoce upita; fajl se ponovo ucitava kada se promeni
+# (provera na svakih N sekundi, 0 = samo pri pokretanju)
+ROUTING_PATH = os.getenv("ROUTING_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "partners.json"))
+ROUTING_RELOAD_INTERVAL = float(os.getenv("ROUTING_RELOAD_INTERVAL", "5"))
 
-# Početni tekstovi (ovo ćemo kasnije prebaciti u prevode)
-START_MESSAGES = {
-    "sr": "Dobrodošli! Molimo izaberite jezik:",
-    "en": "Welcome! Please choose your language:",
-    "ru": "Добро пожаловать! Пожалуйста, выберите язык:"
-}
\ No newline at end of file
+# Logovanje: nivo i format ("json" - jedan JSON objekat po liniji, ili "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
@@ -0,0 +1,151 @@
+# dedup.py
+"""Zaštita od duplikata i zasipanja upitima, pre upisa u outbox."""
+import collections
+import dataclasses
+import hashlib
+import re
+import time
+
+from email_queue import InquiryEmail
+from templates import escape_markdown
+
+NEW = "new"
+MERGED = "merged"
+DUPLICATE = "duplicate"
+THROTTLED = "throttled"
+
+_CONTACT_NOISE = re.compile(r"[\s\-().,;:/]+")
+
+
+def normalize_contact(contact):
+    """Kontakt bez razmaka, interpunkcije i razlike u velikim slovima."""
+    return _CONTACT_NOISE.sub("", (contact or "").lower())
+
+
+def content_hash(inquiry: InquiryEmail):
+    """Hash sadržaja upita (bez korisničkog imena i admin poruke)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (inquiry.subject, inquiry.body, "\n".join(inquiry.recipients), inquiry.sketch_file_id or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def merge_inquiries(earlier: InquiryEmail, later: InquiryEmail):
+    """Spaja dva upita istog korisnika u jedan email; noviji podaci su na vrhu."""
+    recipients = list(dict.fromkeys(later.recipients + earlier.recipients))
+    html = None
+    if later.html and earlier.html:
+        html = f"{later.html}<hr>\n<p>Raniji upit istog korisnika (spojen u ovaj email):</p>\n{earlier.html}"
+    return dataclasses.replace(
+        later,
+        body=f"{later.body}\n\nRaniji upit istog korisnika (spojen u ovaj email):\n{earlier.body}",
+        html=html,
+        recipients=recipients,
+        admin_message=later.admin_message + escape_markdown("\n(spojeno sa ranijim upitom istog korisnika)"),
+        sketch_file_id=later.sketch_file_id or earlier.sketch_file_id,
+        sketch_file_name=later.sketch_file_name if later.sketch_file_id else earlier.sketch_file_name,
+    )
+
+
+def amend_inquiry(inquiry: InquiryEmail, earlier_key):
+    """Dopuna upita koji je već poslat: nov email u istoj niti kao raniji (`earlier_key` u outboxu)."""
+    note = "Dopuna ranijeg upita istog korisnika; raniji email je vec poslat, ovaj ga zamenjuje."
+    return dataclasses.replace(
+        inquiry,
+        subject=f"Dopuna: {inquiry.subject}",
+        body=f"{note}\n\n{inquiry.body}",
+        html=f"<p><b>{note}</b></p>\n{inquiry.html}" if inquiry.html else None,
+        admin_message=inquiry.admin_message + escape_markdown("\n(dopuna ranije poslatog upita)"),
+        in_reply_to=earlier_key,
+    )
+
+
+class TTLCache:
+    """Keš sa rokom trajanja i najviše `max_entries` stavki.
+
+    Stavke su poređane po vremenu upisa (`get` ne menja redosled), pa se
+    istekle i, kada je keš pun, najstarije brišu sa početka.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, now=None):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        if (now or time.monotonic()) - stored_at > self.ttl:
+            del self._items[key]
+            return None
+        return value
+
+    def set(self, key, value, now=None):
+        now = now or time.monotonic()
+        self._items[key] = (now, value)
+        self._items.move_to_end(key)
+        self._expire(now)
+
+    def _expire(self, now):
+        # Stavke su poredjane po vremenu upisa, pa su istekle na pocetku
+        while self._items:
+            key, (stored_at, _) = next(iter(self._items.items()))
+            if now - stored_at <= self.ttl and len(self._items) <= self.max_entries:
+                break
+            del self._items[key]
+
+
+@dataclasses.dataclass
+class _Seen:
+    outbox_key: str
+    content_hash: str
+
+
+class InquiryDeduplicator:
+    """Odlučuje šta se radi sa završenim upitom pre upisa u outbox.
+
+    Ključ je (korisnik, normalizovan kontakt, usluga, zemlja). Isti sadržaj
+    unutar `window` sekundi je duplikat i odbacuje se; izmenjen upit sa istim
+    ključem spaja se sa ranijim (`MERGED`, uz ključ ranijeg upita u outboxu):
+    u isti email ako raniji još nije poslat, inače kao dopuna (`amend_inquiry`).
+    Korisnik može da pošalje najviše `max_per_user` upita u `user_window`
+    sekundi. Oba keša imaju najviše `max_entries` stavki.
+    """
+
+    def __init__(self, window=3600, max_entries=10_000, max_per_user=3, user_window=3600):
+        self.max_per_user = max_per_user
+        self.user_window = user_window
+        self._seen = TTLCache(window, max_entries)
+        self._submissions = TTLCache(user_window, max_entries)
+
+    def __len__(self):
+        return len(self._seen) + len(self._submissions)
+
+    def check(self, user_id, contact, service, country, inquiry):
+        """Vraća (ishod, ključ ranijeg upita u outboxu ili None)."""
+        now = time.monotonic()
+        key = (user_id, normalize_contact(contact), service, country)
+        seen = self._seen.get(key, now)
+        if seen is not None and seen.content_hash == content_hash(inquiry):
+            return DUPLICATE, seen.outbox_key
+        submissions = self._submissions.get(user_id, now) or ()
+        submissions = [at for at in submissions if now - at <= self.user_window]
+        if self.max_per_user and len(submissions) >= self.max_per_user:
+            return THROTTLED, None
+        if seen is not None:
+            return MERGED, seen.outbox_key
+        return NEW, None
+
+    def record(self, user_id, contact, service, country, inquiry, outbox_key):
+        """Pamti upit koji je upisan (ili spojen) u outbox pod ključem `outbox_key`."""
+        now = time.monotonic()
+        key = (user_id, normalize_contact(contact), service, country)
+        self._seen.set(key, _Seen(outbox_key, content_hash(inquiry)), now)
+        submissions = [at for at in self._submissions.get(user_id, now) or () if now - at <= self.user_window]
+        self._submissions.set(user_id, tuple(submissions) + (now,), now)
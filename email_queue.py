@@ -0,0 +1,185 @@
+# email_queue.py
+"""Pozadinsko slanje upita emailom, da SMTP ne blokira event loop bota."""
+import asyncio
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formatdate
+from typing import List, Optional
+
+from attachments import download_sketch
+from metrics import timed
+from templates import ADMIN_PARSE_MODE, escape_markdown
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InquiryEmail:
+    """Završen upit spreman za slanje emailom."""
+    user_id: int
+    username: Optional[str]
+    subject: str
+    body: str
+    recipients: List[str]
+    admin_message: str
+    sketch_file_id: Optional[str] = None
+    sketch_file_name: Optional[str] = None
+    html: Optional[str] = None  # HTML verzija tela; upiti iz starijih verzija je nemaju
+    in_reply_to: Optional[str] = None  # kljuc ranije poslatog upita koji ovaj email dopunjuje
+
+
+def compose_email(sender, recipients, subject, body, html=None, attachments=(), bcc=None, message_id=None,
+                  in_reply_to=None):
+    """Pravi MIME poruku: tekst i HTML kao multipart/alternative, uz priloge.
+
+    Vraća (sve adrese za SMTP, poruka); BCC adresa se ne upisuje u zaglavlje.
+    Sa `in_reply_to` (Message-ID ranije poruke) klijent prikazuje poruku u
+    istoj niti kao raniju.
+    """
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    if message_id:
+        message["Message-ID"] = message_id
+    if in_reply_to:
+        message["In-Reply-To"] = in_reply_to
+        message["References"] = in_reply_to
+    message.set_content(body)
+    if html:
+        message.add_alternative(html, subtype="html")
+    for fileobj in attachments:
+        name = os.path.basename(getattr(fileobj, "name", "") or "prilog")
+        maintype, _, subtype = (mimetypes.guess_type(name)[0] or "application/octet-stream").partition("/")
+        message.add_attachment(fileobj.read(), maintype=maintype, subtype=subtype, filename=name)
+    return list(recipients) + ([bcc] if bcc else []), message.as_string()
+
+
+class EmailQueue:
+    """Red upita koji prazni nekoliko worker taskova u pozadini.
+
+    Upite u red ubacuje dispečer outboxa; slanje preko SMTP-a (konekcije iz
+    `SMTPPool`) radi se u thread executoru. Ishod se upisuje nazad u outbox,
+    a adminu se preko `AdminNotifier`-a javlja uspešno slanje ili konačan neuspeh.
+    """
+
+    def __init__(self, smtp_pool, outbox, bcc=None, notifier=None, workers=2, maxsize=100,
+                 attachment_memory_limit=10 * 1024 * 1024, prefetcher=None):
+        self.smtp_pool = smtp_pool
+        self.outbox = outbox
+        self.prefetcher = prefetcher
+        self.attachment_memory_limit = attachment_memory_limit
+        self.bcc = bcc
+        self.notifier = notifier
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks = []
+        self._bot = None
+
+    async def start(self, bot):
+        """Pokreće worker taskove."""
+        self._bot = bot
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"email-worker-{n}") for n in range(self.workers)
+        ]
+        logger.info("Email queue started with %s workers.", self.workers)
+
+    async def stop(self, timeout=30):
+        """Čeka da se red isprazni (najviše `timeout` sekundi) i gasi workere.
+
+        Upiti koji nisu stigli da se pošalju ostaju u outboxu.
+        """
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Email queue stopped with %s inquiries left in outbox.", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def put(self, entry):
+        """Ubacuje upit iz outboxa u red; čeka ako je red pun."""
+        await self._queue.put(entry)
+
+    async def _worker(self, n):
+        while True:
+            entry = await self._queue.get()
+            try:
+                await self._deliver(entry)
+            except Exception:
+                logger.exception("Email worker %s crashed while delivering inquiry %s", n, entry.idempotency_key)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, entry):
+        inquiry = entry.inquiry
+        body, html = inquiry.body, inquiry.html
+        sketch = None
+        try:
+            if inquiry.sketch_file_id:
+                try:
+                    if self.prefetcher:
+                        sketch = await self.prefetcher.take(inquiry.user_id, inquiry.sketch_file_id)
+                    sketch = sketch or await download_sketch(
+                        self._bot, inquiry.sketch_file_id, inquiry.sketch_file_name, self.attachment_memory_limit
+                    )
+                except Exception as e:
+                    logger.error("Greska pri preuzimanju/prilaganju skice za korisnika %s: %s", inquiry.user_id, e)
+                    note = "NAPOMENA: Doslo je do greske prilikom preuzimanja prilozene skice."
+                    body += f"\n\n{note}"
+                    if html:
+                        html += f"<p><b>{note}</b></p>\n"
+
+            attachments = [sketch.fileobj] if sketch else []
+            with timed("smtp_send"):
+                await asyncio.to_thread(self._send, inquiry, body, html, attachments, entry.idempotency_key)
+        except Exception as e:
+            logger.error("Greska pri slanju emaila za korisnika %s: %s", inquiry.user_id, e, exc_info=True)
+            if await self.outbox.mark_failed(entry, e):
+                self._notify_admin(
+                    f"GREŠKA PRI SLANJU MAILA! Upit korisnika @{inquiry.username} (ID: {inquiry.user_id}) "
+                    f"nije poslat ni posle {entry.attempts} pokusaja: {e}\n"
+                    f"Ponovno slanje: /replay {entry.id}",
+                    urgent=True,
+                )
+            return
+        finally:
+            if sketch:
+                sketch.close()
+
+        await self.outbox.mark_sent(entry)
+        logger.info("Upit uspesno poslat na %s sa BCC na %s.", ', '.join(inquiry.recipients), self.bcc)
+        admin_message = inquiry.admin_message
+        if sketch:
+            admin_message += escape_markdown("\nSkica je prilozena (pogledajte originalni mejl).")
+        self._notify_admin(
+            admin_message,
+            parse_mode=ADMIN_PARSE_MODE,
+            summary=f"@{inquiry.username or 'N/A'} (ID: {inquiry.user_id}): {inquiry.subject}",
+        )
+
+    def _send(self, inquiry: InquiryEmail, body, html, attachments, idempotency_key):
+        """Blokirajuće slanje; izvršava se u thread executoru."""
+        recipients, message = compose_email(
+            self.smtp_pool.user,
+            inquiry.recipients,
+            inquiry.subject,
+            body,
+            html=html,
+            attachments=attachments,
+            bcc=self.bcc,
+            # Isti Message-ID pri ponovnom slanju, da primalac duplikat prepozna kao istu poruku
+            message_id=f"<{idempotency_key}@telegram-bot>",
+            in_reply_to=f"<{inquiry.in_reply_to}@telegram-bot>" if inquiry.in_reply_to else None,
+        )
+        self.smtp_pool.send(recipients, message)
+
+    def _notify_admin(self, text, **kwargs):
+        # Slanje ide u pozadini, upit ne ceka na admin poruku
+        if self.notifier is not None:
+            self.notifier.notify(text, **kwargs)
@@ -0,0 +1,313 @@
+# flow.py
+"""Deklarativni tok razgovora: koraci, opcije, prelazi i validatori.
+
+Tok (`STEPS`) se jednom, pri pokretanju, kompajlira u `FlowTable`: rečnik
+callback_data -> (korak, opcija) za rutiranje u O(1). Kome ide upit određuju
+pravila u `partners.json` (vidi `routing.py`). Dugmad nose kratke kodove ("c:rs"), a
+stari callback_data ("country_srbija") ostaje kao alias, da dugmad poslata
+pre promene i dalje rade. Nova zemlja ili usluga je promena podataka ovde
+(uz pravila u `partners.json` i prevode u `locales/`), a ne novog handlera.
+"""
+import logging
+from dataclasses import dataclass, field, fields
+from typing import Dict, Optional, Tuple, Union
+
+from i18n import has_key
+from inquiry import Country, HeatingType, HpType, Inquiry, Language, ObjectType, Service, current_inquiry
+from validation import parse_floors, parse_surface
+
+logger = logging.getLogger(__name__)
+
+(
+    SELECT_LANGUAGE,
+    SELECT_COUNTRY,
+    SELECT_SERVICE,
+    SELECT_HEATING_TYPE,
+    ENTER_SURFACE,
+    ENTER_FLOORS,
+    SELECT_OBJECT_TYPE,
+    ASK_FOR_SKETCH,
+    RECEIVE_SKETCH,
+    ENTER_CONTACT_INFO,
+    SELECT_HP_TYPE,
+    FINAL_CONFIRMATION
+) = range(12)
+
+
+class FlowError(Exception):
+    """Definicija toka nije ispravna."""
+
+
+@dataclass(frozen=True)
+class Branch:
+    """Vrednost koja zavisi od polja upita (npr. sledeći korak po zemlji)."""
+    field: str
+    cases: Dict[str, str]
+    default: Optional[str] = None
+
+    def resolve(self, inquiry):
+        return self.cases.get(getattr(inquiry, self.field), self.default)
+
+
+@dataclass(frozen=True)
+class Option:
+    code: str                     # kratak callback_data (Telegram dozvoljava najvise 64 bajta)
+    label: str                    # kljuc prevoda, ili gotov tekst ako korak ne prevodi dugmad
+    value: object                 # kod koji se upisuje u polje upita (vidi `inquiry.py`)
+    legacy: Optional[str] = None  # callback_data iz ranijih verzija
+    next: Optional[str] = None    # sledeci korak, umesto Step.next
+    action: Optional[str] = None  # ime akcije koju izvrsava FlowEngine pri izboru
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    state: int
+    prompt: Union[str, Branch]    # kljuc prevoda poruke kojom se korak otvara
+    kind: str = "choice"          # "choice" (dugmad), "text" (unos) ili "custom" (handler u main.py)
+    store: Optional[str] = None   # polje upita (`Inquiry`) za izabranu/unetu vrednost
+    translate: bool = True        # da li su natpisi na dugmadima kljucevi prevoda
+    options: Union[Tuple[Option, ...], Dict[str, Tuple[Option, ...]]] = ()  # ili po zemlji
+    next: Union[str, Branch, None] = None
+    validator: Optional[str] = None
+    invalid: Optional[str] = None  # kljuc poruke za neispravan unos
+    accepts: frozenset = field(default=frozenset(), compare=False)  # popunjava FlowTable
+
+    @property
+    def per_country(self):
+        return isinstance(self.options, dict)
+
+    def all_options(self):
+        if self.per_country:
+            return tuple({option.code: option for options in self.options.values() for option in options}.values())
+        return self.options
+
+
+# Ime validatora iz definicije koraka -> funkcija koja vraca vrednost ili None za neispravan unos
+VALIDATORS = {
+    "surface": parse_surface,
+    "floors": parse_floors,
+}
+
+
+STEPS = (
+    Step(
+        "language", SELECT_LANGUAGE, prompt="welcome", store="language", translate=False, next="country",
+        options=(
+            Option("l:sr", "Srpski", Language.SR, legacy="lang_sr"),
+            Option("l:en", "English", Language.EN, legacy="lang_en"),
+            Option("l:ru", "Русский", Language.RU, legacy="lang_ru"),
+        ),
+    ),
+    Step(
+        "country", SELECT_COUNTRY, prompt="choose_country", store="country", next="service",
+        options=(
+            Option("c:rs", "country_srbija", Country.SRBIJA, legacy="country_srbija"),
+            Option("c:me", "country_crnagora", Country.CRNA_GORA, legacy="country_crnagora"),
+        ),
+    ),
+    Step(
+        "service", SELECT_SERVICE, prompt="select_service", store="service",
+        next=Branch("service", {Service.HEATING: "heating_type", Service.HP: "hp_type"}),
+        options=(
+            Option("s:h", "service_heating", Service.HEATING, legacy="service_heating", action="announce_partner"),
+            Option("s:p", "service_hp", Service.HP, legacy="service_hp", action="announce_partner"),
+        ),
+    ),
+    Step(
+        "heating_type", SELECT_HEATING_TYPE, prompt="select_heating_type", store="heating_type", next="surface",
+        options=(
+            Option("h:rad", "heating_radiators", HeatingType.RADIATORS, legacy="heating_radiators"),
+            Option("h:fc", "heating_fancoil", HeatingType.FANCOIL, legacy="heating_fancoil"),
+            Option("h:uf", "heating_underfloor", HeatingType.UNDERFLOOR, legacy="heating_underfloor"),
+            Option("h:uff", "heating_underfloor_fancoil", HeatingType.UNDERFLOOR_FANCOIL,
+                   legacy="heating_underfloor_fancoil"),
+            Option("h:hp", "heating_complete_hp", HeatingType.COMPLETE_HP, legacy="heating_complete_hp"),
+        ),
+    ),
+    Step(
+        "hp_type", SELECT_HP_TYPE, store="hp_type",
+        prompt=Branch(
+            "country", {Country.SRBIJA: "select_hp_type_srbija", Country.CRNA_GORA: "select_hp_type_crnagora"}
+        ),
+        next=Branch("country", {Country.CRNA_GORA: "contact_info"}, default="surface"),
+        options={
+            Country.SRBIJA: (
+                Option("p:ww", "hp_water_water", HpType.WATER_WATER, legacy="hp_water_water"),
+                Option("p:aw", "hp_air_water", HpType.AIR_WATER, legacy="hp_air_water"),
+            ),
+            Country.CRNA_GORA: (
+                Option("p:aw", "hp_air_water", HpType.AIR_WATER, legacy="hp_air_water"),
+            ),
+        },
+    ),
+    Step(
+        "surface", ENTER_SURFACE, prompt="enter_surface", kind="text", store="surface", validator="surface",
+        invalid="surface_invalid", next="floors",
+    ),
+    Step(
+        "floors", ENTER_FLOORS, prompt="enter_floors", kind="text", store="floors", validator="floors",
+        invalid="floors_invalid", next="object_type",
+    ),
+    Step(
+        "object_type", SELECT_OBJECT_TYPE, prompt="select_object_type", store="object_type", next="sketch",
+        options=(
+            Option("o:h", "object_house", ObjectType.HOUSE, legacy="object_house"),
+            Option("o:a", "object_apartment", ObjectType.APARTMENT, legacy="object_apartment"),
+            Option("o:c", "object_commercial", ObjectType.COMMERCIAL, legacy="object_commercial"),
+            Option("o:x", "object_other", ObjectType.OTHER, legacy="object_other"),
+        ),
+    ),
+    Step(
+        "sketch", ASK_FOR_SKETCH, prompt="ask_for_sketch",
+        options=(
+            Option("k:y", "yes", "yes", legacy="ask_sketch_yes", next="receive_sketch"),
+            Option("k:n", "no", "no", legacy="ask_sketch_no", next="contact_info", action="skip_sketch"),
+        ),
+    ),
+    Step("receive_sketch", RECEIVE_SKETCH, prompt="upload_sketch", kind="custom", next="contact_info"),
+    Step("contact_info", ENTER_CONTACT_INFO, prompt="enter_contact_info", kind="custom"),
+)
+
+
+def translation_keys(steps=STEPS):
+    """Ključevi prevoda koje koraci navode kao podatke, kao parovi (ime koraka, ključ)."""
+    for step in steps:
+        prompts = [step.prompt]
+        if isinstance(step.prompt, Branch):
+            prompts = list(step.prompt.cases.values()) + [step.prompt.default]
+        labels = [option.label for option in step.all_options()] if step.translate else []
+        for key in filter(None, prompts + labels + [step.invalid]):
+            yield step.name, key
+
+
+class FlowTable:
+    """Kompajliran tok: koraci po imenu i stanju, opcije po callback_data."""
+
+    def __init__(self, steps=STEPS):
+        self.steps = {}
+        self.by_state = {}
+        self.options = {}
+        for step in steps:
+            if step.name in self.steps or step.state in self.by_state:
+                raise FlowError(f"Korak '{step.name}' (stanje {step.state}) je definisan dva puta")
+            codes = {}
+            for option in step.all_options():
+                for data in filter(None, (option.code, option.legacy)):
+                    if data in self.options or len(data.encode()) > 64:
+                        raise FlowError(f"callback_data '{data}' je duplikat ili je duži od 64 bajta")
+                    codes[data] = option
+            for data, option in codes.items():
+                self.options[data] = (step, option)
+            # `accepts` je pattern za CallbackQueryHandler: clanstvo u skupu umesto regexa
+            step = _with_accepts(step, frozenset(codes))
+            self.steps[step.name] = step
+            self.by_state[step.state] = step
+        self.options = {data: (self.steps[step.name], option) for data, (step, option) in self.options.items()}
+        self._check()
+
+    def _check(self):
+        for step in self.steps.values():
+            targets = [step.next] + [option.next for option in step.all_options()]
+            for target in targets:
+                names = [target] if not isinstance(target, Branch) else list(target.cases.values()) + [target.default]
+                for name in filter(None, names):
+                    if name not in self.steps:
+                        raise FlowError(f"Korak '{step.name}' vodi na nepostojeći korak '{name}'")
+            if step.kind == "text" and step.validator not in VALIDATORS:
+                raise FlowError(f"Korak '{step.name}' nema poznat validator")
+            if step.store and step.store not in _INQUIRY_FIELDS:
+                raise FlowError(f"Korak '{step.name}' upisuje u nepostojeće polje upita '{step.store}'")
+        for name, key in translation_keys(self.steps.values()):
+            if not has_key(key):
+                raise FlowError(f"Korak '{name}' koristi ključ prevoda '{key}' koji ne postoji u katalogu")
+
+    def lookup(self, data):
+        """Vraća (korak, opcija) za callback_data."""
+        return self.options[data]
+
+    def next_step(self, step, option, inquiry):
+        target = option.next if option is not None and option.next else step.next
+        if isinstance(target, Branch):
+            target = target.resolve(inquiry)
+        return self.steps[target]
+
+
+_INQUIRY_FIELDS = frozenset(field.name for field in fields(Inquiry))
+
+
+def _with_accepts(step, accepts):
+    object.__setattr__(step, "accepts", accepts)
+    return step
+
+
+class FlowEngine:
+    """Generički handleri za korake sa dugmadima i korake sa unosom teksta.
+
+    `text` je funkcija za prevode, `keyboards` je `KeyboardRegistry`, a
+    `actions` rečnik ime -> korutina (update, context) koja se izvršava pri
+    izboru opcije; akcija vraća True ako je već izmenila poruku sa dugmadima,
+    pa se sledeći korak šalje kao nova poruka.
+    """
+
+    def __init__(self, table, text, keyboards, actions=None):
+        self.table = table
+        self.text = text
+        self.keyboards = keyboards
+        self.actions = actions or {}
+
+    def prompt(self, step, inquiry):
+        """Vraća (tekst, tastatura) kojima se otvara korak."""
+        lang = inquiry.language
+        key = step.prompt.resolve(inquiry) if isinstance(step.prompt, Branch) else step.prompt
+        markup = None
+        if step.kind == "choice":
+            markup = self.keyboards.get(
+                step.name, lang if step.translate else None, inquiry.country if step.per_country else None
+            )
+        return self.text(lang, key), markup
+
+    def handler(self, step):
+        """Pravi handler za korak; ime funkcije je ime koraka (za logove i metrike)."""
+        handle_step = self._choose if step.kind == "choice" else self._enter_text
+
+        async def handle(update, context):
+            return await handle_step(step, update, context)
+
+        handle.__name__ = handle.__qualname__ = step.name
+        return handle
+
+    async def _choose(self, step, update, context):
+        query = update.callback_query
+        await query.answer()
+        _, option = self.table.lookup(query.data)
+        inquiry = current_inquiry(context.user_data)
+        if step.store:
+            setattr(inquiry, step.store, option.value)
+        logger.debug("User %s chose %s: %s", update.effective_user.id, step.name, option.value)
+
+        replaced = False
+        if option.action:
+            replaced = await self.actions[option.action](update, context)
+        next_step = self.table.next_step(step, option, inquiry)
+        text, markup = self.prompt(next_step, inquiry)
+        if replaced:
+            await context.bot.send_message(chat_id=query.message.chat_id, text=text, reply_markup=markup)
+        else:
+            await query.edit_message_text(text=text, reply_markup=markup)
+        return next_step.state
+
+    async def _enter_text(self, step, update, context):
+        inquiry = current_inquiry(context.user_data)
+        user_input = update.message.text
+        value = VALIDATORS[step.validator](user_input)
+        if value is None:
+            logger.warning("User %s entered invalid %s: '%s'", update.effective_user.id, step.name, user_input)
+            await update.message.reply_text(self.text(inquiry.language, step.invalid))
+            return step.state
+        setattr(inquiry, step.store, value)
+        logger.debug("User %s entered %s: %s", update.effective_user.id, step.name, value)
+        next_step = self.table.next_step(step, None, inquiry)
+        text, markup = self.prompt(next_step, inquiry)
+        await update.message.reply_text(text, reply_markup=markup)
+        return next_step.state
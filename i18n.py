@@ -0,0 +1,181 @@
+# i18n.py
+"""Katalog prevoda: JSON fajlovi po jeziku, kompajlirani u indeksirane tabele.
+
+Izvor su `locales/<jezik>.json` fajlovi (ključ -> šablon). `python i18n.py build`
+proverava da svi jezici imaju iste ključeve i placeholdere kao referentni
+jezik, da postoje svi ključevi korišćeni u kodu i oni koji su podaci (koraci
+toka u `flow.py` i poruke o partnerima u `partners.json`), i zapisuje
+kompajlirane tabele u `locales/compiled/`. Jezik se učitava tek pri prvoj upotrebi; ako
+kompajlirana tabela ne postoji ili je starija od JSON-a, kompajlira se u memoriji.
+"""
+import functools
+import glob
+import json
+import marshal
+import os
+import re
+import string
+import sys
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+COMPILED_DIR = os.path.join(LOCALES_DIR, "compiled")
+REFERENCE_LANGUAGE = "sr"
+DEFAULT_LANGUAGE = "sr"
+
+# Ključevi koji se u kodu navode kao string literal u pozivu t(jezik, <ključ>)
+_KEY_USAGE = re.compile(r"""\bt\(\s*[^,()]+,\s*["']([a-z0-9_]+)["']""")
+
+
+class CatalogError(Exception):
+    """Katalog prevoda nije konzistentan."""
+
+
+def available_languages():
+    return sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(LOCALES_DIR, "*.json")))
+
+
+def _source_path(lang):
+    return os.path.join(LOCALES_DIR, f"{lang}.json")
+
+
+def _compiled_path(lang):
+    return os.path.join(COMPILED_DIR, f"{lang}.cat")
+
+
+def _read_source(lang):
+    with open(_source_path(lang), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _placeholders(template):
+    return {field for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+def _compile(lang, keys):
+    """Pretvara izvorni katalog u tuple šablona poređanih po id-u ključa."""
+    source = _read_source(lang)
+    missing = [key for key in keys if key not in source]
+    if missing:
+        raise CatalogError(f"Jezik '{lang}' nema prevode za: {', '.join(missing)}")
+    return tuple(sys.intern(source[key]) for key in keys)
+
+
+def _load_keys():
+    return tuple(sorted(_read_source(REFERENCE_LANGUAGE)))
+
+
+@functools.lru_cache(maxsize=None)
+def _key_index():
+    keys = _load_keys()
+    return keys, {key: key_id for key_id, key in enumerate(keys)}
+
+
+@functools.lru_cache(maxsize=None)
+def _table(lang):
+    """Vraća tabelu šablona za jezik, učitanu pri prvoj upotrebi."""
+    keys, _ = _key_index()
+    compiled = _compiled_path(lang)
+    if os.path.exists(compiled) and os.path.getmtime(compiled) >= os.path.getmtime(_source_path(lang)):
+        with open(compiled, "rb") as f:
+            compiled_keys, table = marshal.load(f)
+        # marshal cuva oznaku internovanih stringova, pa ih ne treba ponovo internovati
+        if compiled_keys == keys:
+            return table
+    return _compile(lang, keys)
+
+
+def has_key(key):
+    return key in _key_index()[1]
+
+
+def t(lang, key, **params):
+    """Vraća prevod ključa za jezik; `params` se ubacuju u šablon.
+
+    Nepoznat jezik koristi podrazumevani. Rezultat formatiranja se kešira jer
+    su parametri (npr. podaci izvođača) uglavnom uvek isti.
+    """
+    if lang not in _languages():
+        lang = DEFAULT_LANGUAGE
+    template = _table(lang)[_key_index()[1][key]]
+    if not params:
+        return template
+    return _format(lang, key, tuple(sorted(params.items())))
+
+
+@functools.lru_cache(maxsize=1024)
+def _format(lang, key, params):
+    return _table(lang)[_key_index()[1][key]].format(**dict(params))
+
+
+@functools.lru_cache(maxsize=None)
+def _languages():
+    return frozenset(available_languages())
+
+
+def data_keys():
+    """Ključevi koji nisu literal u pozivu t(): koraci toka i poruke o partnerima, kao (izvor, ključ)."""
+    # flow i routing uvoze ovaj modul, pa se ucitavaju tek ovde
+    import config
+    from flow import translation_keys
+    keys = [(f"flow.py (korak '{step}')", key) for step, key in translation_keys()]
+    with open(config.ROUTING_PATH, encoding="utf-8") as f:
+        routes = json.load(f)["routes"]
+    keys += [(os.path.basename(config.ROUTING_PATH), route["info"]) for route in routes]
+    return keys
+
+
+def check_catalogs(source_dirs=(), data_keys=()):
+    """Vraća listu problema u katalozima; prazna lista znači da je sve u redu.
+
+    `data_keys` su parovi (izvor, ključ) za ključeve koji se ne vide u kodu.
+    """
+    problems = []
+    reference = _read_source(REFERENCE_LANGUAGE)
+    for lang in available_languages():
+        source = _read_source(lang)
+        for key in sorted(reference.keys() - source.keys()):
+            problems.append(f"{lang}: nedostaje ključ '{key}'")
+        for key in sorted(source.keys() - reference.keys()):
+            problems.append(f"{lang}: višak ključ '{key}' (ne postoji u '{REFERENCE_LANGUAGE}')")
+        for key in sorted(reference.keys() & source.keys()):
+            if _placeholders(source[key]) != _placeholders(reference[key]):
+                problems.append(f"{lang}: placeholderi za '{key}' se razlikuju od '{REFERENCE_LANGUAGE}'")
+    for directory in source_dirs:
+        for path in glob.glob(os.path.join(directory, "*.py")):
+            with open(path, encoding="utf-8") as f:
+                for key in _KEY_USAGE.findall(f.read()):
+                    if key not in reference:
+                        problems.append(f"{os.path.basename(path)}: ključ '{key}' ne postoji u katalogu")
+    for source, key in data_keys:
+        if key not in reference:
+            problems.append(f"{source}: ključ '{key}' ne postoji u katalogu")
+    return problems
+
+
+def build():
+    """Proverava kataloge i zapisuje kompajlirane tabele."""
+    problems = check_catalogs(source_dirs=[os.path.dirname(LOCALES_DIR)], data_keys=data_keys())
+    if problems:
+        raise CatalogError("\n".join(problems))
+    keys = _load_keys()
+    os.makedirs(COMPILED_DIR, exist_ok=True)
+    for lang in available_languages():
+        with open(_compiled_path(lang), "wb") as f:
+            marshal.dump((keys, _compile(lang, keys)), f)
+    return keys
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in ([], ["build"], ["check"]):
+        sys.exit("Upotreba: python i18n.py [build|check]")
+    try:
+        if sys.argv[1:] == ["check"]:
+            problems = check_catalogs(source_dirs=[os.path.dirname(LOCALES_DIR)], data_keys=data_keys())
+            if problems:
+                raise CatalogError("\n".join(problems))
+            print("Katalozi su ispravni.")
+        else:
+            keys = build()
+            print(f"Kompajlirano {len(keys)} ključeva za jezike: {', '.join(available_languages())}")
+    except CatalogError as e:
+        sys.exit(f"Greška u katalogu prevoda:\n{e}")
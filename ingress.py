@@ -0,0 +1,118 @@
+# ingress.py
+"""Provere webhook zahteva pre obrade: tajni token, veličina tela, limit po IP adresi i ponovljeni update-ovi.
+
+Sve provere osim ponovljenih update-ova rade se samo nad zaglavljima, pre
+čitanja tela i JSON parsiranja, pa lažan ili prečest zahtev košta jedan
+lookup u rečniku. Telegram isti update šalje ponovo ako ne dobije odgovor na
+vreme; takav update se potvrđuje sa 200, ali se ne obrađuje drugi put.
+"""
+import collections
+import hashlib
+import hmac
+import logging
+import re
+
+from metrics import WEBHOOK_REJECTED
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# Telegram dozvoljava 1-256 znakova A-Z, a-z, 0-9, _ i -
+_SECRET_TOKEN = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+def webhook_path(token):
+    """Putanja webhooka izvedena iz tokena bota.
+
+    Ista je posle restarta i u svim procesima, a token se ne vidi u logovima
+    proxy-ja i pristupa. Zahteve ionako autentifikuje tajni token.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+class RecentIds:
+    """Poslednjih `size` update_id-jeva: ring buffer za redosled i skup za proveru."""
+
+    def __init__(self, size):
+        self._order = collections.deque(maxlen=size)
+        self._ids = set()
+
+    def __contains__(self, update_id):
+        return update_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, update_id):
+        if not self._order.maxlen:
+            return
+        if len(self._order) == self._order.maxlen:
+            self._ids.discard(self._order[0])
+        self._order.append(update_id)
+        self._ids.add(update_id)
+
+
+class WebhookGuard:
+    """Odlučuje da li se webhook zahtev prihvata.
+
+    `secret` je token koji se prosleđuje `set_webhook` i očekuje u zaglavlju
+    `X-Telegram-Bot-Api-Secret-Token` (bez njega se zaglavlje ne proverava).
+    Svaka IP adresa ima svoju kantu (`per_ip_rate` zahteva u sekundi, uz
+    `per_ip_burst` zaredom; 0 = bez ograničenja). Kada je `secret` zadat,
+    kanta važi samo za zahteve bez ispravnog tokena, da nalet pravih
+    update-ova sa Telegram adresa ne bi bio odbijen.
+    """
+
+    def __init__(self, secret=None, max_body_size=128 * 1024, recent_updates=1000, per_ip_rate=20,
+                 per_ip_burst=100, max_idle_buckets=10000):
+        if secret and not _SECRET_TOKEN.fullmatch(secret):
+            raise ValueError("WEBHOOK_SECRET sme da sadrzi samo A-Z, a-z, 0-9, _ i - (najvise 256 znakova)")
+        if not secret:
+            logger.warning("WEBHOOK_SECRET is not set, webhook requests are not authenticated.")
+        self.secret = secret or None
+        self._secret = secret.encode() if secret else None
+        self.max_body_size = max_body_size
+        self.per_ip_rate = per_ip_rate
+        self.per_ip_burst = per_ip_burst
+        self.max_idle_buckets = max_idle_buckets
+        self.recent = RecentIds(recent_updates)
+        self._buckets = {}
+
+    def _bucket(self, ip):
+        bucket = self._buckets.get(ip)
+        if bucket is None:
+            if len(self._buckets) >= self.max_idle_buckets:
+                # Puna kanta je isto sto i nova, pa se moze obrisati
+                self._buckets = {key: value for key, value in self._buckets.items() if not value.full()}
+            bucket = self._buckets[ip] = TokenBucket(self.per_ip_rate, self.per_ip_burst)
+        return bucket
+
+    def check(self, remote_ip, headers):
+        """Vraća (HTTP status, razlog) za odbijen zahtev ili None ako se prihvata."""
+        authenticated = False
+        if self._secret is not None:
+            token = headers.get(SECRET_HEADER, "").encode()
+            authenticated = hmac.compare_digest(token, self._secret)
+        # Telegram salje sa malo adresa, pa se limit po IP odnosi samo na zahteve bez ispravnog tokena
+        if not authenticated and self.per_ip_rate and self._bucket(remote_ip).take():
+            return self._reject(429, "rate_limited")
+        if self._secret is not None and not authenticated:
+            return self._reject(403, "bad_secret")
+        length = headers.get("Content-Length")
+        if length is not None and (not length.isdigit() or int(length) > self.max_body_size):
+            return self._reject(413, "too_large")
+        return None
+
+    def duplicate(self, update_id):
+        """Da li je update sa ovim id-jem već primljen; broji se kao odbijen."""
+        if update_id in self.recent:
+            WEBHOOK_REJECTED.inc("duplicate")
+            return True
+        return False
+
+    @staticmethod
+    def _reject(status, reason):
+        WEBHOOK_REJECTED.inc(reason)
+        return status, reason
@@ -0,0 +1,193 @@
+# inquiry.py
+"""Upit koji korisnik popunjava kroz razgovor, sa kodovima opcija umesto prevedenih naziva.
+
+`Inquiry` se pravi na /start i čuva u `user_data['inquiry']`; koraci iz
+`flow.py` upisuju kodove u njegova polja. Prevedeni nazivi se prave tek pri
+slanju, iz šablona za email i poruku administratoru (`templates.py`). U
+persistence ide samo rečnik popunjenih polja sa običnim stringovima i brojevima.
+"""
+import enum
+from dataclasses import dataclass, fields
+from typing import Optional, Tuple
+
+from email_queue import InquiryEmail
+from i18n import t
+from templates import InquiryTemplates
+
+
+class Code(str, enum.Enum):
+    """Kod opcije; poredi se, hešira i ispisuje kao običan string."""
+
+    def __str__(self):
+        return self.value
+
+    __format__ = str.__format__
+
+
+class Language(Code):
+    SR = "sr"
+    EN = "en"
+    RU = "ru"
+
+
+class Country(Code):
+    SRBIJA = "srbija"
+    CRNA_GORA = "crnagora"
+
+
+class Service(Code):
+    HEATING = "heating"
+    HP = "hp"
+
+
+class HeatingType(Code):
+    RADIATORS = "radiators"
+    FANCOIL = "fancoil"
+    UNDERFLOOR = "underfloor"
+    UNDERFLOOR_FANCOIL = "underfloor_fancoil"
+    COMPLETE_HP = "complete_hp"
+
+
+class HpType(Code):
+    WATER_WATER = "water_water"
+    AIR_WATER = "air_water"
+
+
+class ObjectType(Code):
+    HOUSE = "house"
+    APARTMENT = "apartment"
+    COMMERCIAL = "commercial"
+    OTHER = "other"
+
+
+# Sabloni se kompajliraju jednom po (usluga, zemlja, jezik)
+TEMPLATES = InquiryTemplates(t)
+
+# Polje -> tip koda, za vracanje iz persistence-a
+_CODES = {
+    "language": Language,
+    "country": Country,
+    "service": Service,
+    "heating_type": HeatingType,
+    "hp_type": HpType,
+    "object_type": ObjectType,
+}
+
+
+@dataclass(slots=True)
+class Inquiry:
+    language: Language = Language.SR
+    country: Optional[Country] = None
+    service: Optional[Service] = None
+    heating_type: Optional[HeatingType] = None
+    hp_type: Optional[HpType] = None
+    surface: Optional[float] = None
+    floors: Optional[int] = None
+    object_type: Optional[ObjectType] = None
+    sketch_declined: bool = False
+    sketch_file_id: Optional[str] = None
+    sketch_file_name: Optional[str] = None
+    sketch_photo: bool = False
+    contact_info: Optional[str] = None
+    contact_phones: Tuple[str, ...] = ()
+    contact_emails: Tuple[str, ...] = ()
+
+    @property
+    def complete_offer(self):
+        return self.service == Service.HEATING and self.heating_type == HeatingType.COMPLETE_HP
+
+    @property
+    def has_object_details(self):
+        """Površina, spratovi, objekat i skica se traže za grejanje i za toplotnu pumpu u Srbiji."""
+        return self.service == Service.HEATING or self.country == Country.SRBIJA
+
+    @property
+    def sketch_info(self):
+        """Opis skice za email."""
+        if self.sketch_file_id and self.sketch_photo:
+            return f"Korisnik je priložio sliku (File ID: {self.sketch_file_id})"
+        if self.sketch_file_id:
+            return f"Korisnik je priložio dokument: {self.sketch_file_name} (File ID: {self.sketch_file_id})"
+        if self.sketch_declined:
+            return t(self.language, "skip_sketch")
+        return "Nije prilozena"
+
+    # --- serijalizatori ---
+
+    def email(self, user, recipients):
+        """Upit spreman za outbox: email (tekst i HTML) i admin poruka, iz šablona u `templates.py`."""
+        subject, body, html, admin_message = TEMPLATES.render(self, user, recipients)
+        return InquiryEmail(
+            user_id=user.id,
+            username=user.username,
+            subject=subject,
+            body=body,
+            recipients=list(recipients),
+            admin_message=admin_message,
+            sketch_file_id=self.sketch_file_id,
+            sketch_file_name=self.sketch_file_name,
+            html=html,
+        )
+
+    def to_state(self):
+        """Samo popunjena polja, kao obični stringovi i brojevi (za persistence)."""
+        state = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value != field.default:
+                state[field.name] = value.value if isinstance(value, Code) else value
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        inquiry = cls()
+        for name, value in state.items():
+            if value is not None and name in _CODES:
+                value = _CODES[name](value)
+            elif name in ("contact_phones", "contact_emails"):
+                value = tuple(value)
+            setattr(inquiry, name, value)
+        return inquiry
+
+    def __reduce__(self):
+        # pickle cuva recnik kodova umesto imena klasa i svih polja
+        return Inquiry.from_state, (self.to_state(),)
+
+
+# Kljucevi u user_data iz verzija pre `Inquiry` -> polje upita
+_LEGACY_KEYS = {
+    "language": "language",
+    "country": "country",
+    "service": "service",
+    "heating_type_code": "heating_type",
+    "hp_type_code": "hp_type",
+    "surface": "surface",
+    "floors": "floors",
+    "object_type_code": "object_type",
+    "sketch_file_id": "sketch_file_id",
+    "sketch_file_name": "sketch_file_name",
+}
+
+
+def current_inquiry(user_data):
+    """Vraća upit iz `user_data`; pravi nov ako ga nema (npr. dugme iz ranije sesije).
+
+    Razgovor sačuvan u persistence-u pre uvođenja `Inquiry` prevodi se u upit.
+    """
+    inquiry = user_data.get('inquiry')
+    if inquiry is None:
+        legacy = {field: user_data[key] for key, field in _LEGACY_KEYS.items() if user_data.get(key) is not None}
+        if user_data.get('sketch_info') and not user_data.get('sketch_file_id'):
+            legacy['sketch_declined'] = True
+        last_step = user_data.get('last_step')
+        user_data.clear()
+        if last_step is not None:
+            user_data['last_step'] = last_step
+        inquiry = user_data['inquiry'] = Inquiry.from_state(legacy)
+    return inquiry
+
+
+def language_of(user_data):
+    """Jezik korisnika za poruke van toka (greške, podsetnici), bez pravljenja upita."""
+    inquiry = (user_data or {}).get('inquiry')
+    return inquiry.language if inquiry is not None else Language.SR
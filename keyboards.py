@@ -0,0 +1,64 @@
+# keyboards.py
+"""Unapred napravljene inline tastature za svaki korak, jezik i zemlju."""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from flow import STEPS
+
+# Natpisi i callback_data dolaze iz definicije toka; svako dugme je u svom redu
+LANGUAGE_BUTTONS = [(option.label, option.code) for step in STEPS if not step.translate for option in step.options]
+
+# Korak -> lista (kljuc prevoda, callback_data)
+LAYOUTS = {
+    step.name: [(option.label, option.code) for option in step.options]
+    for step in STEPS if step.kind == "choice" and step.translate and not step.per_country
+}
+
+# Tastature koje zavise i od zemlje
+COUNTRY_LAYOUTS = {
+    step.name: {
+        country: [(option.label, option.code) for option in options] for country, options in step.options.items()
+    }
+    for step in STEPS if step.kind == "choice" and step.per_country
+}
+
+
+def _markup(buttons):
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data=data)] for label, data in buttons])
+
+
+class KeyboardRegistry:
+    """Pravi tastature jednom po jeziku i vraća iste (nepromenljive) instance.
+
+    Ključ je (korak, jezik, zemlja); zemlja je None za korake koji od nje ne
+    zavise. `build_all` pravi tastature za sve jezike pri pokretanju; `get` sam
+    pravi tastature jezika koji nije unapred napravljen.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._markups = {("language", None, None): _markup(LANGUAGE_BUTTONS)}
+        self._built_languages = set()
+
+    def __len__(self):
+        return len(self._markups)
+
+    def _build_language(self, lang):
+        for step, layout in LAYOUTS.items():
+            self._markups[(step, lang, None)] = _markup([(self._text(lang, key), data) for key, data in layout])
+        for step, per_country in COUNTRY_LAYOUTS.items():
+            for country, layout in per_country.items():
+                self._markups[(step, lang, country)] = _markup([(self._text(lang, key), data) for key, data in layout])
+        self._built_languages.add(lang)
+
+    def build_all(self, languages):
+        """Pravi tastature za sve date jezike; vraća ukupan broj tastatura."""
+        for lang in languages:
+            if lang not in self._built_languages:
+                self._build_language(lang)
+        return len(self._markups)
+
+    def get(self, step, lang=None, country=None):
+        """Vraća tastaturu za korak; baca KeyError za nepoznatu kombinaciju."""
+        if lang is not None and lang not in self._built_languages:
+            self._build_language(lang)
+        return self._markups[(step, lang, country)]
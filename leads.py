@@ -0,0 +1,187 @@
+# leads.py
+"""Lokalna baza upita (SQLite) za izveštaje: jedan red po završenom upitu."""
+import asyncio
+import dataclasses
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    user_id INTEGER NOT NULL,
+    lang TEXT NOT NULL,
+    country TEXT NOT NULL,
+    service TEXT NOT NULL,
+    heating_type TEXT,
+    hp_type TEXT,
+    surface REAL,
+    floors INTEGER,
+    object_type TEXT,
+    has_sketch INTEGER NOT NULL DEFAULT 0,
+    merged INTEGER NOT NULL DEFAULT 0,
+    stored_at REAL NOT NULL
+);
+-- Izvestaji filtriraju po vremenu, pa po zemlji i usluzi; indeksi pokrivaju te upite
+CREATE INDEX IF NOT EXISTS leads_created ON leads (created_at, country, service, surface);
+CREATE INDEX IF NOT EXISTS leads_heating ON leads (created_at, heating_type) WHERE heating_type IS NOT NULL;
+CREATE INDEX IF NOT EXISTS leads_hp ON leads (created_at, hp_type) WHERE hp_type IS NOT NULL;
+"""
+
+_COLUMNS = ("created_at", "user_id", "lang", "country", "service", "heating_type", "hp_type", "surface", "floors",
+            "object_type", "has_sketch", "merged")
+_INSERT = f"INSERT INTO leads ({', '.join(_COLUMNS)}, stored_at) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})"
+
+
+@dataclasses.dataclass
+class Lead:
+    """Završen upit; tipovi su kodovi opcija iz `flow.py`, ne prevedeni nazivi."""
+    user_id: int
+    lang: str
+    country: str
+    service: str
+    heating_type: Optional[str] = None
+    hp_type: Optional[str] = None
+    surface: Optional[float] = None
+    floors: Optional[int] = None
+    object_type: Optional[str] = None
+    has_sketch: bool = False
+    merged: bool = False
+    created_at: float = dataclasses.field(default_factory=time.time)
+
+    @classmethod
+    def from_inquiry(cls, user_id, inquiry, merged=False):
+        """Lead iz završenog `inquiry.Inquiry`."""
+        return cls(
+            user_id=user_id,
+            lang=inquiry.language,
+            country=inquiry.country,
+            service=inquiry.service,
+            heating_type=inquiry.heating_type,
+            hp_type=inquiry.hp_type,
+            surface=inquiry.surface,
+            floors=inquiry.floors,
+            object_type=inquiry.object_type,
+            has_sketch=bool(inquiry.sketch_file_id),
+            merged=merged,
+        )
+
+    def row(self, stored_at):
+        return tuple(getattr(self, column) for column in _COLUMNS) + (stored_at,)
+
+
+class LeadStore:
+    """Upisuje upite u grupama iz pozadinskog taska.
+
+    `record` samo dodaje upit u bafer i ne čeka disk. Bafer se upisuje jednom
+    transakcijom kada se skupi `batch_size` upita ili na svakih
+    `flush_interval` sekundi, u thread executoru; pri gašenju se upisuje ostatak.
+    """
+
+    def __init__(self, path, batch_size=50, flush_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db = None
+        self._buffer = []
+        self._full = asyncio.Event()
+        self._task = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def record(self, lead: Lead):
+        self._buffer.append(lead)
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    def _write(self, leads):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(_INSERT, [lead.row(now) for lead in leads])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    async def flush(self):
+        self._full.clear()
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception:
+            logger.exception("Failed to store %s leads, keeping them for the next flush.", len(batch))
+            self._buffer[:0] = batch
+
+    async def start(self):
+        await asyncio.to_thread(self._connect)
+        self._task = asyncio.create_task(self._flush_loop(), name="lead-store")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # --- izvestaji ---
+
+    def _stats(self, since, today):
+        by_service = self._query(
+            "SELECT country, service, COUNT(*), AVG(surface) FROM leads WHERE created_at >= ? "
+            "GROUP BY country, service ORDER BY COUNT(*) DESC",
+            (since,),
+        )
+        heating = self._query(
+            "SELECT heating_type, COUNT(*) FROM leads WHERE created_at >= ? AND heating_type IS NOT NULL "
+            "GROUP BY heating_type ORDER BY COUNT(*) DESC",
+            (since,),
+        )
+        hp = self._query(
+            "SELECT hp_type, COUNT(*) FROM leads WHERE created_at >= ? AND hp_type IS NOT NULL "
+            "GROUP BY hp_type ORDER BY COUNT(*) DESC",
+            (since,),
+        )
+        today_count = self._query("SELECT COUNT(*) FROM leads WHERE created_at >= ?", (today,))[0][0]
+        return {"by_service": by_service, "heating_type": heating, "hp_type": hp, "today": today_count}
+
+    async def stats(self, days=30):
+        """Zbirni podaci za poslednjih `days` dana; upiti iz bafera se prvo upisuju."""
+        await self.flush()
+        now = time.time()
+        today = time.mktime(time.localtime(now)[:3] + (0, 0, 0, 0, 0, -1))
+        return await asyncio.to_thread(self._stats, now - days * 86400, today)
@@ -0,0 +1,144 @@
+# logging_setup.py
+"""Strukturisano logovanje: JSON linije sa fiksnim poljima, formatiranje van event loop-a."""
+import atexit
+import contextvars
+import copy
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Polja koja svaka JSON linija ima (None ako nisu poznata)
+CONTEXT_FIELDS = ("user_id", "step", "lang", "country")
+
+_context = contextvars.ContextVar("log_context", default={})
+
+# Email adrese i brojevi telefona (pocinju sa + ili 0, pa se Telegram ID-jevi ne diraju)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"(?<![\w+])(?:\+|0)\d[\d \t/().-]{5,}\d")
+
+
+def redact(text):
+    """Maskira email adrese i brojeve telefona u tekstu."""
+    return _PHONE.sub("<phone>", _EMAIL.sub("<email>", text))
+
+
+def bind(**fields):
+    """Dodaje polja u kontekst logovanja tekućeg taska; vraća token za `unbind`."""
+    return _context.set({**_context.get(), **fields})
+
+
+def unbind(token):
+    _context.reset(token)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Stavlja zapis u red sa porukom, a ostatak formatiranja radi listener.
+
+    Kao u standardnom QueueHandler-u, `msg % args` se računa odmah, jer
+    argumenti (npr. delovi user_data) mogu da se promene pre nego što ih
+    listener pročita. Na event loop-u ostaje samo to i kopiranje polja
+    konteksta (contextvars postoje samo u tasku koji loguje); JSON,
+    maskiranje i traceback radi listener u svom threadu.
+    """
+
+    def prepare(self, record):
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        if not hasattr(record, "latency_ms"):
+            record.latency_ms = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Jedan JSON objekat po liniji; poruka i traceback prolaze kroz `redact`."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": redact(record.getMessage()),
+        }
+        for field in CONTEXT_FIELDS:
+            entry[field] = getattr(record, field, None)
+        entry["latency_ms"] = getattr(record, "latency_ms", None)
+        if record.exc_info:
+            entry["exc"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RedactingFormatter(logging.Formatter):
+    """Čitljiv tekstualni format, sa istim maskiranjem kao JSON."""
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+def setup_logging(level="INFO", fmt="json"):
+    """Podešava root logger: handleri pišu iz posebnog threada preko QueueListener-a."""
+    stream = logging.StreamHandler()
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(RedactingFormatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers[:] = [_ContextQueueHandler(log_queue)]
+    root.setLevel(level)
+    # httpx na INFO loguje svaki zahtev ka Bot API-ju, zajedno sa tokenom u URL-u
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def log_update(callback):
+    """Dekorator za handlere: postavlja kontekst logovanja i beleži trajanje koraka.
+
+    Po update-u se piše jedna INFO linija sa korakom, jezikom, zemljom i
+    `latency_ms`, umesto posebnih poruka u svakom handleru.
+    """
+    step = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        user = update.effective_user
+        user_data = context.user_data if context.user_data is not None else {}
+        inquiry = user_data.get("inquiry")
+        token = bind(
+            user_id=user.id if user else None,
+            step=step,
+            lang=getattr(inquiry, "language", None),
+            country=getattr(inquiry, "country", None),
+        )
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            # Jezik i zemlja su mozda tek izabrani u ovom koraku
+            inquiry = user_data.get("inquiry")
+            logger.info(
+                "Update handled",
+                extra={
+                    "lang": getattr(inquiry, "language", _context.get()["lang"]),
+                    "country": getattr(inquiry, "country", _context.get()["country"]),
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                },
+            )
+            unbind(token)
+
+    return wrapper
@@ -1,8 +1,13 @@
+import argparse
+import asyncio
+import math
 import os
 import logging
-import tempfile
+from datetime import datetime
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,13 +16,37 @@ from telegram.ext import (
     filters,
     ConversationHandler,
 )
-import yagmail
+
+import config
+from admin_notifier import AdminNotifier
+from attachments import SketchPrefetcher
+from dedup import DUPLICATE, MERGED, THROTTLED, InquiryDeduplicator, amend_inquiry, merge_inquiries
+from email_queue import EmailQueue
+from i18n import t
+from flow import ENTER_CONTACT_INFO, RECEIVE_SKETCH, SELECT_LANGUAGE, FlowEngine, FlowTable
+from ingress import WebhookGuard, webhook_path
+from inquiry import TEMPLATES, Country, Inquiry, Language, Service, current_inquiry, language_of
+from keyboards import KeyboardRegistry
+from leads import Lead, LeadStore
+from logging_setup import log_update, setup_logging
+from metrics import (
+    FUNNEL_ABANDONED, FUNNEL_COMPLETED, FUNNEL_STARTED, INQUIRIES_FILTERED, SESSIONS_SWEPT, USER_DATA_ENTRIES,
+    InstrumentedRequest, track_step
+)
+from outbox import Outbox
+from persistence import build_persistence
+from rate_limiter import TokenBucketRateLimiter
+from routing import RoutingRegistry
+from sessions import (
+    EXPIRE, REMIND, SessionTracker, conversation_states, drop_foreign, end_conversation, track_session
+)
+from smtp_pool import SMTPPool
+from update_processor import ChatOrderedUpdateProcessor
+from validation import extract_contact
+from webserver import serve
 
 load_dotenv()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -28,711 +57,483 @@ EMAIL_SENDER_ADDRESS = os.getenv("EMAIL_SENDER_ADDRESS")
 EMAIL_SENDER_PASSWORD = os.getenv("EMAIL_SENDER_PASSWORD")
 BCC_EMAIL = "banjooo85@gmail.com"
 
-CONTRACTORS = {
-    "srbija": {
-        "name": "Igor Bošković",
-        "email": "boskovicigor83@gmail.com",
-        "phone": "+381 60 3932566",
-        "telegram": "@IgorNS1983"
-    },
-    "crnagora": {
-        "name": "Instal M (Ivan Mujović)",
-        "email": "office@instalm.me",
-        "phone": "+382 67 423 237",
-        "telegram": "@ivanmujovic"
-    }
-}
-
-MICROMA = {
-    "name": "Microma",
-    "contact": "Borislav Dakić",
-    "email": "office@microma.rs",
-    "phone": "+381 63 582068",
-    "website": "https://microma.rs"
-}
-
-(
-    SELECT_LANGUAGE,
-    SELECT_COUNTRY,
-    SELECT_SERVICE,
-    SELECT_HEATING_TYPE,
-    ENTER_SURFACE,
-    ENTER_FLOORS,
-    SELECT_OBJECT_TYPE,
-    ASK_FOR_SKETCH,
-    RECEIVE_SKETCH,
-    ENTER_CONTACT_INFO,
-    SELECT_HP_TYPE,
-    FINAL_CONFIRMATION
-) = range(12)
-
-MESSAGES = {
-    "sr": {
-        "welcome": "Dobrodošli! Molimo izaberite jezik:\nWelcome! Please choose a language:\nДобро пожаловать! Пожалуйста, выберите язык:",
-        "choose_language": "Molimo izaberite jezik:",
-        "choose_country": "Molimo izaberite zemlju:",
-        "country_srbija": "Srbija",
-        "country_crnagora": "Crna Gora",
-        "select_service": "Šta vas zanima?",
-        "service_heating": "Grejna instalacija",
-        "service_hp": "Toplotna pumpa",
-        "srbija_contractor_info_heating": (
-            f"Za grejne instalacije u Srbiji, vaš izvođač radova je {CONTRACTORS['srbija']['name']}.\n"
-            f"Kontakt: Email: {CONTRACTORS['srbija']['email']}, Telefon: {CONTRACTORS['srbija']['phone']}"
-            f" (Telegram: {CONTRACTORS['srbija']['telegram']})."
-        ),
-        "crnagora_contractor_info_heating": (
-            f"Za grejne instalacije u Crnoj Gori, vaš izvođač radova je {CONTRACTORS['crnagora']['name']}.\n"
-            f"Kontakt: Email: {CONTRACTORS['crnagora']['email']}, Telefon: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "srbija_microma_info_hp": (
-            f"Za toplotne pumpe u Srbiji, partner je firma {MICROMA['name']}.\n"
-            f"Kontakt osoba: {MICROMA['contact']}, Email: {MICROMA['email']}, Telefon: {MICROMA['phone']}.\n"
-            f"Više informacija možete pronaći na: {MICROMA['website']}."
-        ),
-        "crnagora_instalm_info_hp": (
-            f"Za toplotne pumpe u Crnoj Gori, partner je firma {CONTRACTORS['crnagora']['name']}.\n"
-            f"Kontakt: Email: {CONTRACTORS['crnagora']['email']}, Telefon: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "select_heating_type": "Molimo izaberite tip grejne instalacije:",
-        "heating_radiators": "Radijatori",
-        "heating_fancoil": "Fancoil-i",
-        "heating_underfloor": "Podno grejanje",
-        "heating_underfloor_fancoil": "Podno grejanje + Fancoil-i",
-        "heating_complete_hp": "Komplet ponuda sa toplotnom pumpom",
-        "enter_surface": "Molimo unesite površinu objekta u kvadratnim metrima (samo broj, npr. 120):",
-        "surface_invalid": "Neispravan unos. Molimo unesite samo broj za površinu objekta u kvadratnim metrima.",
-        "enter_floors": "Molimo unesite broj spratova objekta (samo broj, npr. 2):",
-        "floors_invalid": "Neispravan unos. Molimo unesite samo broj za broj spratova.",
-        "select_object_type": "Koja je vrsta objekta?",
-        "object_house": "Kuća",
-        "object_apartment": "Stan",
-        "object_commercial": "Poslovni prostor",
-        "object_other": "Drugo",
-        "ask_for_sketch": "Da li želite da priložite skicu objekta?",
-        "yes": "Da",
-        "no": "Ne",
-        "upload_sketch": "Molimo priložite skicu (sliku ili dokument).",
-        "skip_sketch": "Preskačem prilaganje skice.",
-        "enter_contact_info": (
-            "Molimo unesite vaš kontakt telefon i/ili email adresu, kako bismo vas lakše kontaktirali.\n"
-            "(Npr: +3816x xxx xxxx, mejl@primer.com)"
-        ),
-        "select_hp_type_srbija": "Molimo izaberite tip toplotne pumpe:",
-        "hp_water_water": "Voda-Voda",
-        "hp_air_water": "Vazduh-Voda",
-        "select_hp_type_crnagora": "Molimo izaberite tip toplotne pumpe:",
-        "thank_you_heating": (
-            "Hvala! Vaš upit za grejnu instalaciju je poslat."
-            " Očekujte da vas izvođač radova kontaktira uskoro."
-        ),
-        "thank_you_hp": (
-            "Hvala! Vaš upit za toplotnu pumpu je poslat."
-            " Očekujte da vas kontaktiraju predstavnici firme."
-        ),
-        "error_sending_email": "Došlo je do greške prilikom slanja upita. Molimo pokušajte ponovo kasnije.",
-        "something_went_wrong": "Došlo je do greške. Molimo pokušajte ponovo sa /start.",
-        "choose_option": "Molimo izaberite jednu od ponuđenih opcija.",
-        "start_over": "Započnite ponovo sa /start.",
-    },
-    "en": {
-        "welcome": "Dobrodošli! Molimo izaberite jezik:\nWelcome! Please choose a language:\nДобро пожаловать! Пожалуйста, выберите язык:",
-        "choose_language": "Please choose a language:",
-        "choose_country": "Please choose a country:",
-        "country_srbija": "Serbia",
-        "country_crnagora": "Montenegro",
-        "select_service": "What are you interested in?",
-        "service_heating": "Heating Installation",
-        "service_hp": "Heat Pump",
-        "srbija_contractor_info_heating": (
-            f"For heating installations in Serbia, your contractor is {CONTRACTORS['srbija']['name']}.\n"
-            f"Contact: Email: {CONTRACTORS['srbija']['email']}, Phone: {CONTRACTORS['srbija']['phone']}"
-            f" (Telegram: {CONTRACTORS['srbija']['telegram']})."
-        ),
-        "crnagora_contractor_info_heating": (
-            f"For heating installations in Montenegro, your contractor is {CONTRACTORS['crnagora']['name']}.\n"
-            f"Contact: Email: {CONTRACTORS['crnagora']['email']}, Phone: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "srbija_microma_info_hp": (
-            f"For heat pumps in Serbia, our partner is {MICROMA['name']}.\n"
-            f"Contact person: {MICROMA['contact']}, Email: {MICROMA['email']}, Phone: {MICROMA['phone']}.\n"
-            f"More info: {MICROMA['website']}."
-        ),
-        "crnagora_instalm_info_hp": (
-            f"For heat pumps in Montenegro, our partner is {CONTRACTORS['crnagora']['name']}.\n"
-            f"Contact: Email: {CONTRACTORS['crnagora']['email']}, Phone: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "select_heating_type": "Please select the type of heating installation:",
-        "heating_radiators": "Radiators",
-        "heating_fancoil": "Fancoils",
-        "heating_underfloor": "Underfloor Heating",
-        "heating_underfloor_fancoil": "Underfloor Heating + Fancoils",
-        "heating_complete_hp": "Complete offer with Heat Pump",
-        "enter_surface": "Please enter the object's surface area in square meters (number only, e.g., 120):",
-        "surface_invalid": "Invalid input. Please enter a number for the object's surface area in square meters.",
-        "enter_floors": "Please enter the number of floors of the object (number only, e.g., 2):",
-        "floors_invalid": "Invalid input. Please enter a number for the number of floors.",
-        "select_object_type": "What is the type of the object?",
-        "object_house": "House",
-        "object_apartment": "Apartment",
-        "object_commercial": "Commercial Space",
-        "object_other": "Other",
-        "ask_for_sketch": "Would you like to attach a sketch of the object?",
-        "yes": "Yes",
-        "no": "No",
-        "upload_sketch": "Please attach the sketch (image or document).",
-        "skip_sketch": "Skip attaching sketch.",
-        "enter_contact_info": (
-            "Please enter your contact phone number and/or email address, so we can contact you easily.\n"
-            "(E.g.: +3816x xxx xxxx, email@example.com)"
-        ),
-        "select_hp_type_srbija": "Please select the heat pump type:",
-        "hp_water_water": "Water-Water",
-        "hp_air_water": "Air-Water",
-        "select_hp_type_crnagora": "Please select the heat pump type:",
-        "thank_you_heating": (
-            "Thank you! Your heating installation inquiry has been sent."
-            " The contractor will contact you soon."
-        ),
-        "thank_you_hp": (
-            "Thank you! Your heat pump inquiry has been sent."
-            " Company representatives will contact you soon."
-        ),
-        "error_sending_email": "An error occurred while sending the inquiry. Please try again later.",
-        "something_went_wrong": "Something went wrong. Please try again with /start.",
-        "choose_option": "Please choose one of the provided options.",
-        "start_over": "Start over with /start.",
-    },
-    "ru": {
-        "welcome": "Добро пожаловать! Выберите язык:",
-        "choose_language": "Пожалуйста, выберите язык:",
-        "choose_country": "Пожалуйста, выберите страну:",
-        "country_srbija": "Сербия",
-        "country_crnagora": "Черногория",
-        "select_service": "Что вас интересует?",
-        "service_heating": "Система отопления",
-        "service_hp": "Тепловой насос",
-        "srbija_contractor_info_heating": (
-            f"Для систем отопления в Сербии, ваш подрядчик - {CONTRACTORS['srbija']['name']}.\n"
-            f"Контакты: Email: {CONTRACTORS['srbija']['email']}, Телефон: {CONTRACTORS['srbija']['phone']}"
-            f" (Telegram: {CONTRACTORS['srbija']['telegram']})."
-        ),
-        "crnagora_contractor_info_heating": (
-            f"Для систем отопления в Черногории, ваш подрядчик - {CONTRACTORS['crnagora']['name']}.\n"
-            f"Контакты: Email: {CONTRACTORS['crnagora']['email']}, Телефон: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "srbija_microma_info_hp": (
-            f"Для тепловых насосов в Сербии, наш партнер - компания {MICROMA['name']}.\n"
-            f"Контактное лицо: {MICROMA['contact']}, Email: {MICROMA['email']}, Телефон: {MICROMA['phone']}.\n"
-            f"Больше информации: {MICROMA['website']}."
-        ),
-        "crnagora_instalm_info_hp": (
-            f"Для тепловых насосов в Черногории, наш партнер - компания {CONTRACTORS['crnagora']['name']}.\n"
-            f"Контакты: Email: {CONTRACTORS['crnagora']['email']}, Телефон: {CONTRACTORS['crnagora']['phone']}"
-            f" (Telegram: {CONTRACTORS['crnagora']['telegram']})."
-        ),
-        "select_heating_type": "Пожалуйста, выберите тип системы отопления:",
-        "heating_radiators": "Радиаторы",
-        "heating_fancoil": "Фанкойлы",
-        "heating_underfloor": "Подогрев пола",
-        "heating_underfloor_fancoil": "Подогрев пола + Фанкойлы",
-        "heating_complete_hp": "Полное предложение с тепловым насосом",
-        "enter_surface": "Пожалуйста, введите площадь объекта в квадратных метрах (только число, например, 120):",
-        "surface_invalid": "Неверный ввод. Пожалуйста, введите только число для площади объекта в квадратных метрах.",
-        "enter_floors": "Пожалуйста, введите количество этажей объекта (только число, например, 2):",
-        "floors_invalid": "Неверный ввод. Пожалуйста, введите только число для количества этажей.",
-        "select_object_type": "Какой тип объекта?",
-        "object_house": "Дом",
-        "object_apartment": "Квартира",
-        "object_commercial": "Коммерческое помещение",
-        "object_other": "Другое",
-        "ask_for_sketch": "Вы хотите прикрепить эскиз объекта?",
-        "yes": "Да",
-        "no": "Нет",
-        "upload_sketch": "Пожалуйста, прикрепите эскиз (изображение или документ).",
-        "skip_sketch": "Пропустить прикрепление эскиза.",
-        "enter_contact_info": (
-            "Пожалуйста, введите ваш контактный телефон и/или адрес электронной почты, чтобы мы могли легко с вами связаться.\n"
-            "(Например: +3816x xxx xxxx, email@example.com)"
-        ),
-        "select_hp_type_srbija": "Пожалуйста, выберите тип теплового насоса:",
-        "hp_water_water": "Вода-Вода",
-        "hp_air_water": "Воздух-Вода",
-        "select_hp_type_crnagora": "Пожалуйста, выберите тип теплового насоса:",
-        "thank_you_heating": (
-            "Спасибо! Ваш запрос на систему отопления был отправлен."
-            " Подрядчик свяжется с вами в ближайшее время."
-        ),
-        "thank_you_hp": (
-            "Спасибо! Ваш запрос на тепловой насос был отправлен."
-            " Представители компании свяжутся с вами в ближайшее время."
-        ),
-        "error_sending_email": "Произошла ошибка при отправке запроса. Пожалуйста, попробуйте еще раз позже.",
-        "something_went_wrong": "Что-то пошло не так. Пожалуйста, попробуйте снова с /start.",
-        "choose_option": "Пожалуйста, выберите один из предложенных вариантов.",
-        "start_over": "Начать заново с /start.",
-    }
-}
+# Tastature se prave jednom po jeziku i zatim samo ponovo koriste
+KEYBOARDS = KeyboardRegistry(t)
 
 async def start(update: Update, context):
     """Šalje pozdravnu poruku i traži izbor jezika."""
-    keyboard = [
-        [InlineKeyboardButton("Srpski", callback_data="lang_sr")],
-        [InlineKeyboardButton("English", callback_data="lang_en")],
-        [InlineKeyboardButton("Русский", callback_data="lang_ru")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(MESSAGES["sr"]["welcome"], reply_markup=reply_markup)
+    context.bot_data['sketch_prefetcher'].cancel(update.effective_user.id)
+    FUNNEL_STARTED.inc()
+    context.user_data['inquiry'] = Inquiry()
+    await update.message.reply_text(t("sr", "welcome"), reply_markup=KEYBOARDS.get("language"))
     return SELECT_LANGUAGE
 
-async def select_language(update: Update, context):
-    """Hvata izbor jezika i traži izbor zemlje."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = query.data.split('_')[1]
-    
-    context.user_data['language'] = lang_code
-    logger.info(f"User {update.effective_user.id} selected language: {lang_code}")
-    
-    keyboard = [
-        [InlineKeyboardButton(MESSAGES[lang_code]["country_srbija"], callback_data="country_srbija")],
-        [InlineKeyboardButton(MESSAGES[lang_code]["country_crnagora"], callback_data="country_crnagora")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text=MESSAGES[lang_code]["choose_country"], reply_markup=reply_markup)
-    return SELECT_COUNTRY
-
-async def select_country(update: Update, context):
-    """Hvata izbor zemlje i nudi izbor usluge (grejanje/toplotna pumpa)."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    
-    country = query.data.split('_')[1]
-    context.user_data['country'] = country
-    logger.info(f"User {update.effective_user.id} selected country: {country}")
-
-    keyboard = [
-        [InlineKeyboardButton(MESSAGES[lang_code]["service_heating"], callback_data="service_heating")],
-        [InlineKeyboardButton(MESSAGES[lang_code]["service_hp"], callback_data="service_hp")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text=MESSAGES[lang_code]["select_service"], reply_markup=reply_markup)
-    return SELECT_SERVICE
-
-async def select_service(update: Update, context):
-    """Hvata izbor usluge i preusmerava."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    service = query.data.split('_')[1]
-    context.user_data['service'] = service
-    logger.info(f"User {update.effective_user.id} selected service: {service}")
-
-    if service == "heating":
-        country = context.user_data['country']
-        if country == "srbija":
-            await query.edit_message_text(text=MESSAGES[lang_code]["srbija_contractor_info_heating"])
-            contractor_data = CONTRACTORS['srbija']
-        else: # crnagora
-            await query.edit_message_text(text=MESSAGES[lang_code]["crnagora_contractor_info_heating"])
-            contractor_data = CONTRACTORS['crnagora']
-        
-        context.user_data['recipient_email'] = contractor_data['email']
-        context.user_data['recipient_name'] = contractor_data['name']
-
-        keyboard = [
-            [InlineKeyboardButton(MESSAGES[lang_code]["heating_radiators"], callback_data="heating_radiators")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["heating_fancoil"], callback_data="heating_fancoil")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["heating_underfloor"], callback_data="heating_underfloor")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["heating_underfloor_fancoil"], callback_data="heating_underfloor_fancoil")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["heating_complete_hp"], callback_data="heating_complete_hp")], # ISPRAVLJENO OVDJE
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await context.bot.send_message(chat_id=query.message.chat_id, text=MESSAGES[lang_code]["select_heating_type"], reply_markup=reply_markup)
-        return SELECT_HEATING_TYPE
-    
-    elif service == "hp":
-        country = context.user_data['country']
-        if country == "srbija":
-            await query.edit_message_text(text=MESSAGES[lang_code]["srbija_microma_info_hp"])
-            context.user_data['recipient_email'] = MICROMA['email']
-            context.user_data['recipient_name'] = MICROMA['name']
-            
-            keyboard = [
-                [InlineKeyboardButton(MESSAGES[lang_code]["hp_water_water"], callback_data="hp_water_water")],
-                [InlineKeyboardButton(MESSAGES[lang_code]["hp_air_water"], callback_data="hp_air_water")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await context.bot.send_message(chat_id=query.message.chat_id, text=MESSAGES[lang_code]["select_hp_type_srbija"], reply_markup=reply_markup)
-            return SELECT_HP_TYPE
-        else: # crnagora
-            await query.edit_message_text(text=MESSAGES[lang_code]["crnagora_instalm_info_hp"])
-            context.user_data['recipient_email'] = CONTRACTORS['crnagora']['email']
-            context.user_data['recipient_name'] = CONTRACTORS['crnagora']['name']
-
-            keyboard = [
-                [InlineKeyboardButton(MESSAGES[lang_code]["hp_air_water"], callback_data="hp_air_water")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await context.bot.send_message(chat_id=query.message.chat_id, text=MESSAGES[lang_code]["select_hp_type_crnagora"], reply_markup=reply_markup)
-            return SELECT_HP_TYPE
-
-async def select_heating_type(update: Update, context):
-    """Hvata tip grejne instalacije i traži površinu objekta."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    heating_type_key = query.data # Uzmi ceo callback_data string
-    
-    if heating_type_key in MESSAGES[lang_code]:
-        context.user_data['heating_type'] = MESSAGES[lang_code][heating_type_key]
-    else:
-        logger.warning(f"Nepoznat heating_type_key: {heating_type_key} za jezik: {lang_code}")
-        context.user_data['heating_type'] = "N/A - Unknown Heating Type"
-
-    logger.info(f"User {update.effective_user.id} selected heating type: {context.user_data['heating_type']}")
-    await query.edit_message_text(text=MESSAGES[lang_code]["enter_surface"])
-    return ENTER_SURFACE
-
-async def select_hp_type(update: Update, context):
-    """Hvata tip toplotne pumpe i, ako je toplotna pumpa za CG, ide na unos kontakt podataka, inače ide na unos površine."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    
-    hp_type_key = query.data # Uzmi ceo callback_data string, npr. "hp_water_water"
-    
-    if hp_type_key in MESSAGES[lang_code]:
-        context.user_data['hp_type'] = MESSAGES[lang_code][hp_type_key]
-    else:
-        logger.warning(f"Nepoznat hp_type_key: {hp_type_key} za jezik: {lang_code}")
-        context.user_data['hp_type'] = "N/A - Unknown HP Type"
+async def announce_partner(update: Update, context):
+    """Akcija pri izboru usluge: umesto dugmadi prikazuje podatke partnera koji preuzima upit."""
+    inquiry = current_inquiry(context.user_data)
+    route = context.bot_data['routing'].route(inquiry.country, inquiry.service)
+    await update.callback_query.edit_message_text(text=t(inquiry.language, route.info, **route.partner))
+    return True
 
-    logger.info(f"User {update.effective_user.id} selected HP type: {context.user_data['hp_type']}")
+async def skip_sketch(update: Update, context):
+    """Akcija kada korisnik ne prilaže skicu."""
+    inquiry = current_inquiry(context.user_data)
+    inquiry.sketch_declined = True
+    inquiry.sketch_file_id = inquiry.sketch_file_name = None
+    return False
 
-    if context.user_data['country'] == "crnagora":
-        await query.edit_message_text(text=MESSAGES[lang_code]["enter_contact_info"])
-        return ENTER_CONTACT_INFO
-    else:
-        await query.edit_message_text(text=MESSAGES[lang_code]["enter_surface"])
-        return ENTER_SURFACE
-
-async def enter_surface(update: Update, context):
-    """Prima površinu objekta i traži broj spratova."""
-    lang_code = context.user_data.get('language', 'sr')
-    user_input = update.message.text
-    try:
-        surface = int(user_input)
-        context.user_data['surface'] = surface
-        logger.info(f"User {update.effective_user.id} entered surface: {surface} m²")
-        await update.message.reply_text(MESSAGES[lang_code]["enter_floors"])
-        return ENTER_FLOORS
-    except ValueError:
-        logger.warning(f"User {update.effective_user.id} entered invalid surface: '{user_input}'")
-        await update.message.reply_text(MESSAGES[lang_code]["surface_invalid"])
-        return ENTER_SURFACE
-
-async def enter_floors(update: Update, context):
-    """Prima broj spratova i traži vrstu objekta."""
-    lang_code = context.user_data.get('language', 'sr')
-    user_input = update.message.text
-    try:
-        floors = int(user_input)
-        context.user_data['floors'] = floors
-        logger.info(f"User {update.effective_user.id} entered floors: {floors}")
-        
-        keyboard = [
-            [InlineKeyboardButton(MESSAGES[lang_code]["object_house"], callback_data="object_house")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["object_apartment"], callback_data="object_apartment")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["object_commercial"], callback_data="object_commercial")],
-            [InlineKeyboardButton(MESSAGES[lang_code]["object_other"], callback_data="object_other")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(MESSAGES[lang_code]["select_object_type"], reply_markup=reply_markup)
-        return SELECT_OBJECT_TYPE
-    except ValueError:
-        logger.warning(f"User {update.effective_user.id} entered invalid floors: '{user_input}'")
-        await update.message.reply_text(MESSAGES[lang_code]["floors_invalid"])
-        return ENTER_FLOORS
-
-async def select_object_type(update: Update, context):
-    """Hvata vrstu objekta i pita za skicu."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    object_type_key = query.data # Uzmi ceo callback_data string
-    
-    if object_type_key in MESSAGES[lang_code]:
-        context.user_data['object_type'] = MESSAGES[lang_code][object_type_key]
-    else:
-        logger.warning(f"Nepoznat object_type_key: {object_type_key} za jezik: {lang_code}")
-        context.user_data['object_type'] = "N/A - Unknown Object Type"
-
-    logger.info(f"User {update.effective_user.id} selected object type: {context.user_data['object_type']}")
-
-    keyboard = [
-        [InlineKeyboardButton(MESSAGES[lang_code]["yes"], callback_data="ask_sketch_yes")],
-        [InlineKeyboardButton(MESSAGES[lang_code]["no"], callback_data="ask_sketch_no")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(text=MESSAGES[lang_code]["ask_for_sketch"], reply_markup=reply_markup)
-    return ASK_FOR_SKETCH
-
-async def ask_for_sketch(update: Update, context):
-    """Rukuje odgovorom na pitanje o skici."""
-    query = update.callback_query
-    await query.answer()
-    lang_code = context.user_data.get('language', 'sr')
-    
-    if query.data == "ask_sketch_yes":
-        logger.info(f"User {update.effective_user.id} chose to attach sketch.")
-        await query.edit_message_text(text=MESSAGES[lang_code]["upload_sketch"])
-        return RECEIVE_SKETCH
-    else: # ask_sketch_no
-        context.user_data['sketch_info'] = MESSAGES[lang_code]["skip_sketch"]
-        context.user_data['sketch_file_id'] = None
-        logger.info(f"User {update.effective_user.id} chose NOT to attach sketch.")
-        await query.edit_message_text(text=MESSAGES[lang_code]["enter_contact_info"])
-        return ENTER_CONTACT_INFO
+# Tok iz flow.py, kompajliran jednom pri pokretanju
+FLOW = FlowTable()
+ENGINE = FlowEngine(FLOW, t, KEYBOARDS, actions={"announce_partner": announce_partner, "skip_sketch": skip_sketch})
 
 async def receive_sketch(update: Update, context):
     """Prima skicu i traži kontakt podatke."""
-    lang_code = context.user_data.get('language', 'sr')
-    
-    file_id = None
-    file_name = "N/A"
+    inquiry = current_inquiry(context.user_data)
+
     if update.message.document:
-        file_id = update.message.document.file_id
-        file_name = update.message.document.file_name
-        context.user_data['sketch_info'] = f"Korisnik je priložio dokument: {file_name} (File ID: {file_id})"
-        logger.info(f"User {update.effective_user.id} uploaded document: {file_name} (ID: {file_id})")
+        inquiry.sketch_file_id = update.message.document.file_id
+        inquiry.sketch_file_name = update.message.document.file_name
+        inquiry.sketch_photo = False
+        logger.debug("User %s uploaded document: %s (ID: %s)",
+                     update.effective_user.id, inquiry.sketch_file_name, inquiry.sketch_file_id)
     elif update.message.photo:
-        file_id = update.message.photo[-1].file_id
-        context.user_data['sketch_info'] = f"Korisnik je priložio sliku (File ID: {file_id})"
-        file_name = f"photo_{file_id}.jpg"
-        logger.info(f"User {update.effective_user.id} uploaded photo (ID: {file_id})")
+        inquiry.sketch_file_id = update.message.photo[-1].file_id
+        inquiry.sketch_file_name = f"photo_{inquiry.sketch_file_id}.jpg"
+        inquiry.sketch_photo = True
+        logger.debug("User %s uploaded photo (ID: %s)", update.effective_user.id, inquiry.sketch_file_id)
     else:
-        logger.warning(f"User {update.effective_user.id} sent message not a document or photo in RECEIVE_SKETCH: {update.message.text}")
-        await update.message.reply_text(MESSAGES[lang_code]["upload_sketch"])
+        logger.warning("User %s sent message not a document or photo in RECEIVE_SKETCH: %s", update.effective_user.id, update.message.text)
+        await update.message.reply_text(t(inquiry.language, "upload_sketch"))
         return RECEIVE_SKETCH
     
-    context.user_data['sketch_file_id'] = file_id
+    # Skica se preuzima dok korisnik unosi kontakt, da slanje upita ne ceka na Telegram
+    context.bot_data['sketch_prefetcher'].start(
+        context.bot, update.effective_user.id, inquiry.sketch_file_id, inquiry.sketch_file_name
+    )
     
-    await update.message.reply_text(MESSAGES[lang_code]["enter_contact_info"])
+    await update.message.reply_text(t(inquiry.language, "enter_contact_info"))
     return ENTER_CONTACT_INFO
 
 async def enter_contact_info(update: Update, context):
     """Prima kontakt podatke i šalje upit."""
-    lang_code = context.user_data.get('language', 'sr')
-    context.user_data['contact_info'] = update.message.text
+    inquiry = current_inquiry(context.user_data)
+    lang_code = inquiry.language
     user = update.message.from_user
 
-    service_type = context.user_data.get('service', 'N/A')
-    heating_type = context.user_data.get('heating_type', 'N/A')
-    country = context.user_data.get('country', 'N/A')
-
-    if service_type == "heating" and heating_type == MESSAGES[lang_code]["heating_complete_hp"]:
-        subject = f"Novi upit od Telegram bota - KOMPLETNA PONUDA (Grejanje + TP) - {country.upper()}"
-    else:
-        subject = f"Novi upit od Telegram bota - {service_type.upper()} - {country.upper()}"
-
-    body = [
-        f"Korisnicko ime Telegrama: @{user.username or 'N/A'} (ID: {user.id})",
-        f"Izabrani jezik: {lang_code}",
-        f"Izabrana zemlja: {country.capitalize()}",
-        f"Tip upita: {MESSAGES[lang_code][f'service_{service_type}']}"
-    ]
-
-    if service_type == "heating":
-        body.append(f"Tip grejne instalacije: {heating_type}")
-        body.append(f"Povrsina objekta: {context.user_data.get('surface', 'N/A')} m²")
-        body.append(f"Broj spratova: {context.user_data.get('floors', 'N/A')}")
-        body.append(f"Vrsta objekta: {context.user_data.get('object_type', 'N/A')}")
-        body.append(f"Skica objekta: {context.user_data.get('sketch_info', 'Nije prilozena')}")
-    elif service_type == "hp":
-        body.append(f"Tip toplotne pumpe: {context.user_data.get('hp_type', 'N/A')}")
-        if country == "srbija":
-            body.append(f"Povrsina objekta: {context.user_data.get('surface', 'N/A')} m²")
-            body.append(f"Broj spratova: {context.user_data.get('floors', 'N/A')}")
-            body.append(f"Vrsta objekta: {context.user_data.get('object_type', 'N/A')}")
-            body.append(f"Skica objekta: {context.user_data.get('sketch_info', 'Nije prilozena')}")
-
-    body.append(f"Kontakt podaci korisnika: {context.user_data.get('contact_info', 'N/A')}")
-    
-    email_body_string = "\n".join(body) 
-
-    logger.info(f"User {user.id} - Preparing email. Full context.user_data: {context.user_data}")
-    logger.info(f"Email body content to be sent:\n{email_body_string}")
+    contact = extract_contact(update.message.text, inquiry.country)
+    if not contact:
+        logger.warning("User %s entered contact info without a phone number or email.", user.id)
+        await update.message.reply_text(t(lang_code, "contact_invalid"))
+        return ENTER_CONTACT_INFO
+    inquiry.contact_info = update.message.text
+    inquiry.contact_phones = contact.phones
+    inquiry.contact_emails = contact.emails
+
+    route = context.bot_data['routing'].route(inquiry.country, inquiry.service, inquiry.heating_type)
+    inquiry_email = inquiry.email(user, route.recipients)
+
+    dedup = context.bot_data['dedup']
+    result, earlier_key = dedup.check(user.id, contact.key, inquiry.service, inquiry.country, inquiry_email)
+    INQUIRIES_FILTERED.inc(result)
+    if result in (DUPLICATE, THROTTLED):
+        logger.info("Inquiry from user %s not dispatched: %s.", user.id, result)
+        context.bot_data['sketch_prefetcher'].cancel(user.id)
+        await update.message.reply_text(
+            t(lang_code, "inquiry_already_received" if result == DUPLICATE else "too_many_inquiries")
+        )
+        context.user_data.clear()
+        return ConversationHandler.END
 
+    # Upit se prvo trajno upisuje u outbox; slanje ide u pozadini, uz ponovne pokusaje.
+    outbox = context.bot_data['outbox']
     try:
-        yag = yagmail.SMTP(EMAIL_SENDER_ADDRESS, EMAIL_SENDER_PASSWORD)
-        
-        recipients = [context.user_data['recipient_email']]
-        
-        if service_type == "heating" and heating_type == MESSAGES[lang_code]["heating_complete_hp"]:
-            if country == "srbija":
-                recipients.append(MICROMA['email'])
-                logger.info(f"Complete HP offer in Serbia: Adding {MICROMA['email']} to recipients.")
-        
-        attachments = []
-        temp_file_path = None
-        if context.user_data.get('sketch_file_id'): 
-            try:
-                file_id = context.user_data['sketch_file_id']
-                telegram_file = await context.bot.get_file(file_id)
-                
-                file_extension = ""
-                # Koristi update.message.document ili update.message.photo za odredjivanje ekstenzije
-                if update.message.document:
-                    file_extension = os.path.splitext(update.message.document.file_name)[1]
-                elif update.message.photo:
-                    file_extension = ".jpg" # Default for photos, Telegram doesn't provide original name
-                    
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                    temp_file_path = temp_file.name
-                
-                await telegram_file.download_to_drive(custom_path=temp_file_path)
-                attachments.append(temp_file_path)
-                logger.info(f"Sketch attached: {temp_file_path}")
-            except Exception as e:
-                logger.error(f"Greska pri preuzimanju/prilaganju skice za korisnika {user.id}: {e}")
-                email_body_string += "\n\nNAPOMENA: Doslo je do greske prilikom preuzimanja prilozene skice."
-                if 'temp_file_path' in locals() and temp_file_path and os.path.exists(temp_file_path):
-                     os.remove(temp_file_path)
-                attachments = []
-        
-        yag.send(
-            to=recipients,
-            bcc=BCC_EMAIL,
-            subject=subject,
-            contents=email_body_string,
-            attachments=attachments
+        outbox_key = earlier_key
+        if result != MERGED or not await outbox.merge(earlier_key, inquiry_email, merge_inquiries):
+            outbox_key = f"{user.id}-{update.update_id}"
+            # Raniji upit je vec poslat, pa partner dobija dopunu kao odgovor na taj email
+            email = amend_inquiry(inquiry_email, earlier_key) if result == MERGED else inquiry_email
+            await outbox.add(outbox_key, email, delay=config.INQUIRY_MERGE_DELAY)
+    except Exception as e:
+        logger.error("Greska pri upisu upita u outbox za korisnika %s: %s", user.id, e, exc_info=True)
+        await update.message.reply_text(t(lang_code, "error_sending_email"))
+        context.bot_data['admin_notifier'].notify(
+            f"GREŠKA PRI SLANJU MAILA! Korisnik @{user.username} (ID: {user.id}) je pokusao da posalje upit, ali je doslo do greske: {e}",
+            urgent=True,
         )
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            logger.info(f"Temporary sketch file deleted: {temp_file_path}")
-
-
-        logger.info(f"Upit uspesno poslat na {', '.join(recipients)} sa BCC na {BCC_EMAIL}.")
-        
-        if service_type == "heating":
-            await update.message.reply_text(MESSAGES[lang_code]["thank_you_heating"])
+    else:
+        dedup.record(user.id, contact.key, inquiry.service, inquiry.country, inquiry_email, outbox_key)
+        context.bot_data['leads'].record(Lead.from_inquiry(user.id, inquiry, merged=result == MERGED))
+        FUNNEL_COMPLETED.inc(inquiry.service, inquiry.country)
+        if inquiry.service == Service.HEATING:
+            await update.message.reply_text(t(lang_code, "thank_you_heating"))
         else:
-            await update.message.reply_text(MESSAGES[lang_code]["thank_you_hp"])
-        
-        if ADMIN_TELEGRAM_ID:
-            try:
-                admin_message = f"**NOVI UPIT PRIMLJEN!**\n\n" \
-                                f"Od: @{user.username or 'N/A'} (ID: {user.id})\n" \
-                                f"Jezik: {lang_code}\n" \
-                                f"Zemlja: {country.capitalize()}\n" \
-                                f"Tip upita: {MESSAGES[lang_code][f'service_{service_type}']}\n"
-                
-                if service_type == "heating":
-                    admin_message += f"Tip grejanja: {heating_type}\n"
-                    admin_message += f"Povrsina: {context.user_data.get('surface', 'N/A')} m²\n"
-                    admin_message += f"Spratovi: {context.user_data.get('floors', 'N/A')}\n"
-                    admin_message += f"Vrsta objekta: {context.user_data.get('object_type', 'N/A')}\n"
-                    admin_message += f"Skica: {'Prilozena' if context.user_data.get('sketch_file_id') else 'Nije prilozena'}\n"
-                elif service_type == "hp":
-                    admin_message += f"Tip toplotne pumpe: {context.user_data.get('hp_type', 'N/A')}\n"
-                    if country == "srbija": # Only for Serbia HP has these additional details
-                        admin_message += f"Povrsina: {context.user_data.get('surface', 'N/A')} m²\n"
-                        admin_message += f"Spratovi: {context.user_data.get('floors', 'N/A')}\n"
-                        admin_message += f"Vrsta objekta: {context.user_data.get('object_type', 'N/A')}\n"
-                        admin_message += f"Skica: {'Prilozena' if context.user_data.get('sketch_file_id') else 'Nije prilozena'}\n"
-
-                admin_message += f"Kontakt: {context.user_data.get('contact_info', 'N/A')}\n\n" \
-                                 f"Email poslat na: {', '.join(recipients)}"
-                
-                await context.bot.send_message(chat_id=ADMIN_TELEGRAM_ID, text=admin_message, parse_mode='Markdown')
-                if attachments:
-                    await context.bot.send_message(chat_id=ADMIN_TELEGRAM_ID, text="Skica je prilozena (pogledajte originalni mejl).")
-            except Exception as e:
-                logger.warning(f"Nije moguce poslati admin notifikaciju: {e}")
-
-
-    except Exception as e:
-        logger.error(f"Greska pri slanju emaila za korisnika {user.id}: {e}", exc_info=True)
-        await update.message.reply_text(MESSAGES[lang_code]["error_sending_email"])
-        if ADMIN_TELEGRAM_ID:
-            await context.bot.send_message(chat_id=ADMIN_TELEGRAM_ID, text=f"GREŠKA PRI SLANJU MAILA! Korisnik @{user.username} (ID: {user.id}) je pokusao da posalje upit, ali je doslo do greske: {e}")
+            await update.message.reply_text(t(lang_code, "thank_you_hp"))
 
     context.user_data.clear()
     return ConversationHandler.END
 
 async def cancel(update: Update, context):
     """Omogućava korisniku da prekine konverzaciju."""
-    lang_code = context.user_data.get('language', 'sr')
-    logger.info(f"User {update.effective_user.id} cancelled conversation.")
-    await update.message.reply_text(MESSAGES[lang_code]["start_over"])
+    lang_code = current_inquiry(context.user_data).language
+    logger.debug("User %s cancelled conversation.", update.effective_user.id)
+    FUNNEL_ABANDONED.inc(context.user_data.get('last_step', 'unknown'))
+    context.bot_data['sketch_prefetcher'].cancel(update.effective_user.id)
+    await update.message.reply_text(t(lang_code, "start_over"))
     context.user_data.clear()
     return ConversationHandler.END
 
 async def fallback(update: Update, context):
     """Hvata neprepoznate poruke."""
-    lang_code = context.user_data.get('language', 'sr')
-    logger.warning(f"User {update.effective_user.id} sent unknown message: {update.message.text}")
-    await update.message.reply_text(MESSAGES[lang_code]["choose_option"])
+    lang_code = current_inquiry(context.user_data).language
+    logger.warning("User %s sent unknown message: %s", update.effective_user.id, update.message.text)
+    FUNNEL_ABANDONED.inc(context.user_data.get('last_step', 'unknown'))
+    context.bot_data['sketch_prefetcher'].cancel(update.effective_user.id)
+    await update.message.reply_text(t(lang_code, "choose_option"))
     context.user_data.clear()
     return ConversationHandler.END
 
 async def error_handler(update: Update, context):
     """Log the error and send a message to the user."""
     logger.error("Exception while handling an update:", exc_info=context.error)
-    lang_code = context.user_data.get('language', 'sr')
-    if update.effective_message:
-        await update.effective_message.reply_text(MESSAGES[lang_code]["something_went_wrong"])
-    context.user_data.clear()
+    lang_code = language_of(context.user_data)
+    if isinstance(update, Update) and update.effective_user:
+        context.bot_data['sketch_prefetcher'].cancel(update.effective_user.id)
+    if context.user_data:
+        FUNNEL_ABANDONED.inc(context.user_data.get('last_step', 'unknown'))
+    # Za greske u poslovima iz JobQueue-a update je None, a user_data postoji samo ako posao ima user_id
+    if isinstance(update, Update) and update.effective_message:
+        await update.effective_message.reply_text(t(lang_code, "something_went_wrong"))
+    if context.user_data is not None:
+        context.user_data.clear()
     return ConversationHandler.END
 
 
-def main():
-    """Pokreće bota."""
-    application = Application.builder().token(BOT_TOKEN).build()
-
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+async def outbox_status(update: Update, context):
+    """Admin komanda: prikazuje upite koji nisu poslati ni posle svih pokušaja."""
+    dead_letters = await context.bot_data['outbox'].dead_letters()
+    if not dead_letters:
+        await update.message.reply_text("Nema neposlatih upita.")
+        return
+    lines = [f"Neposlati upiti ({len(dead_letters)}):"]
+    for entry_id, created_at, attempts, error, subject in dead_letters:
+        created = datetime.fromtimestamp(created_at).strftime("%d.%m.%Y %H:%M")
+        lines.append(f"#{entry_id} ({created}, pokusaja: {attempts}) {subject}\nGreska: {error}")
+    lines.append("Ponovno slanje: /replay <id> ili /replay all")
+    await update.message.reply_text("\n\n".join(lines))
+
+async def stats(update: Update, context):
+    """Admin komanda: zbirni podaci o upitima za poslednjih N dana (podrazumevano 30)."""
+    if len(context.args) > 1 or (context.args and not context.args[0].isdigit()):
+        await update.message.reply_text("Upotreba: /stats [broj dana]")
+        return
+    days = int(context.args[0]) if context.args else 30
+    report = await context.bot_data['leads'].stats(days)
+    total = sum(count for _, _, count, _ in report['by_service'])
+    lines = [f"Upiti u poslednjih {days} dana: {total} (danas: {report['today']})"]
+    for country, service, count, surface in report['by_service']:
+        average = f", prosecno {surface:.0f} m²" if surface else ""
+        lines.append(f"{country} / {service}: {count}{average}")
+    for title, key in (("Tip grejanja", 'heating_type'), ("Tip toplotne pumpe", 'hp_type')):
+        if report[key]:
+            lines.append(f"{title}: " + ", ".join(f"{code} {count}" for code, count in report[key]))
+    await update.message.reply_text("\n".join(lines))
+
+async def replay(update: Update, context):
+    """Admin komanda: vraća neposlat upit (ili sve) u red za slanje."""
+    if len(context.args) != 1 or not (context.args[0] == "all" or context.args[0].isdigit()):
+        await update.message.reply_text("Upotreba: /replay <id> ili /replay all")
+        return
+    entry_id = None if context.args[0] == "all" else int(context.args[0])
+    count = await context.bot_data['outbox'].replay(entry_id)
+    await update.message.reply_text(f"Vraceno u red za slanje: {count}")
+
+
+async def sweep_sessions(context):
+    """JobQueue posao: briše napuštene razgovore i podseća korisnike koji su zastali usred upita."""
+    sessions = context.bot_data['sessions']
+    reminders = []
+    for session, action in sessions.due():
+        state = sessions.names.get(session.state, "unknown")
+        if action == REMIND:
+            reminders.append(session)
+            SESSIONS_SWEPT.inc(REMIND, state)
+            continue
+        user_data = context.application.user_data.get(session.user_id) or {}
+        if session.state != ConversationHandler.END:
+            logger.info("Conversation of user %s expired at step %s.", session.user_id, state)
+            FUNNEL_ABANDONED.inc(user_data.get('last_step', 'unknown'))
+            context.bot_data['sketch_prefetcher'].cancel(session.user_id)
+            end_conversation(context.bot_data['conversation'], session.key)
+        context.application.drop_user_data(session.user_id)
+        SESSIONS_SWEPT.inc(EXPIRE, state)
+
+    minutes = math.ceil(sessions.reminder_before / 60)
+    for session in reminders:
+        lang_code = language_of(context.application.user_data.get(session.user_id))
+        try:
+            await context.bot.send_message(session.chat_id, t(lang_code, "session_reminder", minutes=minutes))
+        except TelegramError as e:
+            logger.warning("Session reminder to user %s failed: %s", session.user_id, e)
+
+
+async def post_init(application: Application):
+    """Pokreće pozadinske servise nakon inicijalizacije aplikacije."""
+    await application.bot_data['routing'].start()
+    await application.bot_data['leads'].start()
+    await application.bot_data['smtp_pool'].start()
+    await application.bot_data['admin_notifier'].start(application.bot)
+    await application.bot_data['email_queue'].start(application.bot)
+    await application.bot_data['outbox'].start(application.bot_data['email_queue'])
+    sessions = application.bot_data['sessions']
+    conversation = application.bot_data['conversation']
+    worker, workers = application.bot_data['shard']
+    if worker is not None:
+        # Svaki worker ucita celu deljenu bazu, a update-ove dobija samo za chat_id % workers == worker
+        drop_foreign(application, conversation, lambda chat_id: chat_id % workers == worker)
+    # Razgovori vraceni iz persistence-a dobijaju pun rok od pokretanja
+    conversations = conversation_states(conversation)
+    for key, state in conversations.items():
+        sessions.touch(key, state)
+    in_conversation = {user_id for _, user_id in conversations}
+    for user_id in application.user_data:
+        if user_id not in in_conversation:
+            # Bot radi u privatnim chatovima, gde je chat_id isti kao user_id
+            sessions.touch((user_id, user_id), ConversationHandler.END)
+
+async def post_shutdown(application: Application):
+    """Gasi pozadinske servise i čeka da se poslati upiti isporuče."""
+    await application.bot_data['outbox'].stop()
+    await application.bot_data['email_queue'].stop()
+    await application.bot_data['admin_notifier'].stop()
+    application.bot_data['outbox'].close()
+    await application.bot_data['leads'].stop()
+    application.bot_data['leads'].close()
+    application.bot_data['sketch_prefetcher'].close()
+    await application.bot_data['smtp_pool'].close()
+    await application.bot_data['routing'].stop()
+
+
+def step(callback):
+    """Omotava handler koraka razgovora logovanjem, merenjem trajanja i praćenjem neaktivnosti."""
+    return log_update(track_step(track_session(callback)))
+
+
+def build_conversation_handler(persistent=False):
+    """Pravi ConversationHandler sa celim tokom upita; svaki korak se loguje i meri.
+
+    Koraci sa dugmadima i unosom teksta dolaze iz `FLOW`: po jedan handler po
+    stanju, a callback_data se proverava članstvom u skupu kodova koraka.
+    """
+    return ConversationHandler(
+        entry_points=[CommandHandler("start", step(start))],
         states={
-            SELECT_LANGUAGE: [CallbackQueryHandler(select_language, pattern="^lang_")],
-            SELECT_COUNTRY: [CallbackQueryHandler(select_country, pattern="^country_")],
-            SELECT_SERVICE: [CallbackQueryHandler(select_service, pattern="^service_")],
-            SELECT_HEATING_TYPE: [CallbackQueryHandler(select_heating_type, pattern="^(heating_radiators|heating_fancoil|heating_underfloor|heating_underfloor_fancoil|heating_complete_hp)$")], # AŽURIRAN PATTERN
-            SELECT_HP_TYPE: [CallbackQueryHandler(select_hp_type, pattern="^(hp_water_water|hp_air_water)$")], # AŽURIRAN PATTERN
-            ENTER_SURFACE: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_surface)],
-            ENTER_FLOORS: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_floors)],
-            SELECT_OBJECT_TYPE: [CallbackQueryHandler(select_object_type, pattern="^object_")],
-            ASK_FOR_SKETCH: [CallbackQueryHandler(ask_for_sketch, pattern="^ask_sketch_")],
+            **{
+                flow_step.state: [
+                    CallbackQueryHandler(step(ENGINE.handler(flow_step)), pattern=flow_step.accepts.__contains__)
+                    if flow_step.kind == "choice" else
+                    MessageHandler(filters.TEXT & ~filters.COMMAND, step(ENGINE.handler(flow_step)))
+                ]
+                for flow_step in FLOW.steps.values() if flow_step.kind != "custom"
+            },
             RECEIVE_SKETCH: [
-                MessageHandler(filters.PHOTO | filters.Document.ALL & ~filters.COMMAND, receive_sketch),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, fallback)
+                MessageHandler(filters.PHOTO | filters.Document.ALL & ~filters.COMMAND, step(receive_sketch)),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, step(fallback))
             ],
-            ENTER_CONTACT_INFO: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_contact_info)],
+            ENTER_CONTACT_INFO: [MessageHandler(filters.TEXT & ~filters.COMMAND, step(enter_contact_info))],
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[CommandHandler("cancel", step(cancel))],
+        name="inquiry",
+        persistent=persistent,
+    )
+
+
+def build_application(token=BOT_TOKEN, request=None, concurrent_updates=None, persistence_backend=None, worker=None,
+                      workers=1):
+    """Pravi Application sa svim handlerima i pozadinskim servisima.
+
+    `request` omogućava zamenu HTTP sloja (npr. lažni Bot API u benchmarkima),
+    a `concurrent_updates` i `persistence_backend` menjaju vrednosti iz konfiguracije.
+    `worker` je indeks workera od `workers` u režimu sa više procesa (`cluster.py`).
+    """
+    if concurrent_updates is None:
+        concurrent_updates = config.MAX_CONCURRENT_UPDATES
+    if persistence_backend is None:
+        persistence_backend = config.PERSISTENCE_BACKEND
+    persistence = build_persistence(persistence_backend, config.PERSISTENCE_PATH, config.PERSISTENCE_FLUSH_INTERVAL)
+
+    builder = Application.builder().token(token).post_init(post_init).post_shutdown(post_shutdown)
+    if request is not None:
+        builder = builder.get_updates_request(request)
+    else:
+        # Ista velicina poola kao podrazumevani HTTP sloj PTB-a
+        request = HTTPXRequest(connection_pool_size=256)
+    # Svaki poziv Bot API-ja se meri (metrika bot_outbound_duration_seconds)
+    builder = builder.request(InstrumentedRequest(request))
+    if concurrent_updates > 1:
+        builder = builder.concurrent_updates(ChatOrderedUpdateProcessor(concurrent_updates))
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if config.RATE_LIMIT_GLOBAL > 0:
+        # Admin poruke idu u red nizeg prioriteta od odgovora korisnicima; sa vise workera svaki dobija
+        # svoj deo globalnog limita, jer svi salju preko istog bota
+        builder = builder.rate_limiter(TokenBucketRateLimiter(
+            global_rate=config.RATE_LIMIT_GLOBAL / workers,
+            per_chat=config.RATE_LIMIT_PER_CHAT,
+            chat_burst=config.RATE_LIMIT_CHAT_BURST,
+            max_retries=config.RATE_LIMIT_MAX_RETRIES,
+            low_priority_chats=[ADMIN_TELEGRAM_ID],
+        ))
+    application = builder.build()
+
+    # Tastature i sabloni za sve jezike se prave pre prvog update-a, ne pri prvom koriscenju
+    KEYBOARDS.build_all(Language)
+    TEMPLATES.build_all(Inquiry(language=lang, country=country, service=service)
+                        for lang in Language for country in Country for service in Service)
+
+    # Svaki par (zemlja, usluga) iz toka mora imati pravilo za primaoce
+    application.bot_data['routing'] = RoutingRegistry(
+        config.ROUTING_PATH,
+        required=[(country.value, service.value) for country in FLOW.steps["country"].options
+                  for service in FLOW.steps["service"].options],
+        reload_interval=config.ROUTING_RELOAD_INTERVAL,
+    )
+    application.bot_data['smtp_pool'] = SMTPPool(
+        EMAIL_SENDER_ADDRESS,
+        EMAIL_SENDER_PASSWORD,
+        host=config.SMTP_HOST,
+        port=config.SMTP_PORT,
+        use_ssl=config.SMTP_SSL,
+        starttls=not config.SMTP_SSL,
+        size=config.SMTP_POOL_SIZE,
+        idle_timeout=config.SMTP_IDLE_TIMEOUT,
+        keepalive_interval=config.SMTP_KEEPALIVE_INTERVAL,
+    )
+    application.bot_data['sketch_prefetcher'] = SketchPrefetcher(
+        config.ATTACHMENT_MEMORY_LIMIT, config.SKETCH_PREFETCH_BUDGET
+    )
+    application.bot_data['leads'] = LeadStore(
+        config.LEADS_PATH, batch_size=config.LEADS_BATCH_SIZE, flush_interval=config.LEADS_FLUSH_INTERVAL
+    )
+    application.bot_data['outbox'] = Outbox(
+        config.OUTBOX_PATH,
+        max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+        base_delay=config.OUTBOX_RETRY_DELAY,
+        max_delay=config.OUTBOX_MAX_RETRY_DELAY,
+        owner=worker,
+    )
+    application.bot_data['dedup'] = InquiryDeduplicator(
+        window=config.DEDUP_WINDOW,
+        max_entries=config.DEDUP_MAX_ENTRIES,
+        max_per_user=config.USER_INQUIRY_LIMIT,
+        user_window=config.USER_INQUIRY_WINDOW,
+    )
+    application.bot_data['admin_notifier'] = AdminNotifier(
+        ADMIN_TELEGRAM_ID,
+        batch_size=config.ADMIN_BATCH_SIZE,
+        window=config.ADMIN_BATCH_WINDOW,
+        # Svaki worker salje u isti admin chat, pa zajedno ne smeju brze od ADMIN_MIN_INTERVAL
+        min_interval=config.ADMIN_MIN_INTERVAL * workers,
+        digest_interval=config.ADMIN_DIGEST_INTERVAL,
+    )
+    application.bot_data['email_queue'] = EmailQueue(
+        application.bot_data['smtp_pool'],
+        application.bot_data['outbox'],
+        bcc=BCC_EMAIL,
+        notifier=application.bot_data['admin_notifier'],
+        workers=config.EMAIL_WORKERS,
+        maxsize=config.EMAIL_QUEUE_SIZE,
+        attachment_memory_limit=config.ATTACHMENT_MEMORY_LIMIT,
+        prefetcher=application.bot_data['sketch_prefetcher'],
     )
 
-    application.add_handler(conv_handler)
+    # Rokovi neaktivnosti po koraku iz flow.py; cistac radi kao posao u JobQueue-u
+    unknown = set(config.SESSION_STATE_TIMEOUTS) - set(FLOW.steps)
+    if unknown:
+        raise ValueError(f"SESSION_STATE_TIMEOUTS: nepoznati koraci {', '.join(sorted(unknown))}")
+    application.bot_data['sessions'] = SessionTracker(
+        {FLOW.steps[name].state: seconds for name, seconds in config.SESSION_STATE_TIMEOUTS.items()},
+        default_timeout=config.SESSION_TIMEOUT,
+        idle_timeout=config.SESSION_IDLE_TIMEOUT,
+        reminder_before=config.SESSION_REMINDER_BEFORE,
+        names={**{flow_step.state: name for name, flow_step in FLOW.steps.items()}, ConversationHandler.END: "idle"},
+    )
+    if application.job_queue is not None:
+        application.job_queue.run_repeating(
+            sweep_sessions, interval=config.SESSION_SWEEP_INTERVAL, name="session-sweeper"
+        )
+    else:
+        logger.warning("JobQueue is not available (install python-telegram-bot[job-queue]), sessions are never swept.")
+    # Koje chatove ovaj proces obradjuje (None = svi); post_init prema tome odbacuje tudje razgovore
+    application.bot_data['shard'] = (worker, workers)
+    USER_DATA_ENTRIES.set_function(lambda: {(): len(application.user_data)})
+
+    application.bot_data['conversation'] = build_conversation_handler(persistent=persistence is not None)
+    application.add_handler(application.bot_data['conversation'])
+    if ADMIN_TELEGRAM_ID:
+        admin_only = filters.Chat(chat_id=int(ADMIN_TELEGRAM_ID))
+        application.add_handler(CommandHandler("outbox", log_update(outbox_status), filters=admin_only))
+        application.add_handler(CommandHandler("replay", log_update(replay), filters=admin_only))
+        application.add_handler(CommandHandler("stats", log_update(stats), filters=admin_only))
     application.add_error_handler(error_handler)
+    return application
+
+
+def main():
+    """Pokreće bota."""
+    parser = argparse.ArgumentParser(description="Telegram bot za upite o grejanju i toplotnim pumpama.")
+    parser.add_argument("--workers", type=int, default=config.WEBHOOK_WORKERS,
+                        help="broj worker procesa u webhook režimu (podrazumevano WEBHOOK_WORKERS)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers mora biti najmanje 1")
+    # Pickle fajl ne podnosi upis iz vise procesa
+    if args.workers > 1 and config.PERSISTENCE_BACKEND == "file":
+        parser.error("Vise workera zahteva PERSISTENCE_BACKEND=sqlite ili none")
+    setup_logging(config.LOG_LEVEL, config.LOG_FORMAT)
 
     if WEBHOOK_URL:
         PORT = int(os.environ.get("PORT", "8443"))
-        application.run_webhook(
+        logger.info("Webhook enabled on port %s with URL %s", PORT, WEBHOOK_URL)
+        guard = WebhookGuard(
+            secret=config.WEBHOOK_SECRET,
+            max_body_size=config.WEBHOOK_MAX_BODY_SIZE,
+            recent_updates=config.WEBHOOK_RECENT_UPDATES,
+            per_ip_rate=config.WEBHOOK_IP_RATE,
+            per_ip_burst=config.WEBHOOK_IP_BURST,
+        )
+        url_path = webhook_path(BOT_TOKEN)
+        if args.workers > 1:
+            # multiprocessing i worker kod trebaju samo u rezimu sa vise procesa
+            from cluster import serve_cluster
+
+            asyncio.run(serve_cluster(
+                build_application,
+                BOT_TOKEN,
+                args.workers,
+                listen="0.0.0.0",
+                port=PORT,
+                url_path=url_path,
+                webhook_url=f"{WEBHOOK_URL}/{url_path}",
+                drain_timeout=config.WORKER_DRAIN_TIMEOUT,
+                guard=guard,
+                xheaders=config.WEBHOOK_BEHIND_PROXY,
+            ))
+            return
+        # Umesto run_webhook: isti server sluzi i /metrics
+        asyncio.run(serve(
+            build_application(),
             listen="0.0.0.0",
             port=PORT,
-            url_path=BOT_TOKEN,
-            webhook_url=f"{WEBHOOK_URL}/{BOT_TOKEN}"
-        )
-        logger.info(f"Webhook enabled on port {PORT} with URL {WEBHOOK_URL}/{BOT_TOKEN}")
+            url_path=url_path,
+            webhook_url=f"{WEBHOOK_URL}/{url_path}",
+            guard=guard,
+            xheaders=config.WEBHOOK_BEHIND_PROXY,
+        ))
     else:
+        if args.workers > 1:
+            logger.warning("--workers applies only to webhook mode, polling runs in one process.")
         logger.info("Polling enabled (WEBHOOK_URL not set).")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        build_application().run_polling(allowed_updates=Update.ALL_TYPES)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,267 @@
+# metrics.py
+"""Metrike u Prometheus formatu: trajanje koraka razgovora, spoljnih poziva i levak upita.
+
+Sve metrike se menjaju samo iz event loop-a, pa nema zaključavanja. Budžet:
+instrumentacija dodaje najviše 20 µs po update-u (dva `perf_counter` poziva,
+bisect kroz granice histograma i nekoliko operacija nad rečnikom); meri se sa
+`python benchmarks/bench_metrics.py`.
+"""
+import bisect
+import functools
+import time
+
+from telegram.ext import ConversationHandler
+from telegram.request import BaseRequest
+
+# Granice histograma u sekundama
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Brojač sa labelama; vrednosti se čuvaju po tuple-u vrednosti labela."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def snapshot(self):
+        return dict(self._values)
+
+    def merge(self, snapshots):
+        merged = self.snapshot()
+        for values in snapshots:
+            for labels, value in values.items():
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def samples(self, values):
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Trenutna vrednost; može se i računati tek pri čitanju, preko `set_function`."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._function = None
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def set_function(self, function):
+        """`function()` vraća rečnik {tuple vrednosti labela: vrednost}."""
+        self._function = function
+
+    def snapshot(self):
+        values = dict(self._values)
+        if self._function is not None:
+            values.update(self._function())
+        return values
+
+
+class Histogram:
+    """Histogram sa fiksnim granicama; u memoriji se čuvaju samo brojevi po korpi."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            # [brojevi po korpama (+ poslednja za +Inf), zbir, broj merenja]
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def snapshot(self):
+        return {labels: [list(counts), total, count] for labels, (counts, total, count) in self._series.items()}
+
+    def merge(self, snapshots):
+        merged = self.snapshot()
+        for series in snapshots:
+            for labels, (counts, total, count) in series.items():
+                target = merged.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                target[0] = [a + b for a, b in zip(target[0], counts)]
+                target[1] += total
+                target[2] += count
+        return merged
+
+    def samples(self, series):
+        names = self.label_names + ("le",)
+        for labels, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """Vrednosti svih metrika, za slanje iz worker procesa (vidi `cluster.py`)."""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def render(self, snapshots=()):
+        """Vraća sve metrike u Prometheus text formatu (verzija 0.0.4).
+
+        Vrednosti iz `snapshots` (drugih procesa) se sabiraju sa lokalnim.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples(metric.merge(snapshot.get(metric.name, {}) for snapshot in snapshots)))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STEP_SECONDS = REGISTRY.register(
+    Histogram("bot_step_duration_seconds", "Trajanje obrade jednog koraka razgovora.", ("step",))
+)
+OUTBOUND_SECONDS = REGISTRY.register(
+    Histogram("bot_outbound_duration_seconds", "Trajanje poziva ka Bot API-ju, SMTP-u i adminu.", ("call",))
+)
+OUTBOUND_ERRORS = REGISTRY.register(
+    Counter("bot_outbound_errors_total", "Spoljni pozivi koji su završeni greškom.", ("call",))
+)
+ADMIN_NOTIFICATIONS = REGISTRY.register(
+    Counter("bot_admin_notifications_total", "Obaveštenja administratoru po ishodu.", ("result",))
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(
+    Histogram("bot_rate_limit_wait_seconds", "Čekanje na rate limiter pre poziva Bot API-ja.", ("priority",))
+)
+RATE_LIMIT_QUEUE = REGISTRY.register(
+    Gauge("bot_rate_limit_queue_depth", "Zahtevi koji čekaju na globalni token.", ("priority",))
+)
+RATE_LIMIT_RETRIES = REGISTRY.register(
+    Counter("bot_rate_limit_retries_total", "Odgovori RetryAfter (429) od Bot API-ja.", ("endpoint",))
+)
+FUNNEL_STARTED = REGISTRY.register(Counter("bot_funnel_started_total", "Započeti upiti (/start)."))
+FUNNEL_COMPLETED = REGISTRY.register(
+    Counter("bot_funnel_completed_total", "Upiti upisani u outbox.", ("service", "country"))
+)
+FUNNEL_ABANDONED = REGISTRY.register(
+    Counter("bot_funnel_abandoned_total", "Prekinuti upiti, po poslednjem završenom koraku.", ("step",))
+)
+INQUIRIES_FILTERED = REGISTRY.register(
+    Counter("bot_inquiries_filtered_total", "Završeni upiti po ishodu provere duplikata.", ("result",))
+)
+SESSIONS_LIVE = REGISTRY.register(
+    Gauge("bot_sessions_live", "Razgovori u memoriji, po stanju (idle = završen, čeka brisanje).", ("state",))
+)
+USER_DATA_ENTRIES = REGISTRY.register(Gauge("bot_user_data_entries", "Broj korisnika sa user_data u memoriji."))
+SESSIONS_SWEPT = REGISTRY.register(
+    Counter("bot_sessions_swept_total", "Podsetnici i obrisani razgovori posle neaktivnosti.", ("action", "state"))
+)
+WORKER_RESTARTS = REGISTRY.register(
+    Counter("bot_worker_restarts_total", "Worker procesi koji su pali i ponovo pokrenuti.")
+)
+WEBHOOK_REJECTED = REGISTRY.register(
+    Counter("bot_webhook_rejected_total", "Webhook zahtevi odbijeni pre obrade, po razlogu.", ("reason",))
+)
+
+
+def track_step(callback):
+    """Dekorator za handlere: meri trajanje koraka i pamti ga kao poslednji završeni korak."""
+    step = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            result = await callback(update, context)
+        finally:
+            STEP_SECONDS.observe(time.perf_counter() - started, step)
+        # Posle kraja razgovora user_data je vec ociscen i ne treba ga ponovo puniti
+        if result != ConversationHandler.END and context.user_data is not None:
+            context.user_data['last_step'] = step
+        return result
+
+    return wrapper
+
+
+class timed:
+    """Kontekst menadžer koji meri spoljni poziv i broji greške."""
+
+    __slots__ = ("call", "started")
+
+    def __init__(self, call):
+        self.call = call
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        OUTBOUND_SECONDS.observe(time.perf_counter() - self.started, self.call)
+        if exc_type is not None:
+            OUTBOUND_ERRORS.inc(self.call)
+        return False
+
+
+class InstrumentedRequest(BaseRequest):
+    """Omotač oko HTTP sloja bota koji meri svaki poziv Bot API-ja po imenu metode."""
+
+    def __init__(self, request):
+        self._request = request
+
+    @property
+    def read_timeout(self):
+        return self._request.read_timeout
+
+    async def initialize(self):
+        await self._request.initialize()
+
+    async def shutdown(self):
+        await self._request.shutdown()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=BaseRequest.DEFAULT_NONE,
+                         write_timeout=BaseRequest.DEFAULT_NONE, connect_timeout=BaseRequest.DEFAULT_NONE,
+                         pool_timeout=BaseRequest.DEFAULT_NONE):
+        # URL sadrzi token bota, pa se kao labela koristi samo ime metode
+        call = "download_file" if "/file/bot" in url else url.rsplit("/", 1)[-1]
+        with timed(call):
+            return await self._request.do_request(
+                url, method, request_data,
+                read_timeout=read_timeout, write_timeout=write_timeout,
+                connect_timeout=connect_timeout, pool_timeout=pool_timeout,
+            )
@@ -0,0 +1,338 @@
+# outbox.py
+"""Trajni outbox za upite: upit se prvo upiše na disk, pa se tek onda šalje."""
+import asyncio
+import dataclasses
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+from email_queue import InquiryEmail
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    owner INTEGER
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    outbox_id INTEGER PRIMARY KEY REFERENCES outbox (id),
+    failed_at REAL NOT NULL,
+    error TEXT
+);
+"""
+
+
+@dataclasses.dataclass
+class OutboxEntry:
+    """Upit preuzet iz outboxa radi slanja."""
+    id: int
+    idempotency_key: str
+    inquiry: InquiryEmail
+    attempts: int
+
+
+class Outbox:
+    """SQLite outbox sa isporukom bar jednom (at-least-once).
+
+    Upit se upisuje pre nego što korisnik dobije zahvalnicu. Dispečer u
+    pozadini preuzima dospele upite i predaje ih `EmailQueue`-u; preuzimanje
+    postavlja zakup (`lease`), pa se upit koji je ostao nedovršen zbog pada
+    procesa ponovo šalje kada zakup istekne, i nakon restarta. Neuspela slanja se
+    ponavljaju sa eksponencijalnim kašnjenjem, a posle `max_attempts` upit
+    prelazi u tabelu dead_letters. Ključ idempotentnosti je i Message-ID
+    emaila, pa primalac ponovljeno slanje vidi kao istu poruku.
+
+    Sa više workera (`cluster.py`) upit se upisuje sa `owner` = indeks workera
+    koji je vodio razgovor i preuzima ga samo taj worker, jer on drži unapred
+    preuzetu skicu. Upit čiji vlasnik ga ne preuzme `owner_grace` sekundi
+    posle roka (worker ne radi ili ga više nema) preuzima bilo koji worker.
+    """
+
+    def __init__(self, path, max_attempts=8, base_delay=30, max_delay=3600, lease=300, poll_interval=30,
+                 owner=None, owner_grace=120):
+        self.path = path
+        self.owner = owner
+        self.owner_grace = owner_grace
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._db = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Upiti koje je ovaj proces preuzeo, a za koje jos nije upisan ishod
+        self._leased = set()
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+            # Baze iz verzija pre kolone owner
+            if "owner" not in {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}:
+                self._db.execute("ALTER TABLE outbox ADD COLUMN owner INTEGER")
+        return self._db
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    # --- upis i stanja ---
+
+    def _insert(self, key, inquiry, now, delay):
+        try:
+            self._execute(
+                "INSERT INTO outbox (idempotency_key, payload, next_attempt_at, created_at, owner) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(dataclasses.asdict(inquiry), ensure_ascii=False), now + delay, now, self.owner),
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    async def add(self, key, inquiry: InquiryEmail, delay=0):
+        """Trajno upisuje upit; vraća False ako upit sa istim ključem već postoji.
+
+        Prvi pokušaj slanja je posle `delay` sekundi, da bi se upit do tada
+        mogao spojiti sa dopunom istog korisnika (vidi `merge`).
+        """
+        added = await asyncio.to_thread(self._insert, key, inquiry, time.time(), delay)
+        if added:
+            logger.info("Inquiry %s stored in outbox.", key)
+            self._wakeup.set()
+        else:
+            logger.info("Inquiry %s is already in outbox, skipping duplicate.", key)
+        return added
+
+    def _merge(self, key, inquiry, combine):
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(
+                    "SELECT id, payload FROM outbox WHERE idempotency_key = ? AND status = 'pending' AND attempts = 0",
+                    (key,),
+                ).fetchall()
+                if rows:
+                    merged = combine(InquiryEmail(**json.loads(rows[0][1])), inquiry)
+                    db.execute(
+                        "UPDATE outbox SET payload = ? WHERE id = ?",
+                        (json.dumps(dataclasses.asdict(merged), ensure_ascii=False), rows[0][0]),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return bool(rows)
+
+    async def merge(self, key, inquiry: InquiryEmail, combine):
+        """Spaja upit sa ranijim upitom `key` koji još nije preuzet za slanje.
+
+        `combine(raniji, novi)` vraća spojen upit. Vraća False ako je raniji upit
+        već poslat ili se šalje; tada ga treba upisati kao nov.
+        """
+        merged = await asyncio.to_thread(self._merge, key, inquiry, combine)
+        if merged:
+            logger.info("Inquiry merged into pending inquiry %s.", key)
+        return merged
+
+    def _claim(self, limit, now):
+        """Preuzima dospele upite i produžava im zakup, u jednoj transakciji."""
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = db.execute(
+                    "SELECT id, idempotency_key, payload, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? "
+                    "AND (? IS NULL OR owner IS NULL OR owner = ? OR next_attempt_at <= ?) "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (now, self.owner, self.owner, now - self.owner_grace, limit),
+                ).fetchall()
+                db.executemany(
+                    "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+                    [(now + self.lease, row[0]) for row in rows],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return [
+            OutboxEntry(row_id, key, InquiryEmail(**json.loads(payload)), attempts + 1)
+            for row_id, key, payload, attempts in rows
+        ]
+
+    def _next_due(self):
+        # Tudji upiti su dospeli za ovaj worker tek posle owner_grace
+        rows = self._execute(
+            "SELECT MIN(CASE WHEN ? IS NULL OR owner IS NULL OR owner = ? THEN next_attempt_at "
+            "ELSE next_attempt_at + ? END) FROM outbox WHERE status = 'pending'",
+            (self.owner, self.owner, self.owner_grace),
+        )
+        return rows[0][0]
+
+    def backoff(self, attempts):
+        """Kašnjenje pre sledećeg pokušaja: eksponencijalno, sa malo nasumičnosti."""
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _release(self, entry_ids, now):
+        """Vraća preuzete, a neposlate upite na slanje odmah; preuzimanje se ne računa kao pokušaj."""
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "UPDATE outbox SET attempts = attempts - 1, next_attempt_at = ? WHERE id = ? AND status = 'pending'",
+                    [(now, entry_id) for entry_id in entry_ids],
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _mark_sent(self, entry_id, now):
+        self._execute("UPDATE outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?", (now, entry_id))
+
+    def _mark_failed(self, entry_id, attempts, error, now):
+        """Zakazuje novi pokušaj ili premešta upit u dead_letters; vraća True ako je upit odbačen."""
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if attempts >= self.max_attempts:
+                    db.execute("UPDATE outbox SET status = 'dead', last_error = ? WHERE id = ?", (error, entry_id))
+                    db.execute(
+                        "INSERT OR REPLACE INTO dead_letters (outbox_id, failed_at, error) VALUES (?, ?, ?)",
+                        (entry_id, now, error),
+                    )
+                    dead = True
+                else:
+                    db.execute(
+                        "UPDATE outbox SET next_attempt_at = ?, last_error = ? WHERE id = ?",
+                        (now + self.backoff(attempts), error, entry_id),
+                    )
+                    dead = False
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return dead
+
+    async def mark_sent(self, entry: OutboxEntry):
+        await asyncio.to_thread(self._mark_sent, entry.id, time.time())
+        self._leased.discard(entry.id)
+
+    async def mark_failed(self, entry: OutboxEntry, error):
+        dead = await asyncio.to_thread(self._mark_failed, entry.id, entry.attempts, str(error), time.time())
+        self._leased.discard(entry.id)
+        # Dispecer treba da preracuna kada je sledeci pokusaj
+        self._wakeup.set()
+        if dead:
+            logger.error("Inquiry %s moved to dead letters after %s attempts.", entry.idempotency_key, entry.attempts)
+        else:
+            logger.warning("Inquiry %s failed (attempt %s), will retry: %s", entry.idempotency_key, entry.attempts, error)
+        return dead
+
+    # --- administracija ---
+
+    def _dead_letters(self, limit):
+        return self._execute(
+            "SELECT o.id, o.created_at, o.attempts, d.error, o.payload FROM dead_letters d "
+            "JOIN outbox o ON o.id = d.outbox_id ORDER BY d.failed_at DESC LIMIT ?",
+            (limit,),
+        )
+
+    async def dead_letters(self, limit=20):
+        """Vraća listu (id, vreme upisa, broj pokušaja, greška, subject) neisporučenih upita."""
+        rows = await asyncio.to_thread(self._dead_letters, limit)
+        return [(row_id, created, attempts, error, json.loads(payload)["subject"])
+                for row_id, created, attempts, error, payload in rows]
+
+    def _replay(self, entry_id, now):
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                where, params = ("", ()) if entry_id is None else (" AND outbox_id = ?", (entry_id,))
+                ids = [row[0] for row in db.execute("SELECT outbox_id FROM dead_letters WHERE 1 = 1" + where, params)]
+                db.executemany(
+                    "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE id = ?",
+                    [(now, row_id) for row_id in ids],
+                )
+                db.executemany("DELETE FROM dead_letters WHERE outbox_id = ?", [(row_id,) for row_id in ids])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(ids)
+
+    async def replay(self, entry_id=None):
+        """Vraća neisporučen upit (ili sve, ako je `entry_id` None) u red za slanje."""
+        count = await asyncio.to_thread(self._replay, entry_id, time.time())
+        if count:
+            self._wakeup.set()
+        return count
+
+    # --- dispečer ---
+
+    async def start(self, email_queue):
+        """Pokreće dispečer; upiti zaostali od prethodnog pokretanja šalju se odmah."""
+        self._task = asyncio.create_task(self._dispatch_loop(email_queue), name="outbox-dispatcher")
+
+    async def _dispatch_loop(self, email_queue):
+        while True:
+            self._wakeup.clear()
+            try:
+                entries = await asyncio.to_thread(self._claim, email_queue.workers * 2, time.time())
+                self._leased.update(entry.id for entry in entries)
+                for entry in entries:
+                    await email_queue.put(entry)
+                if entries:
+                    continue
+                next_due = await asyncio.to_thread(self._next_due)
+            except Exception:
+                logger.exception("Outbox dispatcher failed, retrying")
+                next_due = None
+            timeout = self.poll_interval if next_due is None else min(max(next_due - time.time(), 0), self.poll_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        """Zaustavlja dispečer; nedovršeni upiti ostaju u outboxu za sledeće pokretanje (vidi `close`)."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def close(self):
+        """Oslobađa zakupe upita koji nisu stigli da se pošalju i zatvara bazu.
+
+        Poziva se posle `EmailQueue.stop()`, pa su preostali zakupi upiti koji
+        su ostali u redu; bez oslobađanja bi posle restarta čekali ceo `lease`.
+        """
+        if self._leased:
+            self._release(self._leased, time.time())
+            logger.info("Released %s unsent inquiries for the next start.", len(self._leased))
+            self._leased = set()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
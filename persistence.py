@@ -0,0 +1,182 @@
+# persistence.py
+"""Trajno čuvanje stanja razgovora i user_data, da restart ne izgubi započete upite."""
+import asyncio
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput, PicklePersistence
+
+logger = logging.getLogger(__name__)
+
+# bot_data sadrzi servise (SMTP pool, red za email) koji se ne cuvaju
+STORE_DATA = PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    conv_key TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (name, conv_key)
+);
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """Čuva user_data i stanja ConversationHandler-a u SQLite bazi (WAL režim).
+
+    PTB poziva `update_*` metode u grupi na svakih `update_interval` sekundi.
+    Izmene se ovde samo beleže u memoriji, a cela grupa se upisuje jednom
+    transakcijom, pa broj upisa ne zavisi od broja update-ova između dva
+    intervala. Pri pokretanju se sve tabele učitavaju jednim upitom po tabeli.
+    """
+
+    def __init__(self, path, update_interval=60, store_data=STORE_DATA):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self._dirty_users = {}
+        self._dirty_conversations = {}
+        self._flush_task = None
+        self.transactions = 0
+        self.rows_written = 0
+
+    def _connect(self):
+        if self._db is None:
+            # Vise webhook workera moze da deli istu bazu, pa se na zakljucanu bazu ceka
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    async def get_user_data(self):
+        rows = await asyncio.to_thread(self._query, "SELECT user_id, data FROM user_data")
+        return {user_id: pickle.loads(data) for user_id, data in rows}
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await asyncio.to_thread(
+            self._query, "SELECT conv_key, state FROM conversations WHERE name = ?", (name,)
+        )
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def update_user_data(self, user_id, data):
+        self._dirty_users[user_id] = data
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id):
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def update_conversation(self, name, key, new_state):
+        self._dirty_conversations[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    def _schedule_flush(self):
+        # Sve update_* korutine jedne grupe se izvrse pre nego sto ovaj task dobije red
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(0)
+        while self._dirty_users or self._dirty_conversations:
+            await self._write_dirty()
+
+    async def _write_dirty(self):
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        if not users and not conversations:
+            return
+        # pickle se radi ovde, pre nego sto handleri ponovo izmene podatke
+        user_rows = [(user_id, None if data is None else pickle.dumps(data)) for user_id, data in users.items()]
+        conversation_rows = [
+            (name, key, None if state is None else pickle.dumps(state)) for (name, key), state in conversations.items()
+        ]
+        await asyncio.to_thread(self._write, user_rows, conversation_rows)
+
+    def _write(self, user_rows, conversation_rows):
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN")
+            try:
+                for user_id, data in user_rows:
+                    if data is None:
+                        db.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+                    else:
+                        db.execute("INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)", (user_id, data))
+                for name, key, state in conversation_rows:
+                    if state is None:
+                        db.execute("DELETE FROM conversations WHERE name = ? AND conv_key = ?", (name, key))
+                    else:
+                        db.execute(
+                            "INSERT OR REPLACE INTO conversations (name, conv_key, state) VALUES (?, ?, ?)",
+                            (name, key, state),
+                        )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            self.transactions += 1
+            self.rows_written += len(user_rows) + len(conversation_rows)
+
+    async def flush(self):
+        """Upisuje sve preostale izmene i zatvara bazu (poziva se pri gašenju)."""
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._write_dirty()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def build_persistence(backend, path, update_interval):
+    """Vraća persistence objekat za izabrani backend ili None ako je isključen."""
+    if backend == "sqlite":
+        return SQLitePersistence(path, update_interval=update_interval)
+    if backend == "file":
+        return PicklePersistence(path, store_data=STORE_DATA, update_interval=update_interval)
+    if backend in ("", "none"):
+        return None
+    raise ValueError(f"Nepoznat PERSISTENCE_BACKEND: {backend}")
@@ -0,0 +1,168 @@
+# rate_limiter.py
+"""Ograničenje brzine poziva Bot API-ja: token bucket, prioriteti i per-chat limit."""
+import asyncio
+import collections
+import contextlib
+import logging
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from metrics import RATE_LIMIT_QUEUE, RATE_LIMIT_RETRIES, RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+HIGH = "high"
+LOW = "low"
+
+
+class TokenBucket:
+    """Kanta sa `capacity` tokena koja se puni brzinom `rate` tokena u sekundi."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Uzima token ako postoji; inače vraća koliko sekundi treba čekati na sledeći."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    """Rate limiter za `ApplicationBuilder.rate_limiter`.
+
+    Ograničavaju se samo pozivi sa `chat_id` (slanje i izmena poruka); ostali
+    (answerCallbackQuery, getFile...) prolaze odmah. Svaki chat ima svoju
+    kantu (`per_chat` poruka u sekundi, uz `chat_burst` zaredom), a svi
+    zajedno dele globalnu kantu od `global_rate` poruka u sekundi. Kada
+    globalna kanta nema tokena, zahtevi čekaju u dva reda: odgovori
+    korisnicima dobijaju token pre poruka za `low_priority_chats` (admin) i
+    zahteva sa `rate_limit_args={"priority": "low"}`. Na RetryAfter se svi
+    zahtevi pauziraju koliko Telegram traži, pa se zahtev ponavlja najviše
+    `max_retries` puta.
+    """
+
+    def __init__(self, global_rate=30, per_chat=1, chat_burst=3, max_retries=3, low_priority_chats=(),
+                 max_idle_buckets=1000):
+        self.global_rate = global_rate
+        self.per_chat = per_chat
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.low_priority_chats = {str(chat_id) for chat_id in low_priority_chats if chat_id}
+        self.max_idle_buckets = max_idle_buckets
+        # Kanta mora da primi bar jedan token i kada je limit ispod 1 poruke u sekundi
+        self._global = TokenBucket(global_rate, max(global_rate, 1))
+        self._chats = {}
+        self._waiters = {HIGH: collections.deque(), LOW: collections.deque()}
+        self._granter = None
+        self._resume_at = 0.0
+        RATE_LIMIT_QUEUE.set_function(lambda: {(priority,): len(waiters) for priority, waiters in self._waiters.items()})
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._granter is not None:
+            self._granter.cancel()
+            await asyncio.gather(self._granter, return_exceptions=True)
+            self._granter = None
+
+    def queue_depth(self, priority=None):
+        """Broj zahteva koji čekaju na globalni token (za oba reda ako priority nije zadat)."""
+        if priority is None:
+            return sum(len(waiters) for waiters in self._waiters.values())
+        return len(self._waiters[priority])
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_idle_buckets:
+                # Puna kanta je isto sto i nova, pa se moze obrisati
+                self._chats = {key: value for key, value in self._chats.items() if not value.full()}
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat, self.chat_burst)
+        return bucket
+
+    async def _acquire_chat(self, chat_id):
+        bucket = self._chat_bucket(chat_id)
+        wait = bucket.take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = bucket.take()
+
+    async def _acquire_global(self, priority):
+        ahead = self._waiters[HIGH] if priority == HIGH else self._waiters[HIGH] or self._waiters[LOW]
+        if not ahead and time.monotonic() >= self._resume_at and not self._global.take():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        if self._granter is None or self._granter.done():
+            self._granter = asyncio.create_task(self._grant(), name="rate-limiter")
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with contextlib.suppress(ValueError):
+                self._waiters[priority].remove(waiter)
+            raise
+
+    async def _grant(self):
+        """Deli globalne tokene zahtevima koji čekaju, prvo iz reda visokog prioriteta."""
+        while self._waiters[HIGH] or self._waiters[LOW]:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            wait = self._global.take()
+            if wait:
+                await asyncio.sleep(wait)
+                continue
+            lane = self._waiters[HIGH] or self._waiters[LOW]
+            waiter = lane.popleft()
+            if waiter.done():
+                # Otkazan zahtev: token se vraca
+                self._global.tokens += 1
+            else:
+                waiter.set_result(None)
+
+    def _priority(self, chat_id, rate_limit_args):
+        if isinstance(rate_limit_args, dict) and rate_limit_args.get("priority") in (HIGH, LOW):
+            return rate_limit_args["priority"]
+        return LOW if str(chat_id) in self.low_priority_chats else HIGH
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+
+        priority = self._priority(chat_id, rate_limit_args)
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            await self._acquire_chat(chat_id)
+            await self._acquire_global(priority)
+            RATE_LIMIT_WAIT_SECONDS.observe(time.perf_counter() - started, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                RATE_LIMIT_RETRIES.inc(endpoint)
+                if attempt == self.max_retries:
+                    logger.error("%s to chat %s still rate limited after %s retries.", endpoint, chat_id, attempt)
+                    raise
+                logger.warning("%s hit the rate limit, pausing requests for %ss.", endpoint, e.retry_after)
+                self._resume_at = max(self._resume_at, time.monotonic() + e.retry_after)
+                await asyncio.sleep(e.retry_after)
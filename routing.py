@@ -0,0 +1,133 @@
+# routing.py
+"""Registar partnera i pravila za primaoce, učitan iz `partners.json`.
+
+Fajl ima dva dela: `partners` (id -> podaci koji se prikazuju korisniku i
+email) i `routes` (zemlja, usluga, opcioni podtip -> poruka o partneru i
+lista primalaca). Pri učitavanju se sve proverava i razrešava u rečnik
+(zemlja, usluga, podtip) -> `Route`, pa je traženje jedan pristup rečniku.
+Registar prati vreme izmene fajla i nov sadržaj zamenjuje celu tabelu
+odjednom; neispravan fajl se loguje, a stara tabela ostaje u upotrebi.
+"""
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from i18n import available_languages, t
+
+logger = logging.getLogger(__name__)
+
+
+class RoutingError(Exception):
+    """Fajl sa partnerima nije ispravan."""
+
+
+@dataclass(frozen=True)
+class Route:
+    country: str
+    service: str
+    sub_type: Optional[str]
+    info: str                   # kljuc prevoda poruke o partneru
+    partner: Dict[str, str]     # podaci partnera koji se ubacuju u poruku
+    recipients: Tuple[str, ...]  # email adrese primalaca upita
+
+
+def load_routes(path, required=()):
+    """Čita fajl i vraća rečnik (zemlja, usluga, podtip) -> Route.
+
+    `required` su parovi (zemlja, usluga) koji moraju imati pravilo bez podtipa.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        partners = data["partners"]
+        routes = {}
+        for entry in data["routes"]:
+            key = (entry["country"], entry["service"], entry.get("sub_type"))
+            if key in routes:
+                raise RoutingError(f"Pravilo za {key} je definisano dva puta")
+            unknown = [partner for partner in [entry["partner"], *entry["recipients"]] if partner not in partners]
+            if unknown:
+                raise RoutingError(f"Pravilo za {key} koristi nepoznate partnere: {', '.join(unknown)}")
+            if not entry["recipients"]:
+                raise RoutingError(f"Pravilo za {key} nema primaoce")
+            partner = dict(partners[entry["partner"]])
+            # Poruka o partneru mora da se formira na svim jezicima
+            for lang in available_languages():
+                t(lang, entry["info"], **partner)
+            routes[key] = Route(*key, entry["info"], partner,
+                                tuple(partners[recipient]["email"] for recipient in entry["recipients"]))
+    except RoutingError:
+        raise
+    except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+        raise RoutingError(f"{path}: {e!r}") from e
+    missing = [pair for pair in required if (*pair, None) not in routes]
+    if missing:
+        raise RoutingError(f"Nema pravila za: {', '.join('/'.join(pair) for pair in missing)}")
+    return routes
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class RoutingRegistry:
+    """Pravila za primaoce sa ponovnim učitavanjem kada se fajl promeni.
+
+    Provera fajla ide na svakih `reload_interval` sekundi (0 = bez ponovnog
+    učitavanja); nova tabela se pravi sa strane i dodeljuje jednom naredbom,
+    pa handleri uvek vide ili staru ili novu tabelu, nikad mešavinu.
+    """
+
+    def __init__(self, path, required=(), reload_interval=5.0):
+        self.path = path
+        self.required = tuple(required)
+        self.reload_interval = reload_interval
+        self._signature = _signature(path)
+        self._routes = load_routes(path, self.required)
+        self._task = None
+
+    def __len__(self):
+        return len(self._routes)
+
+    def route(self, country, service, sub_type=None):
+        """Pravilo za upit; bez pravila za podtip važi pravilo za celu uslugu."""
+        routes = self._routes
+        return routes.get((country, service, sub_type)) or routes[(country, service, None)]
+
+    def reload(self):
+        """Učitava fajl ako se promenio; vraća True ako je tabela zamenjena."""
+        try:
+            signature = _signature(self.path)
+        except OSError as e:
+            logger.warning("Routing file %s is not readable: %s", self.path, e)
+            return False
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            routes = load_routes(self.path, self.required)
+        except RoutingError as e:
+            logger.error("Routing file %s was not reloaded, keeping the previous rules: %s", self.path, e)
+            return False
+        self._routes = routes
+        logger.info("Routing rules reloaded from %s (%s rules).", self.path, len(routes))
+        return True
+
+    async def start(self):
+        if self.reload_interval > 0:
+            self._task = asyncio.create_task(self._watch(), name="routing-reload")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            self.reload()
@@ -0,0 +1,190 @@
+# sessions.py
+"""Životni vek razgovora: rokovi neaktivnosti po stanju i brisanje napuštenih razgovora.
+
+Korisnik koji odustane usred upita ostavlja `user_data` i stanje u
+ConversationHandler-u zauvek. `SessionTracker` pamti poslednju aktivnost
+svakog razgovora i rok do kog razgovor sme da miruje (zavisi od stanja u kom
+je korisnik stao). Rokovi su u heap-u, pa periodično čišćenje (`due`) vadi
+samo istekle razgovore: O(istekli · log n), bez prolaska kroz sve korisnike.
+"""
+import functools
+import heapq
+import time
+
+from telegram.ext import ConversationHandler
+
+from metrics import SESSIONS_LIVE
+
+# Sta treba uraditi sa razgovorom ciji je rok istekao
+REMIND = "remind"
+EXPIRE = "expire"
+
+
+class _Session:
+    __slots__ = ("key", "state", "touched", "deadline", "reminded")
+
+    def __init__(self, key, state, touched):
+        self.key = key
+        self.state = state
+        self.touched = touched
+        self.deadline = None
+        self.reminded = False
+
+    @property
+    def chat_id(self):
+        return self.key[0]
+
+    @property
+    def user_id(self):
+        return self.key[1]
+
+
+class SessionTracker:
+    """Rokovi neaktivnosti za razgovore, ključ je (chat_id, user_id) kao u ConversationHandler-u.
+
+    `timeouts` je rečnik stanje -> sekunde; stanja kojih nema u rečniku imaju
+    `default_timeout`. Posle kraja razgovora (`ConversationHandler.END`) ostaje
+    samo prazan `user_data`, koji se briše posle `idle_timeout` sekundi.
+    Ako je `reminder_before` veće od nule, korisnik se toliko sekundi pre
+    brisanja podseća da upit nije završen. `names` daje naziv stanja za metrike.
+
+    Heap sadrži (rok, redni broj, ključ); posle svake aktivnosti dodaje se nov
+    unos, a zastareli unosi se preskaču pri vađenju i povremeno izbacuju.
+    """
+
+    def __init__(self, timeouts=None, default_timeout=1800, idle_timeout=600, reminder_before=0, names=None):
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.idle_timeout = idle_timeout
+        self.reminder_before = reminder_before
+        self.names = dict(names or {})
+        self._sessions = {}
+        self._heap = []
+        self._sequence = 0
+        self._by_state = {}
+        SESSIONS_LIVE.set_function(
+            lambda: {(self.names.get(state, str(state)),): count for state, count in self._by_state.items()}
+        )
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, key):
+        return key in self._sessions
+
+    def timeout(self, state):
+        if state == ConversationHandler.END:
+            return self.idle_timeout
+        return self.timeouts.get(state, self.default_timeout)
+
+    def touch(self, key, state, now=None):
+        """Beleži aktivnost u razgovoru; `state` je stanje koje je handler vratio (None = isto stanje)."""
+        now = time.monotonic() if now is None else now
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = _Session(key, state, now)
+            self._count(state, 1)
+        elif state is not None and state != session.state:
+            self._count(session.state, -1)
+            self._count(state, 1)
+            session.state = state
+        session.touched = now
+        session.reminded = False
+        self._schedule(session)
+
+    def forget(self, key):
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self._count(session.state, -1)
+        return session
+
+    def due(self, now=None):
+        """Vraća listu (razgovor, REMIND ili EXPIRE) za sve razgovore kojima je istekao rok.
+
+        Istekli razgovori se odmah izbacuju iz evidencije; podsećeni dobijaju
+        nov rok za brisanje.
+        """
+        now = time.monotonic() if now is None else now
+        result = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, _, key = heapq.heappop(heap)
+            session = self._sessions.get(key)
+            if session is None or session.deadline != deadline:
+                continue
+            if self._reminder_due(session):
+                session.reminded = True
+                self._schedule(session)
+                result.append((session, REMIND))
+            else:
+                self.forget(key)
+                result.append((session, EXPIRE))
+        return result
+
+    def _reminder_due(self, session):
+        return (self.reminder_before > 0 and not session.reminded and session.state != ConversationHandler.END
+                and self.timeout(session.state) > self.reminder_before)
+
+    def _schedule(self, session):
+        deadline = session.touched + self.timeout(session.state)
+        if self._reminder_due(session):
+            deadline -= self.reminder_before
+        session.deadline = deadline
+        self._sequence += 1
+        heapq.heappush(self._heap, (deadline, self._sequence, session.key))
+        # Svaka aktivnost ostavlja zastareo unos; heap se povremeno pravi iznova
+        if len(self._heap) > 2 * len(self._sessions) + 64:
+            self._heap = [(s.deadline, self._sequence, s.key) for s in self._sessions.values()]
+            heapq.heapify(self._heap)
+
+    def _count(self, state, delta):
+        count = self._by_state.get(state, 0) + delta
+        if count:
+            self._by_state[state] = count
+        else:
+            self._by_state.pop(state, None)
+
+
+def track_session(callback):
+    """Dekorator za handlere razgovora: posle svakog koraka pomera rok neaktivnosti korisnika."""
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        result = await callback(update, context)
+        sessions = context.bot_data.get('sessions')
+        if sessions is not None and update.effective_user is not None and update.effective_chat is not None:
+            sessions.touch((update.effective_chat.id, update.effective_user.id), result)
+        return result
+
+    return wrapper
+
+
+# PTB nema javni API za citanje i zavrsetak razgovora spolja ni za brisanje iz memorije mimo
+# persistence-a. Ove funkcije su jedino mesto koje koristi interne delove PTB-a; verzija je
+# fiksirana u requirements.txt, a tests/test_sessions.py ih proverava sa pravim ConversationHandler-om.
+
+
+def conversation_states(handler):
+    """Rečnik (chat_id, user_id) -> stanje za razgovore koji nisu završeni."""
+    return dict(handler._conversations)
+
+
+def end_conversation(handler, key):
+    """Završava razgovor `key` kao da je handler vratio END; persistence vidi izmenu."""
+    handler._update_state(ConversationHandler.END, key)
+
+
+def drop_foreign(application, handler, owns):
+    """Briše iz memorije user_data i razgovore chatova za koje `owns(chat_id)` vraća False.
+
+    Persistence ne vidi brisanje, pa podaci ostaju u deljenoj bazi za proces
+    koji te chatove obrađuje. Vraća broj obrisanih stavki.
+    """
+    # Bot radi u privatnim chatovima, gde je chat_id isti kao user_id
+    users = [user_id for user_id in application.user_data if not owns(user_id)]
+    for user_id in users:
+        del application._user_data[user_id]
+    keys = [key for key in handler._conversations if not owns(key[0])]
+    for key in keys:
+        del handler._conversations.data[key]
+    return len(users) + len(keys)
@@ -0,0 +1,171 @@
+# smtp_pool.py
+"""Mali pool trajnih SMTP konekcija za slanje upita."""
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    __slots__ = ("smtp", "last_used")
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """Drži do `size` prijavljenih SMTP konekcija i ponovo ih koristi.
+
+    Konekcija koja je mirovala duže od `keepalive_interval` se pre upotrebe
+    proverava sa NOOP, a ona koja miruje duže od `idle_timeout` se zatvara.
+    Ako server prekine vezu tokom slanja, konekcija se otvara ponovo i slanje
+    se ponavlja jednom. Metode `send` i `maintain` su blokirajuće i pozivaju
+    se iz thread executora.
+    """
+
+    def __init__(self, user, password, host="smtp.gmail.com", port=465, use_ssl=True, starttls=False,
+                 size=2, idle_timeout=300, keepalive_interval=60, timeout=30):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+        self._maintenance_task = None
+        self.connects = 0
+
+    def _connect(self):
+        # smtplib se ucitava tek pri prvom slanju, ne pri pokretanju bota
+        import smtplib
+
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                smtp.starttls()
+        if self.password:
+            smtp.login(self.user, self.password)
+        self.connects += 1
+        logger.info("Opened SMTP connection to %s:%s (%s total).", self.host, self.port, self.connects)
+        return _PooledConnection(smtp)
+
+    @staticmethod
+    def _quit(conn):
+        import smtplib
+
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.smtp.close()
+
+    def _is_alive(self, conn):
+        import smtplib
+
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _acquire(self):
+        """Vraća ispravnu konekciju iz poola ili otvara novu."""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            idle_for = time.monotonic() - conn.last_used
+            if idle_for > self.idle_timeout:
+                self._quit(conn)
+            elif idle_for <= self.keepalive_interval or self._is_alive(conn):
+                return conn
+            else:
+                conn.smtp.close()
+
+    def _release(self, conn):
+        conn.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        self._quit(conn)
+
+    def send(self, recipients, message):
+        """Šalje već pripremljenu poruku preko konekcije iz poola."""
+        import smtplib
+
+        if self._closed:
+            raise RuntimeError("SMTP pool je zatvoren.")
+        with self._slots:
+            conn = self._acquire()
+            try:
+                try:
+                    result = conn.smtp.sendmail(self.user, recipients, message)
+                except smtplib.SMTPServerDisconnected:
+                    logger.warning("SMTP server closed the connection, reconnecting.")
+                    conn.smtp.close()
+                    conn = self._connect()
+                    result = conn.smtp.sendmail(self.user, recipients, message)
+            except Exception:
+                conn.smtp.close()
+                raise
+            self._release(conn)
+            return result
+
+    def maintain(self):
+        """Šalje NOOP mirnim konekcijama i zatvara one koje su predugo neaktivne."""
+        now = time.monotonic()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        keep = []
+        for conn in idle:
+            idle_for = now - conn.last_used
+            if idle_for > self.idle_timeout:
+                self._quit(conn)
+            elif idle_for > self.keepalive_interval and not self._is_alive(conn):
+                conn.smtp.close()
+            else:
+                keep.append(conn)
+        with self._lock:
+            # Pool je mogao biti zatvoren dok je provera trajala; close() ove konekcije vise ne vidi
+            if not self._closed:
+                self._idle.extend(keep)
+                return
+        for conn in keep:
+            self._quit(conn)
+
+    async def start(self):
+        """Pokreće periodično održavanje konekcija."""
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop(), name="smtp-pool-keepalive")
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await asyncio.to_thread(self.maintain)
+            except Exception:
+                logger.exception("SMTP pool maintenance failed")
+
+    async def close(self):
+        """Zaustavlja održavanje i zatvara sve konekcije."""
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            await asyncio.gather(self._maintenance_task, return_exceptions=True)
+            self._maintenance_task = None
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            await asyncio.to_thread(self._quit, conn)
+        logger.info("SMTP pool closed.")
@@ -0,0 +1,192 @@
+# templates.py
+"""Šabloni za email upita i poruku administratoru, kompajlirani jednom po (usluga, zemlja, jezik).
+
+Raspored redova, prevedeni nazivi i statičan tekst se pri pokretanju
+(`InquiryTemplates.build_all`) spajaju u `str.format` šablone za tri izlaza: običan tekst i HTML
+(multipart email) i MarkdownV2 za Telegram. Pri slanju se samo formatiraju
+vrednosti iz upita, escapovane za svaki izlaz: HTML za email, MarkdownV2 za
+admin poruku, tako da `_` ili `*` u korisničkom imenu ne kvari poruku.
+"""
+import html
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+ADMIN_PARSE_MODE = "MarkdownV2"
+
+# Znakovi koje MarkdownV2 zahteva da budu escapovani van entiteta
+_MARKDOWN_V2 = str.maketrans({char: "\\" + char for char in "\\_*[]()~`>#+-=|{}.!"})
+
+
+def escape_markdown(text):
+    """Escapuje tekst za Telegram MarkdownV2."""
+    return str(text).translate(_MARKDOWN_V2)
+
+
+def _plain(text):
+    return str(text)
+
+
+def _html(text):
+    return html.escape(str(text))
+
+
+@dataclass(frozen=True)
+class _Format:
+    """Kako se u jednom izlazu pišu red, naslov i okvir poruke."""
+    escape: Callable[[str], str]
+    row: str        # {label} i {value}
+    head: str = ""
+    tail: str = ""
+    title: str = ""
+
+
+_EMAIL_TEXT = _Format(_plain, "{label}: {value}\n")
+_EMAIL_HTML = _Format(
+    _html, '<tr><th align="left" valign="top">{label}</th><td>{value}</td></tr>\n',
+    head='<table cellpadding="4" style="border-collapse:collapse">\n', tail="</table>\n",
+)
+_ADMIN = _Format(escape_markdown, "{label}: {value}\n", title="*{title}*\n\n")
+
+
+@dataclass(frozen=True)
+class Compiled:
+    """Šablon jednog izlaza: stalni deo, opcioni redovi (samo ako vrednost postoji) i kraj."""
+    body: str
+    optional: Tuple[Tuple[str, str], ...] = ()
+    tail: str = ""
+
+    def render(self, values):
+        parts = [self.body.format_map(values)]
+        parts += [row.format_map(values) for field, row in self.optional if values[field]]
+        parts.append(self.tail.format_map(values))
+        return "".join(parts)
+
+
+@dataclass(frozen=True)
+class CompiledInquiry:
+    subject: str
+    subject_complete: str
+    text: Compiled
+    html: Compiled
+    admin: Compiled
+
+
+def _braces(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _compile(rows, fmt, optional=(), tail_rows=(), title=None):
+    """Redovi su (naziv, vrednost); vrednost je statičan tekst ili ("polje",) za vrednost iz upita."""
+
+    def row(label, value):
+        if isinstance(value, tuple):
+            value = "{" + value[0] + "}"
+        else:
+            value = _braces(fmt.escape(value))
+        return fmt.row.format(label=_braces(fmt.escape(label)), value=value)
+
+    head = fmt.head + (fmt.title.format(title=_braces(fmt.escape(title))) if title else "")
+    body = head + "".join(row(label, value) for label, value in rows)
+    tail = "".join(row(label, value) if label else "\n" for label, value in tail_rows) + fmt.tail
+    return Compiled(body, tuple((value[0], row(label, value)) for label, value in optional), tail)
+
+
+class InquiryTemplates:
+    """Kompajlirani šabloni po (usluga, zemlja, jezik), sa renderovanjem upita.
+
+    `text` je funkcija za prevode. `build_all` pravi šablone za sve ključeve
+    pri pokretanju, kao i tastature u `KeyboardRegistry`; `get` kompajlira
+    samo ključ koji nije unapred napravljen.
+    """
+
+    def __init__(self, text):
+        self._text = text
+        self._compiled = {}
+
+    def __len__(self):
+        return len(self._compiled)
+
+    def build_all(self, inquiries):
+        """Kompajlira šablone za upite koji predstavljaju sve ključeve; vraća broj šablona."""
+        for inquiry in inquiries:
+            self.get(inquiry.service, inquiry.country, inquiry.language, inquiry.has_object_details)
+        return len(self._compiled)
+
+    def get(self, service, country, lang, object_details):
+        key = (service, country, lang)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            compiled = self._compiled[key] = self._compile(service, country, lang, object_details)
+        return compiled
+
+    def _compile(self, service, country, lang, object_details):
+        t = self._text
+        country_name = str(country or "N/A")
+        base = [
+            (("Jezik", "Izabrani jezik"), str(lang)),
+            (("Zemlja", "Izabrana zemlja"), country_name.capitalize()),
+            (("Tip upita", "Tip upita"), t(lang, f"service_{service}")),
+        ]
+        if service == "heating":
+            base.append((("Tip grejanja", "Tip grejne instalacije"), ("heating_type",)))
+        elif service == "hp":
+            base.append((("Tip toplotne pumpe", "Tip toplotne pumpe"), ("hp_type",)))
+        if object_details:
+            base += [
+                (("Povrsina", "Povrsina objekta"), ("surface",)),
+                (("Spratovi", "Broj spratova"), ("floors",)),
+                (("Vrsta objekta", "Vrsta objekta"), ("object_type",)),
+            ]
+
+        email_rows = [("Korisnicko ime Telegrama", ("user",))] + [(labels[1], value) for labels, value in base]
+        if object_details:
+            email_rows.append(("Skica objekta", ("sketch_info",)))
+        email_rows.append(("Kontakt podaci korisnika", ("contact_info",)))
+        contact = [("Telefon", ("phones",)), ("Email", ("emails",))]
+
+        admin_rows = [("Od", ("user",))] + [(labels[0], value) for labels, value in base]
+        if object_details:
+            admin_rows.append(("Skica", ("sketch",)))
+        admin_rows.append(("Kontakt", ("contact_info",)))
+
+        subject = f"Novi upit od Telegram bota - {str(service or 'N/A').upper()} - {country_name.upper()}"
+        return CompiledInquiry(
+            subject=subject,
+            subject_complete=f"Novi upit od Telegram bota - KOMPLETNA PONUDA (Grejanje + TP) - {country_name.upper()}",
+            text=_compile(email_rows, _EMAIL_TEXT, optional=contact),
+            html=_compile(email_rows, _EMAIL_HTML, optional=contact),
+            admin=_compile(admin_rows, _ADMIN, tail_rows=[(None, None), ("Email poslat na", ("recipients",))],
+                           title="NOVI UPIT PRIMLJEN!"),
+        )
+
+    def _values(self, inquiry, user, recipients):
+        t = self._text
+        lang = inquiry.language
+        return {
+            "user": f"@{user.username or 'N/A'} (ID: {user.id})",
+            "heating_type": t(lang, f"heating_{inquiry.heating_type}") if inquiry.heating_type else "N/A",
+            "hp_type": t(lang, f"hp_{inquiry.hp_type}") if inquiry.hp_type else "N/A",
+            "surface": f"{'N/A' if inquiry.surface is None else inquiry.surface} m²",
+            "floors": "N/A" if inquiry.floors is None else inquiry.floors,
+            "object_type": t(lang, f"object_{inquiry.object_type}") if inquiry.object_type else "N/A",
+            "sketch_info": inquiry.sketch_info,
+            "sketch": "Prilozena" if inquiry.sketch_file_id else "Nije prilozena",
+            "contact_info": inquiry.contact_info or "N/A",
+            "phones": ", ".join(inquiry.contact_phones),
+            "emails": ", ".join(inquiry.contact_emails),
+            "recipients": ", ".join(recipients),
+        }
+
+    def render(self, inquiry, user, recipients):
+        """Vraća (naslov, tekst, HTML, admin poruka u MarkdownV2) za završen upit."""
+        compiled = self.get(inquiry.service, inquiry.country, inquiry.language, inquiry.has_object_details)
+        values = self._values(inquiry, user, recipients)
+        escaped_html = {key: _html(value) for key, value in values.items()}
+        escaped_admin = {key: escape_markdown(value) for key, value in values.items()}
+        subject = compiled.subject_complete if inquiry.complete_offer else compiled.subject
+        return (
+            subject,
+            compiled.text.render(values).rstrip("\n"),
+            compiled.html.render(escaped_html),
+            compiled.admin.render(escaped_admin).rstrip("\n"),
+        )
@@ -0,0 +1,51 @@
+# tests/conftest.py
+"""Zajednički fixture-i: lokalni SMTP server (aiosmtpd) za proveru poola bez mreže."""
+import os
+import socket
+import sys
+
+import pytest
+from aiosmtpd.controller import Controller
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RecordingHandler:
+    """Pamti primljene poruke."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+class LocalSMTPServer:
+    """aiosmtpd server na slobodnom portu; `restart()` prekida sve otvorene konekcije."""
+
+    def __init__(self):
+        self.handler = RecordingHandler()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self._controller = None
+
+    def start(self):
+        self._controller = Controller(self.handler, hostname="127.0.0.1", port=self.port)
+        self._controller.start()
+
+    def stop(self):
+        self._controller.stop()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+@pytest.fixture
+def smtp_server():
+    server = LocalSMTPServer()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,52 @@
+# tests/test_admin_notifier.py
+import asyncio
+
+from telegram.error import RetryAfter
+
+from admin_notifier import AdminNotifier
+
+
+class FakeBot:
+    """Beleži poslate poruke; `fail` su izuzeci koje redom baca umesto slanja."""
+
+    def __init__(self, fail=(), delay=0):
+        self.sent = []
+        self.fail = list(fail)
+        self.delay = delay
+        self.calls = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise self.fail.pop(0)
+        self.sent.append(text)
+
+
+def test_stop_during_send_keeps_rest_of_batch():
+    async def scenario():
+        bot = FakeBot(delay=0.05)
+        notifier = AdminNotifier(999, batch_size=3, min_interval=0)
+        await notifier.start(bot)
+        for number in range(3):
+            notifier.notify(f"upit {number}" + "x" * 3000)
+        await asyncio.sleep(0.02)
+        await notifier.stop()
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert [text[:6] for text in bot.sent] == ["upit 0", "upit 1", "upit 2"]
+
+
+def test_repeated_retry_after_is_bounded():
+    async def scenario():
+        bot = FakeBot(fail=[RetryAfter(0)] * 10)
+        notifier = AdminNotifier(999, min_interval=0, max_attempts=3)
+        notifier._bot = bot
+        await notifier._send("prvo", None)
+        await notifier._send("drugo", None)
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert bot.calls == 6
+    assert bot.sent == []
@@ -0,0 +1,70 @@
+# tests/test_dedup.py
+import dataclasses
+
+from dedup import DUPLICATE, MERGED, NEW, THROTTLED, InquiryDeduplicator, TTLCache, amend_inquiry, normalize_contact
+from email_queue import InquiryEmail, compose_email
+
+INQUIRY = InquiryEmail(
+    user_id=42, username="korisnik", subject="Upit", body="Povrsina: 120", recipients=["partner@example.com"],
+    admin_message="Novi upit", html="<p>Povrsina: 120</p>",
+)
+CHANGED = dataclasses.replace(INQUIRY, body="Povrsina: 150")
+
+
+def submit(dedup, inquiry, contact="+381 60 123-4567", outbox_key="k1"):
+    result, earlier_key = dedup.check(42, contact, "heating", "rs", inquiry)
+    if result in (NEW, MERGED):
+        dedup.record(42, contact, "heating", "rs", inquiry, outbox_key)
+    return result, earlier_key
+
+
+def test_contact_is_normalized():
+    assert normalize_contact("+381 (60) 123-4567") == normalize_contact("+38160 1234567")
+
+
+def test_same_content_is_duplicate_and_changed_content_merges():
+    dedup = InquiryDeduplicator(max_per_user=0)
+    assert submit(dedup, INQUIRY) == (NEW, None)
+    assert submit(dedup, INQUIRY, contact="+38160 1234567") == (DUPLICATE, "k1")
+    assert submit(dedup, CHANGED, outbox_key="k2") == (MERGED, "k1")
+    assert submit(dedup, INQUIRY, contact="drugi@example.com") == (NEW, None)
+
+
+def test_user_limit_throttles():
+    dedup = InquiryDeduplicator(max_per_user=2)
+    assert submit(dedup, INQUIRY, contact="a@example.com")[0] == NEW
+    assert submit(dedup, INQUIRY, contact="b@example.com")[0] == NEW
+    assert submit(dedup, INQUIRY, contact="c@example.com")[0] == THROTTLED
+
+
+def test_ttl_cache_expires_by_store_time_even_after_reads():
+    cache = TTLCache(ttl=10, max_entries=100)
+    cache.set("a", 1, now=1)
+    cache.set("b", 2, now=5)
+    assert cache.get("a", now=6) == 1
+    cache.set("c", 3, now=12)
+    assert cache.get("a", now=12) is None
+    assert len(cache) == 2
+
+
+def test_ttl_cache_evicts_oldest_when_full():
+    cache = TTLCache(ttl=100, max_entries=2)
+    cache.set("a", 1, now=1)
+    cache.set("b", 2, now=2)
+    cache.get("a", now=3)
+    cache.set("c", 3, now=4)
+    assert cache.get("a", now=4) is None
+    assert cache.get("b", now=4) == 2
+
+
+def test_amendment_replies_to_earlier_email():
+    amended = amend_inquiry(CHANGED, "42-7")
+    assert amended.subject == "Dopuna: Upit"
+    assert amended.body.endswith("Povrsina: 150")
+    assert amended.in_reply_to == "42-7"
+    _, message = compose_email(
+        "bot@example.com", amended.recipients, amended.subject, amended.body, html=amended.html,
+        message_id="<42-9@telegram-bot>", in_reply_to="<42-7@telegram-bot>",
+    )
+    assert "In-Reply-To: <42-7@telegram-bot>" in message
+    assert "References: <42-7@telegram-bot>" in message
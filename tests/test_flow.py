@@ -0,0 +1,49 @@
+# tests/test_flow.py
+import dataclasses
+
+import pytest
+
+from flow import STEPS, Branch, FlowError, FlowTable, Option, translation_keys
+from inquiry import Country, HpType, Inquiry, Service
+
+
+def replace_step(name, **changes):
+    return tuple(dataclasses.replace(step, **changes) if step.name == name else step for step in STEPS)
+
+
+def test_flow_compiles_and_routes_callback_data():
+    table = FlowTable()
+    step, option = table.lookup("c:me")
+    assert (step.name, option.value) == ("country", Country.CRNA_GORA)
+    assert table.lookup("country_crnagora") == (step, option)
+    assert "c:rs" in step.accepts and "country_srbija" in step.accepts
+
+
+def test_next_step_follows_branch():
+    table = FlowTable()
+    step, option = table.lookup("p:aw")
+    assert option.value == HpType.AIR_WATER
+    assert table.next_step(step, option, Inquiry(country=Country.CRNA_GORA)).name == "contact_info"
+    assert table.next_step(step, option, Inquiry(country=Country.SRBIJA)).name == "surface"
+    service = table.steps["service"]
+    assert table.next_step(service, None, Inquiry(service=Service.HP)).name == "hp_type"
+
+
+def test_translation_keys_cover_prompts_labels_and_invalid():
+    keys = {key for _, key in translation_keys()}
+    assert {"welcome", "select_hp_type_crnagora", "country_srbija", "surface_invalid"} <= keys
+    assert "Srpski" not in keys
+
+
+@pytest.mark.parametrize("steps, message", [
+    (STEPS + (STEPS[0],), "definisan dva puta"),
+    (replace_step("floors", next="nepostojeci"), "nepostojeći korak"),
+    (replace_step("floors", validator="nepoznat"), "validator"),
+    (replace_step("floors", store="nepostojece_polje"), "polje upita"),
+    (replace_step("floors", invalid="floors_invalidd"), "floors_invalidd"),
+    (replace_step("hp_type", prompt=Branch("country", {Country.SRBIJA: "select_hp_type_srbjia"})), "srbjia"),
+    (replace_step("country", options=(Option("c:rs", "country_srbja", Country.SRBIJA),)), "country_srbja"),
+])
+def test_invalid_flow_is_rejected(steps, message):
+    with pytest.raises(FlowError, match=message):
+        FlowTable(steps)
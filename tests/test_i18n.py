@@ -0,0 +1,24 @@
+# tests/test_i18n.py
+import os
+
+from i18n import LOCALES_DIR, available_languages, check_catalogs, data_keys, t
+
+
+def test_catalogs_and_all_used_keys_are_consistent():
+    assert check_catalogs(source_dirs=[os.path.dirname(LOCALES_DIR)], data_keys=data_keys()) == []
+
+
+def test_data_keys_include_flow_steps_and_partner_info():
+    sources = {source.split(" ")[0] for source, _ in data_keys()}
+    assert sources == {"flow.py", "partners.json"}
+    assert ("partners.json", "srbija_microma_info_hp") in data_keys()
+
+
+def test_unknown_data_key_is_reported():
+    problems = check_catalogs(data_keys=[("partners.json", "srbija_info_typo")])
+    assert problems == ["partners.json: ključ 'srbija_info_typo' ne postoji u katalogu"]
+
+
+def test_unknown_language_falls_back_to_default():
+    assert "sr" in available_languages()
+    assert t("xx", "welcome") == t("sr", "welcome")
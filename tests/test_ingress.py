@@ -0,0 +1,79 @@
+# tests/test_ingress.py
+import json
+
+from tornado.testing import AsyncHTTPTestCase
+
+from ingress import SECRET_HEADER, RecentIds, WebhookGuard, webhook_path
+from webserver import make_app
+
+SECRET = "s3cr3t_-X"
+
+
+def test_secret_is_checked_before_ip_limit():
+    guard = WebhookGuard(secret=SECRET, per_ip_rate=1, per_ip_burst=2)
+    valid = {SECRET_HEADER: SECRET}
+    assert all(guard.check("1.2.3.4", valid) is None for _ in range(10))
+    assert guard.check("1.2.3.4", {}) == (403, "bad_secret")
+    assert guard.check("1.2.3.4", {SECRET_HEADER: "x"}) == (403, "bad_secret")
+    assert guard.check("1.2.3.4", {}) == (429, "rate_limited")
+    assert guard.check("1.2.3.4", valid) is None
+
+
+def test_without_secret_every_request_is_rate_limited():
+    guard = WebhookGuard(per_ip_rate=1, per_ip_burst=2)
+    assert [guard.check("1.2.3.4", {}) for _ in range(3)] == [None, None, (429, "rate_limited")]
+    assert guard.check("5.6.7.8", {}) is None
+
+
+def test_body_size_comes_from_content_length():
+    guard = WebhookGuard(secret=SECRET, max_body_size=100)
+    headers = {SECRET_HEADER: SECRET}
+    assert guard.check("1.2.3.4", {**headers, "Content-Length": "100"}) is None
+    assert guard.check("1.2.3.4", {**headers, "Content-Length": "101"}) == (413, "too_large")
+    assert guard.check("1.2.3.4", {**headers, "Content-Length": "-1"}) == (413, "too_large")
+
+
+def test_recent_ids_forget_oldest():
+    recent = RecentIds(2)
+    for update_id in (1, 2, 3):
+        recent.add(update_id)
+    assert 1 not in recent and 2 in recent and 3 in recent
+    assert len(recent) == 2
+
+
+def test_webhook_path_hides_token():
+    token = "123456:ABC-def"
+    assert webhook_path(token) == webhook_path(token)
+    assert "123456" not in webhook_path(token) and "ABC" not in webhook_path(token)
+
+
+class WebhookHandlerTest(AsyncHTTPTestCase):
+    def get_app(self):
+        self.dispatched = []
+
+        async def dispatch(data):
+            self.dispatched.append(data["update_id"])
+
+        guard = WebhookGuard(secret=SECRET, max_body_size=1024, per_ip_rate=0)
+        return make_app(dispatch, webhook_path("123:abc"), guard=guard)
+
+    def post(self, body, secret=SECRET):
+        headers = {SECRET_HEADER: secret} if secret else {}
+        return self.fetch(f"/{webhook_path('123:abc')}", method="POST", body=body, headers=headers)
+
+    def test_update_is_dispatched_once(self):
+        body = json.dumps({"update_id": 7})
+        assert self.post(body).code == 200
+        assert self.post(body).code == 200
+        assert self.dispatched == [7]
+
+    def test_rejected_requests_are_not_dispatched(self):
+        assert self.post(json.dumps({"update_id": 1}), secret=None).code == 403
+        assert self.post(json.dumps({"update_id": 2}), secret="wrong").code == 403
+        assert self.post(b"{" + b" " * 2000 + b"}").code == 413
+        assert self.post(b"{bad").code == 400
+        assert self.post(json.dumps({"message": {}})).code == 400
+        assert self.dispatched == []
+
+    def test_token_path_is_not_served(self):
+        assert self.fetch("/123:abc", method="POST", body="{}").code == 404
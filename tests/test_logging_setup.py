@@ -0,0 +1,24 @@
+# tests/test_logging_setup.py
+import json
+import logging
+import queue
+
+from logging_setup import JsonFormatter, _ContextQueueHandler, bind, unbind
+
+
+def test_message_is_formatted_before_args_can_change():
+    records = queue.SimpleQueue()
+    logger = logging.getLogger("test_logging_setup")
+    logger.addHandler(_ContextQueueHandler(records))
+    logger.propagate = False
+    data = {"contact": "+381 60 1234567"}
+    token = bind(user_id=42, step="contact_info")
+    try:
+        logger.warning("Contact %s", data)
+    finally:
+        unbind(token)
+    data["contact"] = "korisnik@example.com"
+
+    entry = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert entry["msg"] == "Contact {'contact': '<phone>'}"
+    assert (entry["user_id"], entry["step"], entry["lang"]) == (42, "contact_info", None)
@@ -0,0 +1,99 @@
+# tests/test_outbox.py
+import asyncio
+import dataclasses
+import time
+
+import pytest
+
+from email_queue import InquiryEmail
+from outbox import Outbox
+
+INQUIRY = InquiryEmail(
+    user_id=42, username="korisnik", subject="Upit", body="Telo", recipients=["partner@example.com"],
+    admin_message="Novi upit",
+)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=2, base_delay=10, lease=300)
+    yield outbox
+    outbox.close()
+
+
+def combine(earlier, later):
+    return dataclasses.replace(earlier, body=earlier.body + "\n" + later.body)
+
+
+def test_duplicate_key_is_not_stored_twice(outbox):
+    assert asyncio.run(outbox.add("k1", INQUIRY))
+    assert not asyncio.run(outbox.add("k1", INQUIRY))
+
+
+def test_claim_sets_lease_until_it_expires(outbox):
+    asyncio.run(outbox.add("k1", INQUIRY))
+    now = time.time()
+    [entry] = outbox._claim(10, now)
+    assert entry.attempts == 1 and entry.inquiry == INQUIRY
+    assert outbox._claim(10, now + 1) == []
+    [again] = outbox._claim(10, now + outbox.lease + 1)
+    assert again.attempts == 2
+
+
+def test_failed_inquiry_retries_then_goes_to_dead_letters(outbox):
+    asyncio.run(outbox.add("k1", INQUIRY))
+    now = time.time()
+    entry = outbox._claim(10, now)[0]
+    assert not outbox._mark_failed(entry.id, entry.attempts, "timeout", now)
+    assert outbox._claim(10, now + 1) == []
+    entry = outbox._claim(10, now + 60)[0]
+    assert outbox._mark_failed(entry.id, entry.attempts, "timeout", now + 60)
+    [(entry_id, _, attempts, error, subject)] = asyncio.run(outbox.dead_letters())
+    assert (attempts, error, subject) == (2, "timeout", "Upit")
+
+    assert asyncio.run(outbox.replay(entry_id)) == 1
+    assert outbox._claim(10, time.time())[0].attempts == 1
+
+
+def test_merge_only_into_unclaimed_inquiry(outbox):
+    asyncio.run(outbox.add("k1", INQUIRY, delay=20))
+    assert asyncio.run(outbox.merge("k1", dataclasses.replace(INQUIRY, body="Dopuna"), combine))
+    entry = outbox._claim(10, time.time() + 20)[0]
+    assert entry.inquiry.body == "Telo\nDopuna"
+    assert not asyncio.run(outbox.merge("k1", INQUIRY, combine))
+
+
+def test_foreign_owner_waits_for_grace(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    mine, other = Outbox(path, owner=0, owner_grace=120), Outbox(path, owner=1, owner_grace=120)
+    asyncio.run(mine.add("k1", INQUIRY))
+    now = time.time()
+    assert other._claim(10, now + 1) == []
+    assert len(other._claim(10, now + 121)) == 1
+    mine.close()
+    other.close()
+
+
+def test_close_releases_unsent_leases(outbox):
+    class StuckQueue:
+        workers = 1
+
+        def __init__(self):
+            self.entries = []
+
+        async def put(self, entry):
+            self.entries.append(entry)
+
+    async def scenario():
+        queue = StuckQueue()
+        await outbox.add("k1", INQUIRY)
+        await outbox.start(queue)
+        while not queue.entries:
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+
+    asyncio.run(scenario())
+    assert outbox._claim(10, time.time()) == []
+    outbox.close()
+    [entry] = outbox._claim(10, time.time())
+    assert entry.attempts == 1
@@ -0,0 +1,102 @@
+# tests/test_rate_limiter.py
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from rate_limiter import TokenBucket, TokenBucketRateLimiter
+
+
+async def send(limiter, chat_id, log, label=None, rate_limit_args=None):
+    async def callback():
+        log.append(label if label is not None else chat_id)
+        return True
+
+    return await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": chat_id}, rate_limit_args)
+
+
+def test_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.1, abs=0.01)
+    bucket.updated -= 0.1
+    assert bucket.take() == 0
+
+
+def test_bucket_below_one_per_second_still_grants():
+    limiter = TokenBucketRateLimiter(global_rate=0.5)
+    assert limiter._global.take() == 0
+
+
+def test_requests_without_chat_are_not_limited():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=1, per_chat=1, chat_burst=1)
+        calls = []
+
+        async def callback():
+            calls.append(1)
+
+        for _ in range(5):
+            await limiter.process_request(callback, (), {}, "getFile", {}, None)
+        return calls
+
+    assert len(asyncio.run(scenario())) == 5
+
+
+def test_per_chat_burst_then_wait():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=1000, per_chat=20, chat_burst=2)
+        log = []
+        started = time.monotonic()
+        await asyncio.gather(*(send(limiter, 1, log) for _ in range(3)))
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.04
+
+
+def test_users_get_tokens_before_admin_chat():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=50, per_chat=1000, chat_burst=1000, low_priority_chats=[999])
+        limiter._global.tokens = 0
+        log = []
+        admin = [asyncio.create_task(send(limiter, 999, log, "admin")) for _ in range(3)]
+        await asyncio.sleep(0)
+        users = [asyncio.create_task(send(limiter, chat_id, log, "user")) for chat_id in range(3)]
+        await asyncio.gather(*admin, *users)
+        await limiter.shutdown()
+        return log
+
+    assert asyncio.run(scenario()) == ["user"] * 3 + ["admin"] * 3
+
+
+def test_retry_after_pauses_and_retries():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=1000, max_retries=2)
+        attempts = []
+
+        async def callback():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(0.05)
+            return "ok"
+
+        result = await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": 1}, None)
+        return result, attempts
+
+    result, attempts = asyncio.run(scenario())
+    assert result == "ok"
+    assert attempts[1] - attempts[0] >= 0.05
+
+
+def test_gives_up_after_max_retries():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(global_rate=1000, max_retries=1)
+
+        async def callback():
+            raise RetryAfter(0)
+
+        await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": 1}, None)
+
+    with pytest.raises(RetryAfter):
+        asyncio.run(scenario())
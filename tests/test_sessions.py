@@ -0,0 +1,85 @@
+# tests/test_sessions.py
+import asyncio
+import sqlite3
+
+import pytest
+from telegram import Update
+from telegram.ext import CallbackContext
+
+import config
+import main
+from benchmarks.fakes import FakeRequest, UpdateFactory
+from flow import SELECT_COUNTRY
+from sessions import SessionTracker, conversation_states, drop_foreign, end_conversation
+
+
+@pytest.fixture(autouse=True)
+def paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "OUTBOX_PATH", str(tmp_path / "outbox.sqlite3"))
+    monkeypatch.setattr(config, "LEADS_PATH", str(tmp_path / "leads.sqlite3"))
+    monkeypatch.setattr(config, "PERSISTENCE_PATH", str(tmp_path / "state.sqlite3"))
+
+
+async def start_conversations(application, user_ids):
+    factory = UpdateFactory()
+    for user_id in user_ids:
+        for update in (factory.text(user_id, "/start"), factory.callback(user_id, "l:sr")):
+            await application.process_update(Update.de_json(update, application.bot))
+
+
+def test_tracker_reminds_then_expires():
+    sessions = SessionTracker(default_timeout=100, reminder_before=10)
+    sessions.touch((1, 1), SELECT_COUNTRY, now=0)
+    assert sessions.due(now=89) == []
+    [(session, action)] = sessions.due(now=90)
+    assert action == "remind"
+    [(session, action)] = sessions.due(now=100)
+    assert (session.key, action) == ((1, 1), "expire")
+    assert (1, 1) not in sessions
+
+
+def test_sweep_ends_conversation_in_real_handler():
+    async def scenario():
+        application = main.build_application(token="123:abc", request=FakeRequest(), persistence_backend="none")
+        await application.initialize()
+        application.bot_data['sessions'] = SessionTracker(default_timeout=0, idle_timeout=0)
+        handler = application.bot_data['conversation']
+        await start_conversations(application, [77])
+        before = conversation_states(handler)
+        await main.sweep_sessions(CallbackContext(application))
+        after = conversation_states(handler), 77 in application.user_data
+        await application.shutdown()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert before == {(77, 77): SELECT_COUNTRY}
+    assert after == ({}, False)
+
+
+def test_shard_filter_keeps_foreign_rows_in_shared_persistence():
+    async def scenario():
+        seed = main.build_application(token="123:abc", request=FakeRequest(), persistence_backend="sqlite")
+        await seed.initialize()
+        await start_conversations(seed, [1, 2, 3, 4])
+        await seed.update_persistence()
+        await seed.shutdown()
+
+        worker = main.build_application(
+            token="123:abc", request=FakeRequest(), persistence_backend="sqlite", worker=0, workers=2
+        )
+        await worker.initialize()
+        handler = worker.bot_data['conversation']
+        assert drop_foreign(worker, handler, lambda chat_id: chat_id % 2 == 0) == 4
+        states = conversation_states(handler)
+        end_conversation(handler, (2, 2))
+        await worker.update_persistence()
+        await worker.shutdown()
+        return states, sorted(worker.user_data)
+
+    states, users = asyncio.run(scenario())
+    assert sorted(states) == [(2, 2), (4, 4)]
+    assert users == [2, 4]
+    with sqlite3.connect(config.PERSISTENCE_PATH) as db:
+        assert [row[0] for row in db.execute("SELECT user_id FROM user_data ORDER BY user_id")] == [1, 2, 3, 4]
+        keys = sorted(row[0] for row in db.execute("SELECT conv_key FROM conversations"))
+    assert keys == ["[1, 1]", "[3, 3]", "[4, 4]"]
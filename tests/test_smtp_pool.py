@@ -0,0 +1,69 @@
+# tests/test_smtp_pool.py
+import time
+
+import pytest
+
+from smtp_pool import SMTPPool
+
+MESSAGE = "Subject: test\r\n\r\nTelo poruke.\r\n"
+
+
+@pytest.fixture
+def pool(smtp_server):
+    pool = SMTPPool("bot@example.com", None, host="127.0.0.1", port=smtp_server.port, use_ssl=False, size=1)
+    yield pool
+    pool._closed = True
+    for conn in pool._idle:
+        pool._quit(conn)
+
+
+def test_connection_is_reused(pool, smtp_server):
+    for _ in range(3):
+        pool.send(["partner@example.com"], MESSAGE)
+    assert pool.connects == 1
+    assert len(smtp_server.handler.messages) == 3
+
+
+def test_reconnects_after_server_drops_connection(pool, smtp_server):
+    pool.send(["partner@example.com"], MESSAGE)
+    smtp_server.restart()
+    pool.send(["partner@example.com"], MESSAGE)
+    assert pool.connects == 2
+    assert len(smtp_server.handler.messages) == 2
+
+
+def test_idle_connection_is_closed(pool):
+    pool.send(["partner@example.com"], MESSAGE)
+    pool.idle_timeout = 0
+    time.sleep(0.01)
+    pool.maintain()
+    assert pool._idle == []
+    pool.send(["partner@example.com"], MESSAGE)
+    assert pool.connects == 2
+
+
+def test_keepalive_keeps_live_connection(pool):
+    pool.send(["partner@example.com"], MESSAGE)
+    pool.keepalive_interval = 0
+    time.sleep(0.01)
+    pool.maintain()
+    assert len(pool._idle) == 1
+    pool.send(["partner@example.com"], MESSAGE)
+    assert pool.connects == 1
+
+
+def test_maintain_does_not_return_connections_to_closed_pool(pool):
+    pool.send(["partner@example.com"], MESSAGE)
+    conn = pool._idle[0]
+    pool.keepalive_interval = 0
+    time.sleep(0.01)
+
+    def close_during_check(checked):
+        # close() se izvrsi dok maintain() jos proverava konekciju u threadu
+        pool._closed = True
+        return True
+
+    pool._is_alive = close_during_check
+    pool.maintain()
+    assert pool._idle == []
+    assert conn.smtp.sock is None
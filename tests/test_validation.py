@@ -0,0 +1,92 @@
+# tests/test_validation.py
+"""Korpus stvarnih unosa za `validation.py`; isti korpus meri benchmarks/bench_validation.py."""
+import pytest
+
+from validation import extract_contact, parse_floors, parse_surface
+
+SURFACE_CORPUS = [
+    ("120", 120),
+    ("120m2", 120),
+    ("120 m2", 120),
+    ("120m²", 120),
+    ("120,5", 120.5),
+    ("120.5 m²", 120.5),
+    ("oko 150 kvadrata", 150),
+    ("1.200", 1200),
+    ("1.200 m2", 1200),
+    ("85 kvm", 85),
+    ("approx. 200 sq m", 200),
+    ("примерно 90 м2", 90),
+    ("5", None),
+    ("0", None),
+    ("ne znam", None),
+    ("1.2.3", None),
+    ("", None),
+    ("10 000", 10000),
+    ("15 000 m2", 15000),
+    ("10\u00a0000", 10000),
+    ("12\u202f500 m²", 12500),
+    ("1.200,5", 1200.5),
+    ("1 200,5 m²", 1200.5),
+    ("1,200.5", 1200.5),
+    ("1.200.5", None),
+    ("1,200,5", None),
+    ("2.500.000", None),
+    ("120 2", 120),
+    (".5", None),
+    ("-120", None),
+    ("\u2212120 m2", None),
+    ("povrsina -150", None),
+]
+
+FLOORS_CORPUS = [
+    ("2", 2),
+    ("2 sprata", 2),
+    ("3 floors", 3),
+    ("1 этаж", 1),
+    ("2,5", None),
+    ("0", None),
+    ("200", None),
+    ("prizemlje", None),
+    (".5", None),
+    ("-2", None),
+    ("2-3 sprata", 2),
+]
+
+CONTACT_CORPUS = [
+    ("+381 60 1234567, korisnik@example.com", "srbija", ("+381601234567",), ("korisnik@example.com",)),
+    ("+381601234567", "srbija", ("+381601234567",), ()),
+    ("060/123-4567", "srbija", ("+381601234567",), ()),
+    ("060 123 45 67", "srbija", ("+381601234567",), ()),
+    ("064 12345678", "srbija", ("+3816412345678",), ()),
+    ("+381 (0)63 765 4321", "srbija", ("+381637654321",), ()),
+    ("00381 63 7654321", "srbija", ("+381637654321",), ()),
+    ("011 2345678", "srbija", ("+381112345678",), ()),
+    ("+382 67 123456", "crnagora", ("+38267123456",), ()),
+    ("067 123 456", "crnagora", ("+38267123456",), ()),
+    ("069/123-456 ili ivan@instal.me", "crnagora", ("+38269123456",), ("ivan@instal.me",)),
+    ("060 1234567", "crnagora", ("+381601234567",), ()),
+    ("Marko1985@Gmail.COM", "srbija", (), ("Marko1985@gmail.com",)),
+    ("tel: 064 12 34 567, mail: a.b@firma.co.rs", "srbija", ("+381641234567",), ("a.b@firma.co.rs",)),
+    ("+44 20 7946 0958", "srbija", ("+442079460958",), ()),
+    ("zovite posle 17h", "srbija", (), ()),
+    ("123", "srbija", (), ()),
+]
+
+
+@pytest.mark.parametrize("text, expected", SURFACE_CORPUS)
+def test_parse_surface(text, expected):
+    result = parse_surface(text)
+    assert result == expected and type(result) is type(expected)
+
+
+@pytest.mark.parametrize("text, expected", FLOORS_CORPUS)
+def test_parse_floors(text, expected):
+    result = parse_floors(text)
+    assert result == expected and type(result) is type(expected)
+
+
+@pytest.mark.parametrize("text, country, phones, emails", CONTACT_CORPUS)
+def test_extract_contact(text, country, phones, emails):
+    contact = extract_contact(text, country)
+    assert (contact.phones, contact.emails) == (phones, emails)
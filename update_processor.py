@@ -0,0 +1,77 @@
+# update_processor.py
+"""Paralelna obrada update-ova uz strogi redosled unutar jednog chata."""
+import asyncio
+import collections
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Obrađuje do `max_concurrent_updates` update-ova istovremeno.
+
+    Update-ovi istog chata čekaju u FIFO redu tog chata, pa se prelazi stanja
+    ConversationHandler-a za jednog korisnika izvršavaju redom kojim su
+    update-ovi stigli. Mesto u limitu paralelnosti drži samo prvi update u
+    redu; ostali ga oslobađaju dok čekaju, pa chat koji zasipa bota ne blokira
+    druge korisnike. Update-ovi bez chata se ne serijalizuju. Red se briše čim
+    se isprazni, pa broj redova prati samo aktivne chatove.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._chats = {}
+
+    @property
+    def active_chats(self):
+        return len(self._chats)
+
+    async def do_process_update(self, update, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await coroutine
+            return
+
+        waiting = self._chats.get(chat.id)
+        if waiting is None:
+            self._chats[chat.id] = collections.deque()
+        else:
+            await self._wait_turn(chat.id, waiting)
+        try:
+            await coroutine
+        finally:
+            self._next(chat.id)
+
+    async def _wait_turn(self, chat_id, waiting):
+        """Čeka da prethodni update chata završi, bez zauzimanja mesta u limitu paralelnosti."""
+        turn = asyncio.get_running_loop().create_future()
+        waiting.append(turn)
+        # process_update() je vec uzeo mesto u semaforu; vraca se dok update ceka svoj red
+        self._semaphore.release()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                # Red je vec bio predat ovom update-u, pa se predaje sledecem
+                self._next(chat_id)
+            else:
+                waiting.remove(turn)
+            raise
+        finally:
+            await self._semaphore.acquire()
+
+    def _next(self, chat_id):
+        waiting = self._chats[chat_id]
+        if waiting:
+            waiting.popleft().set_result(None)
+        else:
+            del self._chats[chat_id]
+
+    async def initialize(self):
+        logger.info("Processing up to %s updates concurrently, ordered per chat.", self.max_concurrent_updates)
+
+    async def shutdown(self):
+        pass
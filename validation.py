@@ -0,0 +1,131 @@
+# validation.py
+"""Parsiranje korisničkog unosa: površina, broj spratova i kontakt podaci.
+
+Regularni izrazi se kompajliraju jednom, pri učitavanju modula. Brojevi se
+izvlače iz slobodnog teksta ("120m2", "120,5 m²", "10 000", "2 sprata"), a telefoni se
+svode na E.164 oblik; domaći brojevi bez pozivnog broja dobijaju pozivni
+broj zemlje koju je korisnik izabrao.
+"""
+import re
+from dataclasses import dataclass
+from typing import Tuple
+
+# Razumne granice unosa
+SURFACE_RANGE = (10, 100_000)
+FLOORS_RANGE = (1, 100)
+
+# Pozivni broj zemlje -> dozvoljena duzina broja bez pozivnog broja i vodece nule
+COUNTRY_CODES = {
+    "381": (7, 10),
+    "382": (8, 8),
+}
+DEFAULT_COUNTRY_CODE = {
+    "srbija": "381",
+    "crnagora": "382",
+}
+
+# Prvi broj u tekstu: tacka/zarez su separator hiljada ili decimala, a razmak (i NBSP) samo
+# separator hiljada, kada iza njega dolaze tacno tri cifre ("10 000", ali "2 3" su dva broja)
+_SPACE = "[ \u00a0\u202f]"
+_NUMBER = re.compile(rf"\d+(?:(?:[.,]|{_SPACE}(?=\d{{3}}(?!\d)))\d+)*")
+_THOUSANDS = re.compile(rf"\d{{1,3}}(?:\.\d{{3}})+|\d{{1,3}}(?:,\d{{3}}){{2,}}|\d{{1,3}}(?:{_SPACE}\d{{3}})+")
+# Ceo deo broja sa decimalama: cifre ili grupe hiljada sa istim separatorom ("1.200" u "1.200,5")
+_INTEGER_PART = re.compile(rf"\d+|\d{{1,3}}(?P<sep>[.,]|{_SPACE})\d{{3}}(?:(?P=sep)\d{{3}})*")
+_EMAIL = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)*\.[A-Za-z]{2,}")
+_PHONE = re.compile(r"(?:\+|\b00)?\d(?:[ \-/().]{0,2}\d){6,}")
+_NON_DIGITS = re.compile(r"\D")
+# Znak ispred broja zbog kog se unos odbija: minus (i U+2212) ili tacka/zarez (".5", "-120")
+_SIGN = "-\u2212.,"
+
+
+def parse_number(text, minimum=None, maximum=None, decimals=True):
+    """Vraća prvi broj iz teksta (int ako je ceo), ili None ako ga nema, ima znak ili je van granica."""
+    match = _NUMBER.search(text or "")
+    if match is None or (match.start() and text[match.start() - 1] in _SIGN):
+        return None
+    raw = match.group()
+    if _THOUSANDS.fullmatch(raw):
+        value = float(_NON_DIGITS.sub("", raw))
+    else:
+        # Poslednja tacka ili zarez je decimalni separator; ispred nje mogu biti samo hiljade
+        # sa drugim separatorom ("1.200,5", "1 200,5", "1,200.5"), inace je unos dvosmislen ("1.200.5")
+        point = max(raw.rfind("."), raw.rfind(","))
+        integer, fraction = (raw[:point], raw[point + 1:]) if point >= 0 else (raw, "0")
+        part = _INTEGER_PART.fullmatch(integer)
+        if part is None or part.group("sep") == raw[point]:
+            return None
+        value = float(f"{_NON_DIGITS.sub('', integer)}.{fraction}")
+    if value.is_integer():
+        value = int(value)
+    elif not decimals:
+        return None
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        return None
+    return value
+
+
+def parse_surface(text):
+    """Površina objekta u m²; prihvata "120", "120m2", "120,5 m²", "1.200", "10 000", "1.200,5"."""
+    return parse_number(text, *SURFACE_RANGE)
+
+
+def parse_floors(text):
+    """Broj spratova; prihvata "2", "2 sprata", "3 floors"."""
+    return parse_number(text, *FLOORS_RANGE, decimals=False)
+
+
+def normalize_phone(candidate, default_code=None):
+    """Vraća broj u E.164 obliku (+381601234567) ili None ako broj nije ispravan."""
+    digits = _NON_DIGITS.sub("", candidate)
+    international = candidate.lstrip().startswith("+")
+    if digits.startswith("00"):
+        digits, international = digits[2:], True
+    if not international:
+        if digits.startswith("0"):
+            # Domaci broj: prvo pozivni broj izabrane zemlje, pa ostali
+            codes = [default_code] if default_code else []
+            codes += [code for code in COUNTRY_CODES if code != default_code]
+            return next(filter(None, (normalize_phone(f"+{code}{digits[1:]}") for code in codes)), None)
+        if not digits.startswith(tuple(COUNTRY_CODES)):
+            return None
+    code = digits[:3]
+    if code in COUNTRY_CODES:
+        # "+381 (0)60 ..." - vodeca nula posle pozivnog broja se izostavlja
+        national = digits[3:].lstrip("0")
+        low, high = COUNTRY_CODES[code]
+        if not low <= len(national) <= high:
+            return None
+        return f"+{code}{national}"
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+@dataclass(frozen=True)
+class Contact:
+    phones: Tuple[str, ...] = ()
+    emails: Tuple[str, ...] = ()
+
+    def __bool__(self):
+        return bool(self.phones or self.emails)
+
+    @property
+    def key(self):
+        """Normalizovan kontakt, za poređenje upita istog korisnika."""
+        return ",".join(sorted(self.phones + self.emails))
+
+
+def extract_contact(text, country=None):
+    """Izvlači telefone i email adrese iz slobodnog teksta, bez duplikata."""
+    text = text or ""
+    emails = tuple(dict.fromkeys(
+        f"{local}@{domain.lower()}" for local, domain in (email.rsplit("@", 1) for email in _EMAIL.findall(text))
+    ))
+    # Cifre iz email adresa nisu deo telefona
+    rest = _EMAIL.sub(" ", text)
+    default_code = DEFAULT_COUNTRY_CODE.get(country)
+    phones = tuple(dict.fromkeys(filter(None, (
+        normalize_phone(candidate, default_code) for candidate in _PHONE.findall(rest)
+    ))))
+    return Contact(phones, emails)
+
@@ -0,0 +1,172 @@
+# webserver.py
+"""Webhook server: prima update-ove od Telegrama i na istom portu izlaže /metrics i /healthz.
+
+`Application.run_webhook` ne dozvoljava dodatne rute, pa se ovde koristi
+sopstveni tornado server (isti koji PTB koristi interno) koji update-ove
+stavlja u `application.update_queue`, kao i PTB-ov webhook handler. Isti
+server koristi i prijemni proces u `cluster.py`, samo sa drugim `dispatch`.
+
+Port se otvara pre inicijalizacije aplikacije (get_me, persistence, outbox,
+set_webhook), pa posle buđenja servisa /healthz odmah odgovara, a update-ovi
+koji stignu ranije čekaju u redu dok aplikacija ne krene. Webhook zahtev se
+pre čitanja tela proverava u `ingress.WebhookGuard`.
+"""
+import asyncio
+import json
+import logging
+import signal
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from telegram import Update
+
+from ingress import WebhookGuard
+from metrics import REGISTRY, WEBHOOK_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+@tornado.web.stream_request_body
+class WebhookHandler(tornado.web.RequestHandler):
+    SUPPORTED_METHODS = ("POST",)
+
+    def initialize(self, dispatch, guard):
+        self.dispatch = dispatch
+        self.guard = guard
+        self.chunks = []
+
+    def prepare(self):
+        # Poziva se cim stignu zaglavlja, pre citanja tela
+        rejected = self.guard.check(self.request.remote_ip, self.request.headers)
+        if rejected:
+            raise tornado.web.HTTPError(rejected[0])
+        # Telo bez Content-Length (chunked) se prekida cim predje limit
+        self.request.connection.set_max_body_size(self.guard.max_body_size)
+
+    def data_received(self, chunk):
+        self.chunks.append(chunk)
+
+    async def post(self):
+        try:
+            data = json.loads(b"".join(self.chunks))
+        except ValueError:
+            data = None
+        update_id = data.get("update_id") if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            WEBHOOK_REJECTED.inc("invalid")
+            raise tornado.web.HTTPError(400, reason="Invalid update")
+        if self.guard.duplicate(update_id):
+            return
+        await self.dispatch(data)
+        self.guard.recent.add(update_id)
+
+
+class HealthHandler(tornado.web.RequestHandler):
+    SUPPORTED_METHODS = ("GET", "HEAD")
+
+    def initialize(self, ready, healthy):
+        self.ready = ready
+        self.healthy = healthy
+
+    def _status(self):
+        # 200 i dok se aplikacija pokrece: server vec prima update-ove u red
+        if not self.healthy():
+            self.set_status(503)
+            return "unhealthy"
+        return "ok" if self.ready() else "starting"
+
+    def get(self):
+        self.write({"status": self._status()})
+
+    def head(self):
+        self._status()
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    SUPPORTED_METHODS = ("GET",)
+
+    def initialize(self, render):
+        self.render_metrics = render
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(self.render_metrics())
+
+
+def _log_request(handler):
+    # Uspesni zahtevi se ne loguju na INFO, jer Telegram salje jedan zahtev po update-u; odbijeni
+    # webhook zahtevi se samo broje (bot_webhook_rejected_total), da lazan saobracaj ne puni log
+    status = handler.get_status()
+    webhook = isinstance(handler, WebhookHandler)
+    level = logging.DEBUG if status < 400 or (webhook and status < 500) else logging.WARNING
+    # Putanja webhooka se ne prikazuje, izvedena je iz tokena bota
+    path = "/<webhook>" if webhook else handler.request.path
+    logger.log(level, "%s %s %s %.1fms", status, handler.request.method, path, 1000 * handler.request.request_time())
+
+
+def make_app(dispatch, url_path, render_metrics=REGISTRY.render, ready=lambda: True, guard=None,
+             healthy=lambda: True):
+    """Pravi tornado aplikaciju sa webhook, /metrics i /healthz rutama.
+
+    `dispatch` je korutina koja prima update kao rečnik iz JSON-a, `ready()`
+    kaže da li je bot potpuno pokrenut, a `healthy()` da li radi kako treba
+    (npr. da nijedan worker nije pao); inače /healthz vraća 503.
+    """
+    return tornado.web.Application(
+        [
+            (r"/healthz", HealthHandler, {"ready": ready, "healthy": healthy}),
+            (rf"/{url_path}/?", WebhookHandler, {"dispatch": dispatch, "guard": guard or WebhookGuard()}),
+            (r"/metrics", MetricsHandler, {"render": render_metrics}),
+        ],
+        log_function=_log_request,
+    )
+
+
+def stop_signal():
+    """Vraća Event koji se postavlja na SIGINT ili SIGTERM."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def serve(application, listen, port, url_path, webhook_url, allowed_updates=None, guard=None,
+                xheaders=False):
+    """Pokreće bota preko webhooka i radi do SIGINT/SIGTERM, kao `run_webhook`.
+
+    Sa `xheaders` se IP adresa klijenta čita iz X-Forwarded-For/X-Real-Ip
+    (iza proxy-ja, kao na Renderu).
+    """
+    stop = stop_signal()
+    guard = guard or WebhookGuard()
+
+    async def dispatch(data):
+        update = Update.de_json(data, application.bot)
+        if update:
+            await application.update_queue.put(update)
+
+    # Update-ovi primljeni pre start() cekaju u update_queue
+    server = HTTPServer(
+        make_app(dispatch, url_path, ready=lambda: application.running, guard=guard), xheaders=xheaders
+    )
+    server.listen(port, listen)
+    logger.info("Webhook server listening on %s:%s.", listen, port)
+    initialized = False
+    try:
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        initialized = True
+        await application.bot.set_webhook(webhook_url, allowed_updates=allowed_updates, secret_token=guard.secret)
+        await application.start()
+        logger.info("Bot started.")
+        await stop.wait()
+    finally:
+        server.stop()
+        await server.close_all_connections()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown and initialized:
+            await application.post_shutdown(application)